@@ -20,6 +20,67 @@ DATABASES = {
     "default": env.db("DATABASE_URL"),
 }
 
+# Process-wide psycopg2 pool behind getConn (src/db/pool.py)
+DB_POOL_ENABLED = env.bool("DB_POOL_ENABLED", True)
+DB_POOL_MIN_SIZE = env.int("DB_POOL_MIN_SIZE", 1)
+DB_POOL_MAX_SIZE = env.int("DB_POOL_MAX_SIZE", 16)
+DB_POOL_TIMEOUT = env.float("DB_POOL_TIMEOUT", 30.0)
+DB_POOL_MAX_IDLE = env.float("DB_POOL_MAX_IDLE", 300.0)
+DB_POOL_MAX_LIFETIME = env.float("DB_POOL_MAX_LIFETIME", 3600.0)
+DB_POOL_HEALTHCHECK_INTERVAL = env.float("DB_POOL_HEALTHCHECK_INTERVAL", 30.0)
+
+# customer warehouse engines, see src/db/engine_registry.py
+TENANT_ENGINE_MAX_ENGINES = env.int("TENANT_ENGINE_MAX_ENGINES", 64)
+TENANT_ENGINE_IDLE_TIMEOUT = env.float("TENANT_ENGINE_IDLE_TIMEOUT", 600.0)
+TENANT_ENGINE_POOL_SIZE = env.int("TENANT_ENGINE_POOL_SIZE", 2)
+TENANT_ENGINE_MAX_OVERFLOW = env.int("TENANT_ENGINE_MAX_OVERFLOW", 3)
+TENANT_ENGINE_POOL_TIMEOUT = env.int("TENANT_ENGINE_POOL_TIMEOUT", 30)
+TENANT_ENGINE_POOL_RECYCLE = env.int("TENANT_ENGINE_POOL_RECYCLE", 1800)
+TENANT_CONNECTION_CACHE_TTL = env.float("TENANT_CONNECTION_CACHE_TTL", 300.0)
+
+# Reflected warehouse schemas shared by the table_info scanners (src/db/schema_snapshot.py)
+SCHEMA_SNAPSHOT_CHECK_INTERVAL = env.float("SCHEMA_SNAPSHOT_CHECK_INTERVAL", 60.0)
+SCHEMA_SNAPSHOT_MAX_AGE = env.float("SCHEMA_SNAPSHOT_MAX_AGE", 3600.0)
+SCHEMA_SNAPSHOT_MAX_SIZE = env.int("SCHEMA_SNAPSHOT_MAX_SIZE", 128)
+DATABASE_WRAPPER_CACHE_SIZE = env.int("DATABASE_WRAPPER_CACHE_SIZE", 64)
+DATABASE_WRAPPER_CACHE_TTL = env.float("DATABASE_WRAPPER_CACHE_TTL", 3600.0)
+# DDL, indexes and sample rows of the scanned tables served to the wrappers (src/db/table_info_fragments.py)
+TABLE_INFO_CACHE_ENABLED = env.bool("TABLE_INFO_CACHE_ENABLED", True)
+TABLE_INFO_CACHE_TTL = env.float("TABLE_INFO_CACHE_TTL", 3600.0)
+# pooled keep-alive HTTP client shared by the LLM and embedding clients (src/query_engine/llm_clients.py)
+LLM_HTTP_MAX_CONNECTIONS = env.int("LLM_HTTP_MAX_CONNECTIONS", 100)
+LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS = env.int("LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS", 20)
+LLM_HTTP_KEEPALIVE_EXPIRY = env.float("LLM_HTTP_KEEPALIVE_EXPIRY", 60.0)
+LLM_HTTP_TIMEOUT = env.float("LLM_HTTP_TIMEOUT", 120.0)
+# token streaming of the agent (src/utils/event_stream.py, src/api/stream.py)
+AGENT_STREAM_QUEUE_SIZE = env.int("AGENT_STREAM_QUEUE_SIZE", 1000)
+AGENT_STREAM_PUT_TIMEOUT = env.float("AGENT_STREAM_PUT_TIMEOUT", 30.0)
+AGENT_STREAM_KEEPALIVE = env.float("AGENT_STREAM_KEEPALIVE", 15.0)
+SCHEMA_SCAN_PARALLELISM = env.int("SCHEMA_SCAN_PARALLELISM", 4)
+SCHEMA_SCAN_TABLE_TIMEOUT = env.float("SCHEMA_SCAN_TABLE_TIMEOUT", 300.0)
+SCHEMA_SCAN_WRITE_BATCH_SIZE = env.int("SCHEMA_SCAN_WRITE_BATCH_SIZE", 50)
+# an incremental refresh that would drop more than this fraction of the stored tables deletes nothing, the catalog
+# read is more likely incomplete (permissions, a failing connection) than the tables gone
+SCHEMA_REFRESH_MAX_DROP_FRACTION = env.float("SCHEMA_REFRESH_MAX_DROP_FRACTION", 0.5)
+# profile the columns of every scanned table and store their distinct values (categories)
+SCHEMA_SCAN_COLUMN_DISTINCT_ENABLED = env.bool("SCHEMA_SCAN_COLUMN_DISTINCT_ENABLED", True)
+COLUMN_PROFILE_SAMPLE_ROWS = env.int("COLUMN_PROFILE_SAMPLE_ROWS", 10000)
+COLUMN_VALUE_INDEX_ENABLED = env.bool("COLUMN_VALUE_INDEX_ENABLED", True)
+COLUMN_VALUE_INDEX_MAX_VALUES = env.int("COLUMN_VALUE_INDEX_MAX_VALUES", 200000)
+COLUMN_VALUE_INDEX_CACHE_TTL = env.float("COLUMN_VALUE_INDEX_CACHE_TTL", 600.0)
+# seconds, older value indexes are not searched and are rebuilt by the next refresh_tables_incremental (0 = never)
+COLUMN_VALUE_INDEX_MAX_AGE = env.float("COLUMN_VALUE_INDEX_MAX_AGE", 86400.0)
+QUERY_STREAM_CHUNK_SIZE = env.int("QUERY_STREAM_CHUNK_SIZE", 1000)
+# "json" or "parquet" (needs pyarrow) for the query results saved to S3
+RESULTS_FORMAT = env.str("RESULTS_FORMAT", "json")
+RESULTS_PARQUET_ROW_GROUP_SIZE = env.int("RESULTS_PARQUET_ROW_GROUP_SIZE", 10000)
+RESULT_CACHE_ENABLED = env.bool("RESULT_CACHE_ENABLED", True)
+RESULT_CACHE_TTL = env.float("RESULT_CACHE_TTL", 300.0)
+# company_id=seconds overrides of RESULT_CACHE_TTL, 0 disables the cache for that company
+RESULT_CACHE_TENANT_TTLS = env.dict("RESULT_CACHE_TENANT_TTLS", default={})
+RESULT_CACHE_MAX_BYTES = env.int("RESULT_CACHE_MAX_BYTES", 256 * 1024 * 1024)
+RESULT_CACHE_MAX_ENTRY_BYTES = env.int("RESULT_CACHE_MAX_ENTRY_BYTES", 8 * 1024 * 1024)
+
 DEBUG = env.bool("DJANGO_DEBUG", False)
 SECRET_KEY = env("DJANGO_SECRET_KEY", default="test#123#321#test")
 API_KEYS = env.list("API_KEYS", default=["123456wer12wegfqwtg24t2462f"])
@@ -31,6 +92,12 @@ BOT_DATABASE_URL = env.str("BOT_DATABASE_URL", "")
 PINECONE_API_KEY = env.str("PINECONE_API_KEY", "")
 PINECONE_ENVIRONMENT = env.str("PINECONE_ENVIRONMENT", "")
 PINECONE_EMBEDDING_MODEL = env.str("PINECONE_EMBEDDING_MODEL", "text-embedding-ada-002")
+PINECONE_EMBED_BATCH_SIZE = env.int("PINECONE_EMBED_BATCH_SIZE", 512)
+PINECONE_UPSERT_BATCH_SIZE = env.int("PINECONE_UPSERT_BATCH_SIZE", 100)
+# Golden record vector store: "pinecone" or "local" (src/context_store/local_store.py)
+CONTEXT_STORE_BACKEND = env.str("CONTEXT_STORE_BACKEND", "pinecone")
+CONTEXT_STORE_LOCAL_PATH = env.str("CONTEXT_STORE_LOCAL_PATH", str(ROOT_DIR / "context_store"))
+TABLE_EMBEDDING_MODEL = env.str("TABLE_EMBEDDING_MODEL", "text-embedding-ada-002")
 
 
 AGENT_LLM_MODEL_DEMO = env.str("AGENT_LLM_MODEL_DEMO", "gpt-3.5-turbo-1106")
@@ -48,6 +115,10 @@ LANGCHAIN_MAX_ITERATIONS = env.int("LANGCHAIN_MAX_ITERATIONS", 99)
 ALLOWED_HOSTS = env.list("DJANGO_ALLOWED_HOSTS", default=["*"])
 API_KEYS_SECRET_KEY = env.str("API_KEYS_SECRET_KEY", None)
 API_KEYS_SECRET_HASHER = env.str("API_KEYS_SECRET_HASHER", "pbkdf2_sha256")
+# the auth cache lives in each worker, a plan change is seen by the other workers after at most this long
+API_KEY_AUTH_CACHE_TTL = env.float("API_KEY_AUTH_CACHE_TTL", 30.0)
+API_KEY_AUTH_CACHE_MAX_SIZE = env.int("API_KEY_AUTH_CACHE_MAX_SIZE", 10000)
+API_KEY_USAGE_FLUSH_EVERY = env.int("API_KEY_USAGE_FLUSH_EVERY", 20)
 
 
 JWT_SECRET_KEY = env.str("JWT_SECRET_KEY", "HZZbTvfASURXaizQFAuxUNHhIOHhWOnB")
@@ -56,6 +127,19 @@ JWT_EXP_DELTA = env.int("JWT_EXP_DELTA", 365)  # Token expires after
 
 
 CACHED_HISTORY_ENABLED = env.bool("CACHED_HISTORY_ENABLED", False)
+# answers reused from genie_chat_history, see src/db/answer_cache.py
+ANSWER_CACHE_EXACT_TTL = env.float("ANSWER_CACHE_EXACT_TTL", 86400.0)
+ANSWER_CACHE_SEMANTIC_ENABLED = env.bool("ANSWER_CACHE_SEMANTIC_ENABLED", False)
+ANSWER_CACHE_SEMANTIC_TTL = env.float("ANSWER_CACHE_SEMANTIC_TTL", 86400.0)
+ANSWER_CACHE_SEMANTIC_THRESHOLD = env.float("ANSWER_CACHE_SEMANTIC_THRESHOLD", 0.95)
+ANSWER_CACHE_SEMANTIC_CANDIDATES = env.int("ANSWER_CACHE_SEMANTIC_CANDIDATES", 500)
+ANSWER_CACHE_LOCAL_TTL = env.float("ANSWER_CACHE_LOCAL_TTL", 60.0)
+# completions of temperature 0 prompts, see src/db/llm_cache.py
+LLM_CACHE_ENABLED = env.bool("LLM_CACHE_ENABLED", True)
+LLM_CACHE_MAX_BYTES = env.int("LLM_CACHE_MAX_BYTES", 512 * 1024 * 1024)
+LLM_CACHE_LOCAL_MAX_BYTES = env.int("LLM_CACHE_LOCAL_MAX_BYTES", 64 * 1024 * 1024)
+LLM_CACHE_LOCAL_TTL = env.float("LLM_CACHE_LOCAL_TTL", 3600.0)
+LLM_CACHE_EVICT_EVERY = env.int("LLM_CACHE_EVICT_EVERY", 100)
 
 
 STRIPE_SECRET_KEY = env.str('STRIPE_SECRET_KEY', "")
@@ -0,0 +1,65 @@
+import calendar
+import datetime
+
+import pytz
+from django.core.management.base import BaseCommand
+
+from src.db.login_helpers import getConn
+from src.db.usage_counters import reconcile_usage_counters
+
+
+class Command(BaseCommand):
+    help = 'Backfill or reconcile genie_usage_counters from genie_chat_history'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "-year",
+            "--year",
+            type=int,
+            required=False,
+            help="Year to reconcile, defaults to the current year",
+        )
+        parser.add_argument(
+            "-month",
+            "--month",
+            type=int,
+            required=False,
+            help="Month to reconcile, defaults to the current month",
+        )
+        parser.add_argument(
+            "-months",
+            "--months",
+            type=int,
+            default=1,
+            help="Number of months to reconcile, going back from year/month",
+        )
+
+    def handle(self, *args, **options):
+        today = datetime.datetime.now()
+        year = options.get("year") or today.year
+        month = options.get("month") or today.month
+        now = datetime.datetime.now(tz=pytz.UTC)
+
+        for _ in range(options.get("months")):
+            first_day = datetime.datetime(year, month, 1)
+            last_day = datetime.datetime(year, month, calendar.monthrange(year, month)[1], 23, 59, 59)
+
+            result = reconcile_usage_counters(
+                conn=getConn(),
+                first_day=first_day,
+                last_day=last_day,
+                year=year,
+                month=month,
+                now=now,
+            )
+            if result is None:
+                self.stdout.write(self.style.ERROR(f'Failed to reconcile usage counters. year={year}, month={month}'))
+            else:
+                upserted, reset = result
+                self.stdout.write(self.style.SUCCESS(
+                    f'Usage counters reconciled. year={year}, month={month}, upserted={upserted}, reset={reset}'))
+
+            month -= 1
+            if month == 0:
+                year -= 1
+                month = 12
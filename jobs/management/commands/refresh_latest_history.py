@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from src.db.history import rebuild_latest_history
+from src.db.login_helpers import getConn
+
+
+class Command(BaseCommand):
+    help = 'Rebuild genie_chat_history_latest from genie_chat_history'
+
+    def handle(self, *args, **options):
+        inserted = rebuild_latest_history(conn=getConn())
+        if inserted is None:
+            self.stdout.write(self.style.ERROR('Failed to rebuild genie_chat_history_latest'))
+            return
+
+        self.stdout.write(self.style.SUCCESS(f'genie_chat_history_latest rebuilt successfully. rows={inserted}'))
@@ -0,0 +1,57 @@
+from django.core.management.base import BaseCommand
+from llama_index.core import SQLDatabase
+
+from src.db.db_utils import get_custom_driver_connection
+from src.db.table_info import refresh_tables_incremental, get_all_tables_and_views
+
+
+class Command(BaseCommand):
+    help = 'Refresh genie_users_db_connection_details for a connection, rescanning only tables whose catalog changed'
+
+    def add_arguments(self, parser):
+        parser.add_argument("-company_id", "--company_id", type=int, required=True, help="Company id")
+        parser.add_argument("-resourcename", "--resourcename", type=str, required=True, help="Connection resourcename")
+        parser.add_argument("-genie_users_id", "--genie_users_id", type=int, required=True,
+                            help="User recorded on new rows")
+        parser.add_argument("-db_schema", "--db_schema", type=str, default="", help="Schema to refresh")
+        parser.add_argument("-db_warehouse", "--db_warehouse", type=str, default="", help="Warehouse to refresh")
+        parser.add_argument("-full", "--full", action="store_true", help="Rescan every table")
+
+    def handle(self, *args, **options):
+        company_id = options.get("company_id")
+        resourcename = options.get("resourcename")
+        engine, db_type = get_custom_driver_connection(resourcename=resourcename, company_id=company_id)
+        if engine is None:
+            self.stdout.write(self.style.ERROR(
+                f'Failed to connect. company_id={company_id}, resourcename={resourcename}'))
+            return
+
+        database = SQLDatabase(engine=engine)
+        if options.get("full"):
+            list_tables = get_all_tables_and_views(
+                database=database,
+                db_schema=options.get("db_schema"),
+                company_id=company_id,
+                resourcename=resourcename,
+                genie_users_id=options.get("genie_users_id"),
+                force_refresh=True,
+                db_warehouse=options.get("db_warehouse"),
+            )
+            self.stdout.write(self.style.SUCCESS(f'Schema rescanned. tables={len(list_tables)}'))
+            return
+
+        result = refresh_tables_incremental(
+            database=database,
+            db_schema=options.get("db_schema"),
+            company_id=company_id,
+            resourcename=resourcename,
+            genie_users_id=options.get("genie_users_id"),
+            db_warehouse=options.get("db_warehouse"),
+        )
+        if result is None:
+            self.stdout.write(self.style.ERROR(
+                f'Failed to refresh schema. company_id={company_id}, resourcename={resourcename}'))
+            return
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Schema refreshed. tables={result["tables"]}, changed={result["changed"]}, scanned={result["scanned"]}, dropped={result["dropped"]}'))
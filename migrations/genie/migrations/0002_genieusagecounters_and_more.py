@@ -0,0 +1,47 @@
+# Generated by Django 4.2.15 on 2026-10-18 09:12
+
+from django.db import migrations, models
+import psqlextra.manager.manager
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("genie", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="GenieUsageCounters",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("scope", models.CharField(max_length=16)),
+                ("scope_id", models.BigIntegerField()),
+                ("year", models.IntegerField()),
+                ("month", models.IntegerField()),
+                ("count", models.BigIntegerField(default=0)),
+                ("updated_at", models.DateTimeField()),
+            ],
+            options={
+                "db_table": "genie_usage_counters",
+                "unique_together": {("scope", "scope_id", "year", "month")},
+            },
+            managers=[
+                ("objects", psqlextra.manager.manager.PostgresManager()),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="geniechathistory",
+            index=models.Index(
+                fields=["company_id", "datetime"], name="genie_chat__company_8f185d_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.15 on 2026-10-18 10:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("genie", "0002_genieusagecounters_and_more"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="geniechathistory",
+            index=models.Index(
+                fields=["genie_users_id", "resourcename", "datetime", "id"],
+                name="genie_chat__genie_u_952474_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="geniechathistory",
+            index=models.Index(
+                fields=["company_id", "resourcename", "datetime", "id"],
+                name="genie_chat__company_e7e594_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,109 @@
+# Generated by Django 4.2.15 on 2026-10-18 11:40
+
+from django.db import migrations, models
+import psqlextra.manager.manager
+
+BACKFILL_SQL = """
+INSERT INTO genie_chat_history_latest (
+    genie_users_id, company_id, user_id_slack, team_id_slack, client_type, resourcename, db_schema,
+    db_warehouse, question_hash, answered_only, history_id, datetime
+)
+SELECT DISTINCT ON (1, 2, 3, 4, 5, 6, 7, 8, 9, 10)
+    gh.genie_users_id, gh.company_id, COALESCE(gh.user_id_slack, ''), COALESCE(gh.team_id_slack, ''),
+    COALESCE(gh.client_type, 0), COALESCE(gh.resourcename, ''), COALESCE(gh.db_schema, ''),
+    COALESCE(gh.db_warehouse, ''), gh.question_hash, flag.answered_only, gh.id, gh.datetime
+FROM genie_chat_history gh
+CROSS JOIN (VALUES (false), (true)) AS flag(answered_only)
+WHERE gh.question_hash IS NOT NULL
+AND (NOT flag.answered_only OR (gh.answer IS NOT NULL AND gh.results_len > 0))
+ORDER BY 1, 2, 3, 4, 5, 6, 7, 8, 9, 10, gh.datetime DESC, gh.id DESC;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("genie", "0003_geniechathistory_keyset_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="GenieChatHistoryLatest",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("genie_users_id", models.BigIntegerField()),
+                ("company_id", models.BigIntegerField()),
+                ("user_id_slack", models.CharField(blank=True, default="", max_length=32)),
+                ("team_id_slack", models.CharField(blank=True, default="", max_length=32)),
+                ("client_type", models.FloatField(default=0)),
+                ("resourcename", models.CharField(blank=True, default="", max_length=512)),
+                ("db_schema", models.CharField(blank=True, default="", max_length=255)),
+                ("db_warehouse", models.CharField(blank=True, default="", max_length=255)),
+                ("question_hash", models.CharField(max_length=64)),
+                ("answered_only", models.BooleanField(default=False)),
+                ("history_id", models.BigIntegerField()),
+                ("datetime", models.DateTimeField()),
+            ],
+            options={
+                "db_table": "genie_chat_history_latest",
+                "unique_together": {
+                    (
+                        "genie_users_id",
+                        "company_id",
+                        "user_id_slack",
+                        "team_id_slack",
+                        "client_type",
+                        "resourcename",
+                        "db_schema",
+                        "db_warehouse",
+                        "question_hash",
+                        "answered_only",
+                    )
+                },
+            },
+            managers=[
+                ("objects", psqlextra.manager.manager.PostgresManager()),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="geniechathistorylatest",
+            index=models.Index(
+                fields=["company_id", "resourcename", "answered_only", "question_hash", "datetime"],
+                name="genie_chat__company_34f935_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="geniechathistorylatest",
+            index=models.Index(
+                fields=["genie_users_id", "resourcename", "answered_only", "question_hash", "datetime"],
+                name="genie_chat__genie_u_a1d899_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="geniechathistorylatest",
+            index=models.Index(
+                fields=[
+                    "user_id_slack",
+                    "team_id_slack",
+                    "resourcename",
+                    "answered_only",
+                    "question_hash",
+                    "datetime",
+                ],
+                name="genie_chat__user_id_95e837_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="geniechathistorylatest",
+            index=models.Index(fields=["history_id"], name="genie_chat__history_642cd6_idx"),
+        ),
+        migrations.RunSQL(BACKFILL_SQL, reverse_sql=migrations.RunSQL.noop),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 4.2.15 on 2026-10-18 13:05
+
+import datetime
+from django.db import migrations, models
+import psqlextra.manager.manager
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("genie", "0004_geniechathistorylatest"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="GenieTableEmbeddings",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("content_hash", models.CharField(max_length=64, unique=True)),
+                ("model", models.CharField(max_length=128)),
+                ("dims", models.IntegerField()),
+                ("embedding", models.BinaryField()),
+                ("datetime", models.DateTimeField(default=datetime.datetime.now)),
+            ],
+            options={
+                "db_table": "genie_table_embeddings",
+            },
+            managers=[
+                ("objects", psqlextra.manager.manager.PostgresManager()),
+            ],
+        ),
+    ]
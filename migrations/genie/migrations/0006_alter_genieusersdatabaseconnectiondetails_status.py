@@ -0,0 +1,26 @@
+# Generated by Django 4.2.15 on 2026-10-18 14:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("genie", "0005_genietableembeddings"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="genieusersdatabaseconnectiondetails",
+            name="status",
+            field=models.CharField(
+                choices=[
+                    ("PENDING", "PENDING"),
+                    ("COMPLETED", "COMPLETED"),
+                    ("FAILED", "FAILED"),
+                ],
+                default="COMPLETED",
+                max_length=15,
+            ),
+        ),
+    ]
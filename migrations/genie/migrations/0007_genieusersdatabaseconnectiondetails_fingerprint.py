@@ -0,0 +1,18 @@
+# Generated by Django 4.2.15 on 2026-10-18 15:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("genie", "0006_alter_genieusersdatabaseconnectiondetails_status"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="genieusersdatabaseconnectiondetails",
+            name="fingerprint",
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 4.2.15 on 2026-10-18 16:40
+
+import datetime
+from django.db import migrations, models
+import django.db.models.deletion
+import psqlextra.manager.manager
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("genie", "0007_genieusersdatabaseconnectiondetails_fingerprint"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="GenieUsersDatabaseConnectionDetailsValueIndex",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("table_name", models.CharField(max_length=255)),
+                ("db_schema", models.CharField(blank=True, default="", max_length=255)),
+                ("db_warehouse", models.CharField(blank=True, default="", max_length=255)),
+                ("resourcename", models.CharField(blank=True, default="", max_length=512)),
+                ("column_name", models.CharField(max_length=512)),
+                ("value_count", models.IntegerField(default=0)),
+                ("value_index", models.BinaryField()),
+                ("datetime", models.DateTimeField(default=datetime.datetime.now)),
+                (
+                    "company_id",
+                    models.ForeignKey(
+                        db_column="company_id",
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="genie.geniecompanies",
+                    ),
+                ),
+            ],
+            options={
+                "db_table": "genie_users_db_connection_details_value_index",
+                "unique_together": {
+                    ("table_name", "db_schema", "db_warehouse", "resourcename", "company_id", "column_name")
+                },
+            },
+            managers=[
+                ("objects", psqlextra.manager.manager.PostgresManager()),
+            ],
+        ),
+    ]
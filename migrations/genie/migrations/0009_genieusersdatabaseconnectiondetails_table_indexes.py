@@ -0,0 +1,18 @@
+# Generated by Django 4.2.15 on 2026-10-18 19:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("genie", "0008_genieusersdatabaseconnectiondetailsvalueindex"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="genieusersdatabaseconnectiondetails",
+            name="table_indexes",
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
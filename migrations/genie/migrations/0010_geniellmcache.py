@@ -0,0 +1,42 @@
+# Generated by Django 4.2.15 on 2026-10-18 20:04
+
+import datetime
+from django.db import migrations, models
+import psqlextra.manager.manager
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("genie", "0009_genieusersdatabaseconnectiondetails_table_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="GenieLLMCache",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("prompt_hash", models.CharField(max_length=64, unique=True)),
+                ("response", models.JSONField(default=list)),
+                ("size", models.IntegerField(default=0)),
+                ("hits", models.IntegerField(default=0)),
+                ("last_hit", models.DateTimeField(default=datetime.datetime.now)),
+                ("datetime", models.DateTimeField(default=datetime.datetime.now)),
+            ],
+            options={
+                "db_table": "genie_llm_cache",
+                "indexes": [models.Index(fields=["last_hit"], name="genie_llm_c_last_hi_7da859_idx")],
+            },
+            managers=[
+                ("objects", psqlextra.manager.manager.PostgresManager()),
+            ],
+        ),
+    ]
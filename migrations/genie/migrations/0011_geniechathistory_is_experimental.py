@@ -0,0 +1,24 @@
+# Generated by Django 4.2.15 on 2026-10-18 22:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("genie", "0010_geniellmcache"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="geniechathistory",
+            name="is_experimental",
+            field=models.BooleanField(default=False),
+        ),
+        # guardrails inserted with raw SQL have no datetime, count them as changed now so no earlier answer is
+        # served from the answer cache
+        migrations.RunSQL(
+            "UPDATE genie_users_db_guardrails SET datetime = NOW() WHERE datetime IS NULL;",
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
@@ -84,6 +84,7 @@ class GenieUsersDatabaseConnectionDetails(PostgresModel):
     status = models.CharField(
         max_length=15,
         choices=[
+            ('PENDING', 'PENDING'),
             ('COMPLETED', 'COMPLETED'),
             ('FAILED', 'FAILED')
         ],
@@ -93,6 +94,8 @@ class GenieUsersDatabaseConnectionDetails(PostgresModel):
     genie_users = models.ForeignKey(GenieUsers, on_delete=models.CASCADE, db_column='genie_users_id')
     description = models.CharField(max_length=8192, null=True, blank=True)
     table_schema = models.CharField(max_length=16384, null=True, blank=True)
+    fingerprint = models.CharField(max_length=64, null=True, blank=True)  # see src/db/schema_snapshot.py
+    table_indexes = models.JSONField(null=True, blank=True)  # {"name": "","unique": false,"column_names": [""]}
 
     class Meta:
         db_table = 'genie_users_db_connection_details'
@@ -104,6 +107,35 @@ class GenieUsersDatabaseConnectionDetails(PostgresModel):
         ordering = ["-datetime"]
 
 
+class GenieTableEmbeddings(PostgresModel):
+    # sha256 of the embedding model and the table representation, see src/db/table_embeddings.py
+    content_hash = models.CharField(max_length=64, unique=True)
+    model = models.CharField(max_length=128)
+    dims = models.IntegerField()
+    embedding = models.BinaryField()  # float32 little-endian
+    datetime = models.DateTimeField(default=datetime.now)
+
+    class Meta:
+        db_table = "genie_table_embeddings"
+
+
+class GenieLLMCache(PostgresModel):
+    # sha256 of the model parameters and the prompt, see src/db/llm_cache.py
+    prompt_hash = models.CharField(max_length=64, unique=True)
+    response = models.JSONField(default=list)  # serialized generations
+    size = models.IntegerField(default=0)
+    hits = models.IntegerField(default=0)
+    # declared before datetime, which shadows the datetime module for the rest of the class body
+    last_hit = models.DateTimeField(default=datetime.now)
+    datetime = models.DateTimeField(default=datetime.now)
+
+    class Meta:
+        db_table = "genie_llm_cache"
+        indexes = [
+            models.Index(fields=["last_hit"]),
+        ]
+
+
 class GenieUsersDatabaseConnectionDetailsDescription(PostgresModel):
     table_name = models.CharField(max_length=255)
     db_schema = models.CharField(max_length=255, blank=True, default="")
@@ -131,6 +163,23 @@ class GenieUsersDatabaseConnectionDetailsDescription(PostgresModel):
         ordering = ["-datetime"]
 
 
+class GenieUsersDatabaseConnectionDetailsValueIndex(PostgresModel):
+    table_name = models.CharField(max_length=255)
+    db_schema = models.CharField(max_length=255, blank=True, default="")
+    db_warehouse = models.CharField(max_length=255, blank=True, default="")
+    resourcename = models.CharField(max_length=512, blank=True, default="")
+    company_id = models.ForeignKey(GenieCompanies, on_delete=models.CASCADE, db_column='company_id', )
+    column_name = models.CharField(max_length=512)
+
+    value_count = models.IntegerField(default=0)
+    value_index = models.BinaryField()  # src/db/value_index.py ValueIndex.to_bytes
+    datetime = models.DateTimeField(default=datetime.now)
+
+    class Meta:
+        db_table = 'genie_users_db_connection_details_value_index'
+        unique_together = ("table_name", "db_schema", "db_warehouse", "resourcename", "company_id", "column_name")
+
+
 class GenieUsersDatabaseGuardrails(PostgresModel):
     table_name = models.CharField(max_length=255, null=True, blank=True)
     db_schema = models.CharField(max_length=255, blank=True, default="")
@@ -193,6 +242,7 @@ class GenieChatHistory(PostgresModel):
     error_msg = models.CharField(max_length=8192, null=True, blank=True)
     client_type = models.FloatField(default=0, null=True, blank=True)  # 0=slack, 1=app,
     results_s3_key = models.CharField(max_length=255, null=True, blank=True)
+    is_experimental = models.BooleanField(default=False)  # answered on the agent path that applies guardrails
 
     class Meta:
         db_table = "genie_chat_history"
@@ -204,8 +254,52 @@ class GenieChatHistory(PostgresModel):
             models.Index(fields=["genie_users_id", "datetime"]),
             models.Index(fields=["genie_users_id", "user_id_slack", "datetime"]),
             models.Index(fields=["company_id", "resourcename", "user_id_slack", "team_id_slack", "genie_users_id"]),
+            models.Index(fields=["company_id", "datetime"]),
+            models.Index(fields=["genie_users_id", "resourcename", "datetime", "id"]),
+            models.Index(fields=["company_id", "resourcename", "datetime", "id"]),
+
+        ]
+
+
+class GenieChatHistoryLatest(PostgresModel):
+    # newest genie_chat_history row per question, maintained by src.db.history.refresh_latest_history
+    genie_users_id = models.BigIntegerField()
+    company_id = models.BigIntegerField()
+    user_id_slack = models.CharField(max_length=32, blank=True, default="")
+    team_id_slack = models.CharField(max_length=32, blank=True, default="")
+    client_type = models.FloatField(default=0)
+    resourcename = models.CharField(max_length=512, blank=True, default="")
+    db_schema = models.CharField(max_length=255, blank=True, default="")
+    db_warehouse = models.CharField(max_length=255, blank=True, default="")
+    question_hash = models.CharField(max_length=64)
+    answered_only = models.BooleanField(default=False)  # latest row with an answer and results_len > 0
+    history_id = models.BigIntegerField()
+    datetime = models.DateTimeField()
 
+    class Meta:
+        db_table = "genie_chat_history_latest"
+        indexes = [
+            models.Index(fields=["company_id", "resourcename", "answered_only", "question_hash", "datetime"]),
+            models.Index(fields=["genie_users_id", "resourcename", "answered_only", "question_hash", "datetime"]),
+            models.Index(
+                fields=["user_id_slack", "team_id_slack", "resourcename", "answered_only", "question_hash", "datetime"]),
+            models.Index(fields=["history_id"]),
         ]
+        unique_together = ("genie_users_id", "company_id", "user_id_slack", "team_id_slack", "client_type",
+                           "resourcename", "db_schema", "db_warehouse", "question_hash", "answered_only")
+
+
+class GenieUsageCounters(PostgresModel):
+    scope = models.CharField(max_length=16)  # company, user
+    scope_id = models.BigIntegerField()  # genie_companies.id or genie_users.id
+    year = models.IntegerField()
+    month = models.IntegerField()
+    count = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField()
+
+    class Meta:
+        db_table = "genie_usage_counters"
+        unique_together = ("scope", "scope_id", "year", "month")
 
 
 class GenieApprovedQuestions(PostgresModel):
@@ -0,0 +1,124 @@
+import json
+from typing import Optional
+
+from django.http import JsonResponse
+from ninja import Router
+from pydantic.main import BaseModel
+
+from config.settings.base import AGENT_LLM_MODEL, AGENT_LLM_ENGINE, TEMPERATURE
+from src.db.db_utils import get_custom_driver_connection
+from src.db.history import create_or_update_history, update_history_with_error
+from src.db.login_helpers import getConn
+from src.db.table_info_helpers import get_genie_users_db_connection_details_by_company_id_join_column_description
+from src.query_engine.langchain_sql_agent import generate_query_with_langchain_custom_agent
+from src.query_engine.streaming import QueueCallbackHandler
+from src.db.utils import CustomJSONEncoder
+from src.utils.event_stream import EventStream, produce, sse_response
+
+stream_router = Router(tags=['Stream'])
+
+# genie_chat_history.status and client_type
+HISTORY_STATUS_PROCESSING_SQL = 1
+HISTORY_STATUS_COMPLETED_SQL = 2
+HISTORY_STATUS_ERROR = 3
+CLIENT_TYPE_APP = 1
+
+
+class StreamQuestionSchema(BaseModel):
+    question: str
+    resourcename: str
+    db_schema: Optional[str] = ""
+    db_warehouse: Optional[str] = ""
+    # stored with the question, the answer cache matches repeated questions on it
+    question_hash: Optional[str] = ""
+
+
+def result_event(response):
+    return {
+        "type": "result",
+        "history_id": response.get("history_id"),
+        "response": response.get("response"),
+        "sql_query": response.get("sql_query"),
+        "exec_time": response.get("exec_time"),
+        "total_tokens": response.get("total_tokens"),
+        "total_cost": response.get("total_cost"),
+        "cache": response.get("cache"),
+    }
+
+
+@stream_router.post(
+    "/stream/question",
+    by_alias=True,
+    summary="Answer a question, streaming the agent as it works",
+    description="Server-sent events: token (LLM output as it is generated), action (tool call), observation "
+                "(tool output), final (answer), then result (answer and SQL) or error"
+)
+def stream_question(request, payload: StreamQuestionSchema):
+    token_data = request.auth
+    print(f"stream_question, token_data={token_data}")
+
+    user_id = token_data["user_id"]
+    company_id = token_data["company_id"]
+
+    engine, db_type = get_custom_driver_connection(resourcename=payload.resourcename, company_id=company_id)
+    if engine is None:
+        return JsonResponse({'error': {'message': "Invalid database connection."}}, status=400)
+
+    list_tables = get_genie_users_db_connection_details_by_company_id_join_column_description(
+        conn=getConn(), company_id=company_id, db_schema=payload.db_schema, resourcename=payload.resourcename,
+        db_warehouse=payload.db_warehouse,
+    )
+    if len(list_tables) == 0:
+        return JsonResponse({'error': {'message': "The database connection was not scanned yet."}}, status=404)
+
+    # saved before the agent starts like every other question, so it counts towards usage and the quota
+    history = dict(
+        question=payload.question, genie_users_id=user_id, team_id_slack=None, user_id_slack=None,
+        company_id=company_id, db_schema=payload.db_schema, resourcename=payload.resourcename,
+        ai_engine=AGENT_LLM_ENGINE, question_hash=payload.question_hash or "", db_warehouse=payload.db_warehouse,
+        ai_model=AGENT_LLM_MODEL, ai_temp=TEMPERATURE, client_type=CLIENT_TYPE_APP,
+        is_experimental=True,
+    )
+    history_id = create_or_update_history(
+        conn=getConn(), answer=None, status=HISTORY_STATUS_PROCESSING_SQL, **history)
+    if history_id is None:
+        return JsonResponse({'error': {'message': "Failed to save the question."}}, status=500)
+
+    # the agent runs in its own thread, the response streams what it puts on the queue until the client leaves
+    stream = EventStream()
+    handler = QueueCallbackHandler(stream)
+
+    def answer():
+        try:
+            response = generate_query_with_langchain_custom_agent(
+                question=payload.question,
+                engine=engine,
+                context=[],
+                db_schema=payload.db_schema,
+                company_id=company_id,
+                resourcename=payload.resourcename,
+                genie_users_id=user_id,
+                # always the experimental path, the only one that applies the user's guardrails
+                is_experimental=True,
+                list_tables=list_tables,
+                db_warehouse=payload.db_warehouse,
+                question_hash=payload.question_hash or None,
+                callbacks=[handler],
+            )
+        except Exception as e:
+            update_history_with_error(
+                conn=getConn(), id=history_id, error_msg=str(e) or type(e).__name__, ai_response="",
+                status=HISTORY_STATUS_ERROR,
+            )
+            raise
+        create_or_update_history(
+            conn=getConn(), id=history_id, answer=response.get("sql_query"),
+            is_answered=bool(response.get("sql_query")), ai_response=response.get("response"),
+            intermediate_steps=json.dumps(response.get("intermediate_steps", []), cls=CustomJSONEncoder),
+            total_tokens=response.get("total_tokens"), total_cost=response.get("total_cost"),
+            total_time=response.get("exec_time"), status=HISTORY_STATUS_COMPLETED_SQL, **history,
+        )
+        return dict(response, history_id=history_id)
+
+    produce(stream, answer, on_result=result_event)
+    return sse_response(stream)
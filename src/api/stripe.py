@@ -10,8 +10,9 @@ import json
 
 from config.settings.base import STRIPE_SECRET_KEY, STRIPE_PUBLISHABLE_KEY, STRIPE_WEBHOOK_SECRET, \
     STRIPE_TRIAL_PERIOD_DAYS
+from src.auth.auth_cache import invalidate_api_key_auth_cache
 from src.db.api_helpers import create_or_update_user_keys
-from src.db.history import get_chat_history_list_by_company_id
+from src.db.history import get_chat_history_list_by_company_id, HISTORY_USAGE_REPORT_COLUMNS
 from src.db.login_helpers import getConn, get_user_by_id
 from src.db.stripe_helpers import get_genie_payment_plan, insert_or_update_genie_users_payments, \
     get_genie_payment_history, update_status_genie_users_payments_by_subscription_id, \
@@ -194,6 +195,7 @@ def create_subscription(
             company_id=company_id,
             subscription_item_id=subscription_item_id,
         )
+        invalidate_api_key_auth_cache(genie_users_id=user_id)
 
         return {
             'clientSecret': client_secret,
@@ -335,6 +337,7 @@ def cancel_subscription(request):
     try:
         # Cancel the subscription by deleting it
         deleted_subscription = stripe.Subscription.delete(subscription_id)
+        invalidate_api_key_auth_cache(genie_users_id=user_id, subscription_id=subscription_id)
         return JsonResponse({'subscription': deleted_subscription}, status=200)
     except Exception as e:
         return JsonResponse({'error': {'message': str(e)}}, status=400)
@@ -401,10 +404,13 @@ def webhook_received(request):
             genie_users_id=genie_users_id,
             company_id=company_id
         )
+        # the plan and the key hash may both have changed, drop what authenticate cached for this user
+        invalidate_api_key_auth_cache(genie_users_id=genie_users_id, subscription_id=subscription_id)
 
         # Handle the customer.subscription.updated event
     if event_type == 'customer.subscription.updated':
         print(f'💰Subscription updated!, subscription_id={subscription_id}')
+        invalidate_api_key_auth_cache(subscription_id=subscription_id)
 
         previous_subscription = data['previous_attributes']
 
@@ -483,6 +489,7 @@ def get_usage_pdf(
         company_id=company_id,
         year=year,
         month=month,
+        columns=HISTORY_USAGE_REPORT_COLUMNS,
     )
 
     pdf = create_pdf(data_list=chat_history_list)
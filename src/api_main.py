@@ -13,8 +13,10 @@ from src.api.stripe import stripe_router
 from src.api.account import account_router
 
 from src.api.login import login_router
+from src.api.stream import stream_router
 # from src.api.table_info import table_info_router
 from src.auth.custom_auth import CustomAuth
+from src.db.history import InvalidHistoryCursor
 
 custom_auth = CustomAuth(API_KEYS)
 api = NinjaAPI(
@@ -22,10 +24,18 @@ api = NinjaAPI(
     version="v0.1.3",
 )
 
+
+
+@api.exception_handler(InvalidHistoryCursor)
+def invalid_history_cursor(request, exc):
+    return api.create_response(request, {'error': {'message': "Invalid page_cursor."}}, status=400)
+
+
 # api.add_router("", openapi_router)
 # api.add_router("", openapi_stream_router)
 api.add_router("", stripe_router)
 api.add_router("", account_router)
+api.add_router("", stream_router)
 # api.add_router("", editor_router)
 # api.add_router("", table_info_router)
 # api.add_router("", guardrails_router)
@@ -0,0 +1,52 @@
+import hashlib
+import threading
+
+from config.settings.base import API_KEY_AUTH_CACHE_TTL, API_KEY_AUTH_CACHE_MAX_SIZE, API_KEY_USAGE_FLUSH_EVERY
+from src.utils.ttl_cache import TTLCache
+
+# raw key digest -> {"api_key_obj", "payments_and_plan", "usage_count"}
+api_key_auth_cache = TTLCache(maxsize=API_KEY_AUTH_CACHE_MAX_SIZE, ttl=API_KEY_AUTH_CACHE_TTL)
+
+# genie_api_keys.id -> usage_count increments not yet written to the db
+_pending_usage = {}
+_pending_usage_lock = threading.Lock()
+
+
+def api_key_cache_key(key):
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+def add_pending_usage(api_key_id):
+    """Count one cached authentication; returns the batch to flush once it reaches API_KEY_USAGE_FLUSH_EVERY."""
+    with _pending_usage_lock:
+        pending = _pending_usage.get(api_key_id, 0) + 1
+        if pending >= API_KEY_USAGE_FLUSH_EVERY:
+            _pending_usage.pop(api_key_id, None)
+            return pending
+        _pending_usage[api_key_id] = pending
+        return 0
+
+
+def take_pending_usage(api_key_id):
+    with _pending_usage_lock:
+        return _pending_usage.pop(api_key_id, 0)
+
+
+def invalidate_api_key_auth_cache(genie_users_id=None, company_id=None, subscription_id=None):
+    """Drops the cached authentications of a user, company or subscription in this process only. The other workers
+    keep serving their cached plan and usage until it expires, at most API_KEY_AUTH_CACHE_TTL seconds."""
+    def matches(_, entry):
+        api_key_obj = entry["api_key_obj"]
+        payments_and_plan = entry["payments_and_plan"]
+        if genie_users_id is not None and api_key_obj["genie_users_id"] == genie_users_id:
+            return True
+        if company_id is not None and api_key_obj["company_id"] == company_id:
+            return True
+        if subscription_id is not None and payments_and_plan["subscription_id"] == subscription_id:
+            return True
+        return False
+
+    removed = api_key_auth_cache.invalidate_where(matches)
+    print(
+        f"invalidate_api_key_auth_cache, genie_users_id={genie_users_id}, company_id={company_id}, subscription_id={subscription_id}, removed={removed}")
+    return removed
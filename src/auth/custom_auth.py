@@ -12,9 +12,10 @@ from ninja.security import APIKeyHeader
 from config.settings.base import AUTH_DISABLED, API_KEYS_SECRET_KEY, API_KEYS_SECRET_HASHER
 from starlette.exceptions import HTTPException as HttpError
 
+from src.auth.auth_cache import api_key_auth_cache, api_key_cache_key, add_pending_usage, take_pending_usage
 from src.auth.jwt_auth import AuthBearer
 from src.db.history import get_chat_history_count_by_genie_users_id, get_chat_history_count_by_company_id
-from src.db.login_helpers import getConn, login_user_with_key_genie
+from src.db.login_helpers import getConn, login_user_with_key_genie, add_genie_api_key_usage_count
 from src.db.stripe_helpers import get_genie_users_payments_by_genie_users_id, get_stripe_subscription
 from src.db.utils import create_fake_user
 
@@ -45,6 +46,41 @@ class APIKey(APIKeyHeader):
         self.keys = keys
         print(f"APIKeys, __init__, keys={keys}")
 
+    def _resolve_key(self, key, url_path):
+        # api_key_obj = login_user_with_key(getConn(), key)
+        key_hash = make_password(password=key, salt=API_KEYS_SECRET_KEY, hasher=API_KEYS_SECRET_HASHER)
+        api_key_obj = login_user_with_key_genie(conn=getConn(), key_hash=key_hash)
+        print(f"APIKey, _resolve_key, key_hash={key_hash}, api_key_obj={api_key_obj}")
+        if api_key_obj is None:
+            raise DoesNotExist()
+
+        pending = take_pending_usage(api_key_obj["id"])
+        if pending > 0:
+            add_genie_api_key_usage_count(conn=getConn(), id=api_key_obj["id"], count=pending)
+
+        genie_users_id = api_key_obj["genie_users_id"]
+        company_id = api_key_obj["company_id"]
+        usage_count = get_chat_history_count_by_company_id(conn=getConn(), company_id=company_id)
+        print(f"APIKey, _resolve_key, usage_count={usage_count}")
+
+        if usage_count is None:
+            print(
+                f"APIKey, _resolve_key, Forbidden, Failed to calculate usage. allowed_paths={api_key_obj['allowed_paths']}, url_path={url_path}")
+            raise QuotaExceeded()
+
+        genie_users_payments_and_plan = get_genie_users_payments_by_genie_users_id(conn=getConn(),
+                                                                                   genie_users_id=genie_users_id)
+        print(f"APIKey, _resolve_key, genie_users_payments_and_plan={genie_users_payments_and_plan}")
+        if not genie_users_payments_and_plan or len(genie_users_payments_and_plan) == 0:
+            print(f"APIKey, _resolve_key, QuotaExceeded, usage_count={usage_count}, url_path={url_path}")
+            raise QuotaExceeded()
+
+        return {
+            "api_key_obj": api_key_obj,
+            "payments_and_plan": genie_users_payments_and_plan,
+            "usage_count": usage_count,
+        }
+
     def authenticate(self, request, key):
         url_path = request.path
         if key is None:
@@ -56,35 +92,27 @@ class APIKey(APIKeyHeader):
             if key in self.keys:
                 return create_fake_user(url_path)
 
-            # api_key_obj = login_user_with_key(getConn(), key)
-            key_hash = make_password(password=key, salt=API_KEYS_SECRET_KEY, hasher=API_KEYS_SECRET_HASHER)
-            api_key_obj = login_user_with_key_genie(conn=getConn(), key_hash=key_hash)
-            print(f"APIKey, authenticate, key_hash={key_hash}, api_key_obj={api_key_obj}")
-            if api_key_obj is None:
-                raise DoesNotExist()
+            cache_key = api_key_cache_key(key)
+            entry = api_key_auth_cache.get(cache_key)
+            if entry is None:
+                entry = self._resolve_key(key, url_path)
+                api_key_auth_cache.set(cache_key, entry)
+            else:
+                # login_user_with_key_genie is skipped on a hit, so its usage_count bump is batched here
+                pending = add_pending_usage(entry["api_key_obj"]["id"])
+                if pending > 0:
+                    add_genie_api_key_usage_count(conn=getConn(), id=entry["api_key_obj"]["id"], count=pending)
+
+            api_key_obj = entry["api_key_obj"]
+            genie_users_payments_and_plan = entry["payments_and_plan"]
+            usage_count = entry["usage_count"]
+
             allowed_paths = api_key_obj["allowed_paths"]
             if len(allowed_paths) > 0 and url_path not in allowed_paths:
                 print(
                     f"APIKey, authenticate, Forbidden, allowed_paths={allowed_paths}, key={key}, self.keys={self.keys}, url_path={url_path}")
                 raise Forbidden()
 
-            genie_users_id = api_key_obj["genie_users_id"]
-            company_id = api_key_obj["company_id"]
-            usage_count = get_chat_history_count_by_company_id(conn=getConn(), company_id=company_id)
-            print(f"APIKey, authenticate, usage_count={usage_count}")
-
-            if usage_count is None:
-                print(
-                    f"APIKey, authenticate, Forbidden, Failed to calculate usage. allowed_paths={allowed_paths}, url_path={url_path}")
-                raise QuotaExceeded()
-
-            genie_users_payments_and_plan = get_genie_users_payments_by_genie_users_id(conn=getConn(),
-                                                                                       genie_users_id=genie_users_id)
-            print(f"APIKey, authenticate, genie_users_payments_and_plan={genie_users_payments_and_plan}")
-            if not genie_users_payments_and_plan or len(genie_users_payments_and_plan) == 0:
-                print(f"APIKey, authenticate, QuotaExceeded, usage_count={usage_count}, url_path={url_path}")
-                raise QuotaExceeded()
-
             usage_limit = genie_users_payments_and_plan["amount"]
             subscription_id = genie_users_payments_and_plan["subscription_id"]
             subscription_current_period_end_date = genie_users_payments_and_plan["subscription_current_period_end_date"]
@@ -0,0 +1,49 @@
+import abc
+from typing import Any, List
+
+
+def chunks(items: List, size: int):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def get_embedding_client():
+    """Process-wide OpenAIEmbeddings client shared by the context store backends."""
+    from config.settings.base import PINECONE_EMBEDDING_MODEL
+    from src.query_engine.llm_clients import get_embeddings
+
+    return get_embeddings(PINECONE_EMBEDDING_MODEL)
+
+
+class ContextStoreBackend(abc.ABC):
+    """Vector store for golden records, one namespace per company_id.
+
+    query returns matches shaped like Pinecone's: {"id": str, "score": float, "metadata": dict}
+    """
+
+    @abc.abstractmethod
+    def query(
+            self,
+            query_text: str,
+            company_id: str,
+            index_name: str,
+            num_results: int,
+            resourcename: str,
+            db_schema: str,
+    ) -> list:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def add_records(
+            self,
+            company_id: str,
+            documents: List[str],
+            index_name: str,
+            metadata: List[Any],
+            ids: List,
+    ) -> dict:
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def delete_records(self, index_name: str, company_id: str, ids: List):
+        raise NotImplementedError
@@ -4,7 +4,8 @@ from typing import List, Tuple
 
 from sql_metadata import Parser
 
-from src.context_store.pinecone_store import pinecone_add_record, pinecone_query, pinecone_delete_record
+from config.settings.base import CONTEXT_STORE_BACKEND, CONTEXT_STORE_LOCAL_PATH, PINECONE_EMBED_BATCH_SIZE
+from src.context_store.base import ContextStoreBackend
 from src.db.guardrails import list_genie_users_db_guardrails
 from src.db.history import get_history_by_id
 from src.db.login_helpers import getConn
@@ -13,6 +14,22 @@ logger = logging.getLogger(__name__)
 
 GOLDEN_RECORDS_INDEX_NAME = "golden-records"
 
+_context_store = None
+
+
+def get_context_store() -> ContextStoreBackend:
+    global _context_store
+    if _context_store is None:
+        if CONTEXT_STORE_BACKEND == "local":
+            from src.context_store.local_store import LocalContextStore
+            _context_store = LocalContextStore(CONTEXT_STORE_LOCAL_PATH, embed_batch_size=PINECONE_EMBED_BATCH_SIZE)
+        elif CONTEXT_STORE_BACKEND == "pinecone":
+            from src.context_store.pinecone_store import PineconeContextStore
+            _context_store = PineconeContextStore()
+        else:
+            raise ValueError(f"get_context_store, unknown CONTEXT_STORE_BACKEND={CONTEXT_STORE_BACKEND}")
+    return _context_store
+
 
 def retrieve_context_for_question(
         question: str,
@@ -26,7 +43,7 @@ def retrieve_context_for_question(
     logger.info(f"Getting context for {question}")
     try:
         # TODO: add db_warehouse ?
-        closest_questions = pinecone_query(
+        closest_questions = get_context_store().query(
             query_text=question,
             company_id=company_id,
             index_name=GOLDEN_RECORDS_INDEX_NAME,
@@ -35,7 +52,7 @@ def retrieve_context_for_question(
             db_schema=db_schema,
         )
     except Exception as e:
-        print(f"Error, retrieve_context_for_question, pinecone_query: error={e}")
+        print(f"Error, retrieve_context_for_question, context store query: error={e}")
         traceback.print_exc()
         closest_questions = []
 
@@ -76,6 +93,9 @@ def add_golden_records(
         db_schema: str,
 ) -> List:
     returned_golden_records = []
+    documents = []
+    metadata = []
+    ids = []
     for record in golden_records:
         question = record["question"]
         answer = record["answer"]
@@ -87,27 +107,31 @@ def add_golden_records(
             "answer": answer,
         }
         returned_golden_records.append(golden_record)
-        pinecone_add_record(
-            documents=question,
+        documents.append(question)
+        metadata.append(
+            {
+                "tables_used": tables_used,
+                "resourcename": resourcename,
+                "db_schema": db_schema,
+            }
+        )  # this should be updated for multiple tables
+        ids.append(str(id))
+
+    if len(documents) > 0:
+        get_context_store().add_records(
+            documents=documents,
             company_id=company_id,
             index_name=GOLDEN_RECORDS_INDEX_NAME,
-            metadata=[
-                {
-                    "tables_used": tables_used,
-                    "resourcename": resourcename,
-                    "db_schema": db_schema,
-                }
-            ],  # this should be updated for multiple tables
-            ids=[str(id)],
+            metadata=metadata,
+            ids=ids,
         )
     return returned_golden_records
 
 
 def remove_golden_records(company_id: str, ids: List) -> bool:
-    for id in ids:
-        pinecone_delete_record(
-            index_name=GOLDEN_RECORDS_INDEX_NAME,
-            company_id=company_id,
-            id=id
-        )
+    get_context_store().delete_records(
+        index_name=GOLDEN_RECORDS_INDEX_NAME,
+        company_id=company_id,
+        ids=ids,
+    )
     return True
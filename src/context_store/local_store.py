@@ -0,0 +1,227 @@
+import contextlib
+import fcntl
+import json
+import os
+import tempfile
+import threading
+import time
+from typing import Any, List
+
+import numpy as np
+
+from src.context_store.base import ContextStoreBackend, chunks, get_embedding_client
+
+VECTORS_FILE = "vectors.f32"
+RECORDS_FILE = "records.json"
+LOCK_FILE = ".lock"
+
+
+class _Namespace:
+    """Loaded vectors of one (index_name, company_id) namespace, rows are L2-normalized float32."""
+
+    __slots__ = ("ids", "metadata", "vectors", "version", "_columns")
+
+    def __init__(self, ids, metadata, vectors, version):
+        self.ids = ids
+        self.metadata = metadata
+        self.vectors = vectors
+        self.version = version
+        self._columns = {}
+
+    def column(self, key):
+        values = self._columns.get(key)
+        if values is None:
+            values = np.array([meta.get(key) for meta in self.metadata], dtype=object)
+            self._columns[key] = values
+        return values
+
+
+@contextlib.contextmanager
+def _flock(directory, exclusive):
+    """Lock of a namespace directory shared by every process using it, writers hold it exclusively for the whole
+    read-modify-write so gunicorn workers adding records at once do not drop each other's records."""
+    with open(os.path.join(directory, LOCK_FILE), "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _replace(directory, name, write):
+    """Writes name through a temporary file in the same directory and renames it into place."""
+    fd, path = tempfile.mkstemp(dir=directory, prefix=name + ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path, os.path.join(directory, name))
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(path)
+        raise
+
+
+def _normalize(vectors):
+    vectors = np.asarray(vectors, dtype="<f4")
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class LocalContextStore(ContextStoreBackend):
+    """Golden records kept on local disk, one memory-mapped float32 matrix per company namespace.
+
+    Layout: {root_dir}/{index_name}/{company_id}/vectors.f32 and records.json (ids, metadata, dims).
+    Writes hold an exclusive flock on the namespace's .lock file and rename both files into place, readers reload
+    a namespace under a shared flock when records.json changes, so they never see one file without the other.
+    """
+
+    def __init__(self, root_dir, embedding=None, embed_batch_size=512):
+        self.root_dir = root_dir
+        self.embed_batch_size = embed_batch_size
+        self._embedding = embedding
+        self._namespaces = {}
+        self._lock = threading.Lock()
+
+    @property
+    def embedding(self):
+        if self._embedding is None:
+            self._embedding = get_embedding_client()
+        return self._embedding
+
+    def _directory(self, index_name, company_id):
+        return os.path.join(self.root_dir, index_name, str(company_id))
+
+    def _version(self, records_path):
+        try:
+            stat = os.stat(records_path)
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns
+
+    def _load(self, index_name, company_id, locked=False):
+        """locked: the caller holds the exclusive flock (flock would block on a second lock of the same file)."""
+        directory = self._directory(index_name, company_id)
+        records_path = os.path.join(directory, RECORDS_FILE)
+        key = (index_name, str(company_id))
+        if self._version(records_path) is None:
+            self._namespaces.pop(key, None)
+            return _Namespace([], [], np.zeros((0, 0), dtype="<f4"), None)
+
+        namespace = self._namespaces.get(key)
+        if namespace is not None and namespace.version == self._version(records_path):
+            return namespace
+
+        with contextlib.nullcontext() if locked else _flock(directory, exclusive=False):
+            version = self._version(records_path)
+            with open(records_path) as f:
+                records = json.load(f)
+            ids = records["ids"]
+            if len(ids) > 0:
+                vectors = np.memmap(
+                    os.path.join(directory, VECTORS_FILE), dtype="<f4", mode="r", shape=(len(ids), records["dims"])
+                )
+            else:
+                vectors = np.zeros((0, records["dims"]), dtype="<f4")
+        namespace = _Namespace(ids, records["metadata"], vectors, version)
+        self._namespaces[key] = namespace
+        return namespace
+
+    def _save(self, index_name, company_id, ids, metadata, vectors):
+        # called with the namespace's exclusive flock held
+        directory = self._directory(index_name, company_id)
+        records = {"ids": ids, "metadata": metadata, "dims": int(vectors.shape[1])}
+        _replace(directory, VECTORS_FILE, lambda f: f.write(np.ascontiguousarray(vectors, dtype="<f4").tobytes()))
+        _replace(directory, RECORDS_FILE, lambda f: f.write(json.dumps(records).encode("utf-8")))
+
+    @contextlib.contextmanager
+    def _writing(self, index_name, company_id):
+        directory = self._directory(index_name, company_id)
+        os.makedirs(directory, exist_ok=True)
+        with self._lock, _flock(directory, exclusive=True):
+            yield
+
+    def query(self, query_text, company_id, index_name, num_results, resourcename, db_schema):
+        question = _normalize(self.embedding.embed_query(query_text))
+        with self._lock:
+            namespace = self._load(index_name, company_id)
+        if len(namespace.ids) == 0:
+            return []
+
+        scores = namespace.vectors @ question
+        mask = (namespace.column("resourcename") == resourcename) & (namespace.column("db_schema") == db_schema)
+        candidates = np.flatnonzero(mask)
+        if len(candidates) == 0:
+            return []
+        if len(candidates) > num_results:
+            top = np.argpartition(-scores[candidates], num_results - 1)[:num_results]
+            candidates = candidates[top]
+        candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+        return [
+            {"id": namespace.ids[i], "score": float(scores[i]), "metadata": namespace.metadata[i]}
+            for i in candidates
+        ]
+
+    def add_records(
+            self,
+            company_id: str,
+            documents: List[str],
+            index_name: str,
+            metadata: List[Any],
+            ids: List,
+    ) -> dict:
+        started = time.monotonic()
+        embeds = []
+        for batch in chunks(documents, self.embed_batch_size):
+            embeds.extend(self.embedding.embed_documents(batch))
+        if len(embeds) == 0:
+            return {"records": 0, "upserted": 0, "seconds": 0.0}
+        new_vectors = _normalize(embeds)
+
+        with self._writing(index_name, company_id):
+            namespace = self._load(index_name, company_id, locked=True)
+            all_ids = list(namespace.ids)
+            all_metadata = list(namespace.metadata)
+            if len(all_ids) > 0:
+                vectors = np.array(namespace.vectors)
+            else:
+                vectors = np.zeros((0, new_vectors.shape[1]), dtype="<f4")
+            positions = {id: position for position, id in enumerate(all_ids)}
+            appended = []
+            for id, meta, vector in zip(ids, metadata, new_vectors):
+                id = str(id)
+                position = positions.get(id)
+                if position is None:
+                    positions[id] = len(all_ids)
+                    all_ids.append(id)
+                    all_metadata.append(meta)
+                    appended.append(vector)
+                else:
+                    all_metadata[position] = meta
+                    vectors[position] = vector
+            if len(appended) > 0:
+                vectors = np.vstack([vectors, np.stack(appended)])
+            self._save(index_name, company_id, all_ids, all_metadata, vectors)
+
+        seconds = time.monotonic() - started
+        stats = {"records": len(embeds), "upserted": len(embeds), "seconds": round(seconds, 3)}
+        print(f"LocalContextStore.add_records, index_name={index_name}, company_id={company_id}, stats={stats}")
+        return stats
+
+    def delete_records(self, index_name, company_id, ids):
+        removed = {str(id) for id in ids}
+        with self._writing(index_name, company_id):
+            namespace = self._load(index_name, company_id, locked=True)
+            keep = [position for position, id in enumerate(namespace.ids) if id not in removed]
+            if len(keep) == len(namespace.ids):
+                return 0
+            self._save(
+                index_name,
+                company_id,
+                [namespace.ids[position] for position in keep],
+                [namespace.metadata[position] for position in keep],
+                np.array(namespace.vectors)[keep],
+            )
+        return len(namespace.ids) - len(keep)
@@ -1,12 +1,26 @@
+import time
 from typing import Any, List
 import pinecone
-# from langchain.embeddings import OpenAIEmbeddings
-from langchain_openai import OpenAIEmbeddings
 
-from config.settings.base import OPEN_API_TOKEN, PINECONE_API_KEY, PINECONE_ENVIRONMENT, PINECONE_EMBEDDING_MODEL
+from config.settings.base import PINECONE_API_KEY, PINECONE_ENVIRONMENT, PINECONE_EMBED_BATCH_SIZE, \
+    PINECONE_UPSERT_BATCH_SIZE
+from src.context_store.base import ContextStoreBackend, chunks, get_embedding_client
 
 pinecone.init(api_key=PINECONE_API_KEY, environment=PINECONE_ENVIRONMENT)
 
+# indexes seen by this process, so the per-question path does not call list_indexes
+_known_indexes = set()
+
+
+def pinecone_ensure_index(index_name: str):
+    if index_name in _known_indexes:
+        return
+    indexes = pinecone.list_indexes()
+    print(f"pinecone_ensure_index, indexes={indexes}")
+    if index_name not in indexes:
+        pinecone_create_index(index_name)
+    _known_indexes.add(index_name)
+
 
 def pinecone_query(
         query_text: str,
@@ -17,18 +31,10 @@ def pinecone_query(
         resourcename: str,
         db_schema: str,
 ) -> list:
-    indexes = pinecone.list_indexes()
-    print(f"pinecone_query, indexes={indexes}")
-
-    if index_name not in indexes:
-        pinecone_create_index(index_name)
-
+    pinecone_ensure_index(index_name)
     index = pinecone.Index(index_name)
 
-    embedding = OpenAIEmbeddings(
-        openai_api_key=OPEN_API_TOKEN, model=PINECONE_EMBEDDING_MODEL
-    )
-    xq = embedding.embed_query(query_text)
+    xq = get_embedding_client().embed_query(query_text)
     query_response = index.query(
         queries=[xq],
         filter={
@@ -54,24 +60,59 @@ def pinecone_add_record(
         metadata: Any,
         ids: List,
 ):
-    if index_name not in pinecone.list_indexes():
-        pinecone_create_index(index_name)
-
-    embedding = OpenAIEmbeddings(
-        openai_api_key=OPEN_API_TOKEN, model=PINECONE_EMBEDDING_MODEL
+    return pinecone_add_records(
+        company_id=company_id,
+        documents=[documents],
+        index_name=index_name,
+        metadata=metadata[:1],
+        ids=ids[:1],
     )
+
+
+def pinecone_add_records(
+        company_id: str,
+        documents: List[str],
+        index_name: str,
+        metadata: List,
+        ids: List,
+        embed_batch_size: int = PINECONE_EMBED_BATCH_SIZE,
+        upsert_batch_size: int = PINECONE_UPSERT_BATCH_SIZE,
+) -> dict:
+    """Embeds documents with one embed_documents call per embed_batch_size documents and upserts the
+    vectors upsert_batch_size at a time. The index is checked once per process."""
+    started = time.monotonic()
+    pinecone_ensure_index(index_name)
+    embedding = get_embedding_client()
     index = pinecone.Index(index_name)
-    embeds = embedding.embed_documents([documents])
-    record = [(ids[0], embeds, metadata[0])]
-    index.upsert(
-        vectors=record,
-        namespace=str(company_id)
-    )
+
+    records = list(zip(ids, documents, metadata))
+    embedded = 0
+    upserted = 0
+    for batch in chunks(records, embed_batch_size):
+        embeds = embedding.embed_documents([document for _, document, _ in batch])
+        embedded += len(embeds)
+        vectors = [(str(id), embed, meta) for (id, _, meta), embed in zip(batch, embeds)]
+        for vectors_batch in chunks(vectors, upsert_batch_size):
+            index.upsert(
+                vectors=vectors_batch,
+                namespace=str(company_id)
+            )
+            upserted += len(vectors_batch)
+
+    seconds = time.monotonic() - started
+    stats = {
+        "records": len(records),
+        "embedded": embedded,
+        "upserted": upserted,
+        "seconds": round(seconds, 3),
+        "records_per_second": round(upserted / seconds, 1) if seconds > 0 else upserted,
+    }
+    print(f"pinecone_add_records, index_name={index_name}, company_id={company_id}, stats={stats}")
+    return stats
 
 
 def pinecone_delete_record(index_name: str, company_id: str, id: str):
-    if index_name not in pinecone.list_indexes():
-        pinecone_create_index(index_name=index_name)
+    pinecone_ensure_index(index_name)
 
     index = pinecone.Index(index_name)
     index.delete(
@@ -80,9 +121,45 @@ def pinecone_delete_record(index_name: str, company_id: str, id: str):
     )
 
 
+def pinecone_delete_records(index_name: str, company_id: str, ids: List):
+    pinecone_ensure_index(index_name)
+
+    index = pinecone.Index(index_name)
+    for ids_batch in chunks([str(id) for id in ids], PINECONE_UPSERT_BATCH_SIZE):
+        index.delete(
+            ids=ids_batch,
+            namespace=str(company_id)
+        )
+
+
 def pinecone_delete_index(index_name: str):
+    _known_indexes.discard(index_name)
     return pinecone.delete_index(index_name)
 
 
 def pinecone_create_index(index_name: str):
     pinecone.create_index(name=index_name, dimension=1536, metric="cosine")
+
+
+class PineconeContextStore(ContextStoreBackend):
+    def query(self, query_text, company_id, index_name, num_results, resourcename, db_schema):
+        return pinecone_query(
+            query_text=query_text,
+            company_id=company_id,
+            index_name=index_name,
+            num_results=num_results,
+            resourcename=resourcename,
+            db_schema=db_schema,
+        )
+
+    def add_records(self, company_id, documents, index_name, metadata, ids):
+        return pinecone_add_records(
+            company_id=company_id,
+            documents=documents,
+            index_name=index_name,
+            metadata=metadata,
+            ids=ids,
+        )
+
+    def delete_records(self, index_name, company_id, ids):
+        return pinecone_delete_records(index_name=index_name, company_id=company_id, ids=ids)
@@ -0,0 +1,188 @@
+import threading
+
+import numpy as np
+
+from config.settings.base import CACHED_HISTORY_ENABLED, ANSWER_CACHE_EXACT_TTL, ANSWER_CACHE_SEMANTIC_ENABLED, \
+    ANSWER_CACHE_SEMANTIC_TTL, ANSWER_CACHE_SEMANTIC_THRESHOLD, ANSWER_CACHE_SEMANTIC_CANDIDATES, \
+    ANSWER_CACHE_LOCAL_TTL, PINECONE_EMBEDDING_MODEL
+from src.db.history import get_answered_history_by_question_hash, list_answered_history_questions
+from src.db.login_helpers import getConn
+from src.utils.ttl_cache import TTLCache
+
+CACHE_EXACT = "exact"
+CACHE_SEMANTIC = "semantic"
+
+
+def _find_answer(company_id, genie_users_id, question_hash, resourcename, db_schema, db_warehouse, ai_model,
+                 is_experimental, max_age_seconds):
+    return get_answered_history_by_question_hash(
+        conn=getConn(), company_id=company_id, genie_users_id=genie_users_id, question_hash=question_hash,
+        resourcename=resourcename, db_schema=db_schema, db_warehouse=db_warehouse, ai_model=ai_model,
+        is_experimental=is_experimental, max_age_seconds=max_age_seconds,
+    )
+
+
+def _list_questions(company_id, genie_users_id, resourcename, db_schema, db_warehouse, ai_model, is_experimental,
+                    max_age_seconds, limit):
+    return list_answered_history_questions(
+        conn=getConn(), company_id=company_id, genie_users_id=genie_users_id, resourcename=resourcename,
+        db_schema=db_schema, db_warehouse=db_warehouse, ai_model=ai_model, is_experimental=is_experimental,
+        max_age_seconds=max_age_seconds, limit=limit,
+    )
+
+
+def _embed(texts):
+    # same persistent content-hash cache as the table embeddings, a question is embedded once
+    from src.context_store.base import get_embedding_client
+    from src.db.table_embeddings import embed_table_representations
+
+    return embed_table_representations(get_embedding_client(), PINECONE_EMBEDDING_MODEL, texts)
+
+
+def _normalize(matrix):
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class AnswerCache:
+    """Answers reused from genie_chat_history instead of running the agent again.
+
+    Answers are only reused for the user who asked, guardrails are set per user, and only on the agent path they
+    were generated on (is_experimental, the path that applies the guardrails). The database drops answers older
+    than the user's last guardrail change, so changing a guardrail needs no invalidate here beyond local_ttl.
+    The exact level matches (company_id, genie_users_id, question_hash, resourcename, db_schema, db_warehouse,
+    ai_model, is_experimental) on answered rows younger than exact_ttl, with the question_hash the caller stores in
+    genie_chat_history. The optional semantic
+    level compares the question embedding with the user's answered questions younger than semantic_ttl and reuses
+    the closest one above threshold. Hits are kept in process for local_ttl seconds.
+    """
+
+    def __init__(
+            self,
+            enabled=False,
+            exact_ttl=86400.0,
+            semantic_enabled=False,
+            semantic_ttl=86400.0,
+            threshold=0.95,
+            candidates=500,
+            local_ttl=60.0,
+            find_answer=_find_answer,
+            list_questions=_list_questions,
+            embed=_embed,
+    ):
+        self.enabled = enabled
+        self.exact_ttl = exact_ttl
+        self.semantic_enabled = semantic_enabled
+        self.semantic_ttl = semantic_ttl
+        self.threshold = threshold
+        self.candidates = candidates
+        self._find_answer = find_answer
+        self._list_questions = list_questions
+        self._embed = embed
+        self._answers = TTLCache(maxsize=4096, ttl=local_ttl)
+        self._questions = TTLCache(maxsize=256, ttl=local_ttl)
+        self._lock = threading.Lock()
+        self._counts = {"exact_hits": 0, "semantic_hits": 0, "local_hits": 0, "misses": 0}
+
+    def _count(self, name):
+        with self._lock:
+            self._counts[name] += 1
+
+    def lookup(self, company_id, genie_users_id, question, resourcename, db_schema="", db_warehouse="", ai_model=None,
+               question_hash=None, is_experimental=False):
+        """Stored answer with answer (the SQL), results_s3_key, chart_code, chart_image_url and cache
+        (exact or semantic), None on a miss or when the cache is disabled. Without question_hash only the semantic
+        level can match."""
+        if not self.enabled or company_id is None or genie_users_id is None or not question:
+            return None
+        scope = (company_id, genie_users_id, resourcename or "", db_schema or "", db_warehouse or "", ai_model,
+                 bool(is_experimental))
+        key = scope + (question_hash, question)
+
+        answer = self._answers.get(key)
+        if answer is not None:
+            self._count("local_hits")
+            return answer
+
+        answer = None
+        if question_hash:
+            answer = self._find_answer(*scope[:2], question_hash, *scope[2:], self.exact_ttl)
+        if answer is not None:
+            answer = dict(answer, cache=CACHE_EXACT, similarity=1.0)
+            self._count("exact_hits")
+        elif self.semantic_enabled:
+            answer = self._semantic_lookup(scope, question)
+
+        if answer is None:
+            self._count("misses")
+            return None
+        self._answers.set(key, answer)
+        return answer
+
+    def _semantic_lookup(self, scope, question):
+        candidates = self._questions.get(scope)
+        if candidates is None:
+            rows = self._list_questions(*scope, self.semantic_ttl, self.candidates)
+            matrix = _normalize(self._embed([row["question"] for row in rows])) if len(rows) > 0 else None
+            candidates = (rows, matrix)
+            self._questions.set(scope, candidates)
+
+        rows, matrix = candidates
+        if len(rows) == 0:
+            return None
+        scores = matrix @ _normalize(self._embed([question]))[0]
+        best = int(np.argmax(scores))
+        print(f"AnswerCache._semantic_lookup, candidates={len(rows)}, best_score={scores[best]:.4f}")
+        if scores[best] < self.threshold:
+            return None
+
+        answer = self._find_answer(*scope[:2], rows[best]["question_hash"], *scope[2:], self.semantic_ttl)
+        if answer is None:
+            return None
+        self._count("semantic_hits")
+        return dict(answer, cache=CACHE_SEMANTIC, similarity=round(float(scores[best]), 4))
+
+    def invalidate(self, company_id=None):
+        def matches(key, _):
+            return company_id is None or key[0] == company_id
+
+        return self._answers.invalidate_where(matches) + self._questions.invalidate_where(matches)
+
+    def stats(self):
+        with self._lock:
+            counts = dict(self._counts)
+        hits = counts["exact_hits"] + counts["semantic_hits"] + counts["local_hits"]
+        lookups = hits + counts["misses"]
+        counts["hit_rate"] = round(hits / lookups, 4) if lookups > 0 else 0.0
+        return counts
+
+
+answer_cache = AnswerCache(
+    enabled=CACHED_HISTORY_ENABLED,
+    exact_ttl=ANSWER_CACHE_EXACT_TTL,
+    semantic_enabled=ANSWER_CACHE_SEMANTIC_ENABLED,
+    semantic_ttl=ANSWER_CACHE_SEMANTIC_TTL,
+    threshold=ANSWER_CACHE_SEMANTIC_THRESHOLD,
+    candidates=ANSWER_CACHE_SEMANTIC_CANDIDATES,
+    local_ttl=ANSWER_CACHE_LOCAL_TTL,
+)
+
+
+def cached_agent_response(answer, exec_time=0.0):
+    """An answer from the cache shaped like the response of generate_query_with_langchain_custom_agent."""
+    return {
+        "response": answer.get("ai_response") or "",
+        "intermediate_steps": [],
+        "exec_time": exec_time,
+        "total_tokens": 0,
+        "total_cost": 0,
+        "sql_query": answer.get("answer") or "",
+        "cache": answer["cache"],
+        "cache_similarity": answer["similarity"],
+        "history_id": answer.get("id"),
+        "results_s3_key": answer.get("results_s3_key"),
+        "chart_code": answer.get("chart_code"),
+        "chart_image_url": answer.get("chart_image_url"),
+    }
@@ -0,0 +1,139 @@
+import collections
+import math
+import traceback
+
+from config.settings.base import COLUMN_PROFILE_SAMPLE_ROWS
+from src.db.schema_snapshot import get_snapshot_table
+
+# same thresholds get_table_column_distinct used for categories
+MAX_CATEGORIES = 60
+MAX_CATEGORY_LENGTH = 50
+
+PG_STATS_QUERY = """
+SELECT attname, null_frac, n_distinct, most_common_vals::text::text[], most_common_freqs
+FROM pg_stats
+WHERE schemaname = :schema AND tablename = :table
+"""
+
+PG_RELTUPLES_QUERY = """
+SELECT c.reltuples
+FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace
+WHERE n.nspname = :schema AND c.relname = :table
+"""
+
+
+def _profile(column_name, column_type, categories, distinct_estimate, null_fraction, max_length, source):
+    return {
+        "column_name": column_name,
+        "column_type": column_type,
+        "categories": categories,
+        "distinct_estimate": distinct_estimate,
+        "null_fraction": null_fraction,
+        "max_length": max_length,
+        "source": source,
+    }
+
+
+def _categories(counts_or_values, distinct_estimate, max_length):
+    if max_length > MAX_CATEGORY_LENGTH or not 1 < distinct_estimate <= MAX_CATEGORIES:
+        return []
+    return list(counts_or_values)[:MAX_CATEGORIES]
+
+
+def profile_values(column_name, column_type, values, total_rows=None):
+    """Profile of one column from sampled values. When the sample is smaller than total_rows the distinct count is
+    scaled up with the GEE estimator: sqrt(total_rows / sampled) * singletons + values seen more than once."""
+    sampled = len(values)
+    counts = collections.Counter(str(value) for value in values if value is not None)
+    non_null = sum(counts.values())
+    null_fraction = round(1 - non_null / sampled, 4) if sampled > 0 else 0.0
+    max_length = max((len(value) for value in counts), default=0)
+
+    distinct_estimate = len(counts)
+    if total_rows and total_rows > sampled > 0:
+        singletons = sum(1 for count in counts.values() if count == 1)
+        distinct_estimate = int(round(math.sqrt(total_rows / sampled) * singletons + len(counts) - singletons))
+
+    categories = _categories((value for value, _ in counts.most_common()), distinct_estimate, max_length)
+    return _profile(column_name, column_type, categories, distinct_estimate, null_fraction, max_length, "sample")
+
+
+def profile_pg_stats(column_name, column_type, null_frac, n_distinct, most_common_vals, most_common_freqs, total_rows):
+    """Profile of one column from pg_stats, None when the statistics do not describe every value so the column
+    has to be sampled (no statistics, or most_common_vals does not cover the non-null rows)."""
+    if n_distinct is None:
+        return None
+    distinct_estimate = int(round(-n_distinct * total_rows)) if n_distinct < 0 else int(n_distinct)
+    most_common_vals = most_common_vals or []
+    max_length = max((len(value) for value in most_common_vals), default=0)
+    if 1 < distinct_estimate <= MAX_CATEGORIES:
+        covered = sum(most_common_freqs or []) + (null_frac or 0.0)
+        if len(most_common_vals) < distinct_estimate or covered < 0.99:
+            return None
+    categories = _categories(most_common_vals, distinct_estimate, max_length)
+    return _profile(
+        column_name, column_type, categories, distinct_estimate, round(null_frac or 0.0, 4), max_length, "pg_stats")
+
+
+def _pg_statistics(connection, schema, table_name):
+    from sqlalchemy import text
+
+    reltuples = connection.execute(text(PG_RELTUPLES_QUERY), {"schema": schema, "table": table_name}).scalar()
+    stats = {
+        row[0]: row[1:]
+        for row in connection.execute(text(PG_STATS_QUERY), {"schema": schema, "table": table_name})
+    }
+    return (reltuples if reltuples and reltuples > 0 else None), stats
+
+
+def _sample_query(engine, table, columns, sample_rows, total_rows):
+    import sqlalchemy
+    from sqlalchemy.sql import func
+
+    source = table
+    if engine.dialect.name == "postgresql" and total_rows and total_rows > sample_rows * 10:
+        # block sampling reads a few pages instead of the whole table, oversampled 3x to still fill the LIMIT
+        source = sqlalchemy.tablesample(table, func.system(min(100.0, 300.0 * sample_rows / total_rows)))
+    return sqlalchemy.select([source.c[column.name] for column in columns]).limit(sample_rows)
+
+
+def profile_table_columns(engine, table_name, db_schema=None, column_names=None, sample_rows=COLUMN_PROFILE_SAMPLE_ROWS):
+    """Profiles every column of a table (or only column_names) with at most one sampled query: distinct estimate,
+    top categories, null fraction and max length. On Postgres, columns fully described by pg_stats are not sampled."""
+    from sqlalchemy import inspect
+
+    table = get_snapshot_table(engine, table_name, db_schema)
+    columns = [
+        column for column in table.columns
+        if column.name.find(".") < 0 and (column_names is None or column.name in column_names)
+    ]
+    profiles = {}
+    total_rows = None
+
+    with engine.connect() as connection:
+        if engine.dialect.name == "postgresql":
+            try:
+                schema = db_schema or inspect(engine).default_schema_name
+                total_rows, stats = _pg_statistics(connection, schema, table.name)
+                for column in columns:
+                    if column.name in stats and total_rows:
+                        profile = profile_pg_stats(column.name, str(column.type), *stats[column.name], total_rows)
+                        if profile is not None:
+                            profiles[column.name] = profile
+            except Exception as e:
+                traceback.print_exc()
+                print(f"profile_table_columns, pg_stats unavailable, table_name={table_name}, e={e}")
+
+        remaining = [column for column in columns if column.name not in profiles]
+        if len(remaining) > 0:
+            query = _sample_query(engine, table, remaining, sample_rows, total_rows)
+            print(f"profile_table_columns, sampling, table_name={table_name}, columns={len(remaining)}")
+            rows = connection.execute(query).fetchall()
+            if len(rows) < sample_rows:
+                # the sample holds the whole table (or whatever TABLESAMPLE returned), counts are exact for it
+                total_rows = total_rows if total_rows and total_rows > sample_rows * 10 else len(rows)
+            for index, column in enumerate(remaining):
+                profiles[column.name] = profile_values(
+                    column.name, str(column.type), [row[index] for row in rows], total_rows)
+
+    return [profiles[column.name] for column in columns]
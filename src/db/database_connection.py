@@ -3,6 +3,9 @@ import traceback
 import pytz
 from psycopg2 import sql, Error
 
+from src.db.engine_registry import invalidate_tenant_connection
+from src.db.rows import fetch_dicts
+
 
 def get_database_connection_by_company_id(conn, company_id: int):
     cur = conn.cursor()
@@ -19,27 +22,7 @@ def get_database_connection_by_company_id(conn, company_id: int):
         values = (company_id,)
 
         cur.execute(select, values)
-        results = cur.fetchall()
-
-        # Format results
-        connections = []
-        for result in results:
-            connection = {
-                "name": result[0],
-                "host": result[1],
-                "port": result[2],
-                "ssl": result[3],
-                "databasename": result[4],
-                "username": result[5],
-                "password": result[6],
-                "apikey": result[7],
-                "resourcename": result[8],
-                "datetime": result[9],
-                "connection_string_url": result[10],
-                "db_type": result[11],
-                "company_id": result[12],
-            }
-            connections.append(connection)
+        connections = fetch_dicts(cur)
         return connections
 
     except Exception as e:
@@ -66,35 +49,13 @@ def get_user_db(conn, user_id: int):
     values = (user_id,)
 
     cur.execute(select, values)
-    results = cur.fetchall()
+    connections = fetch_dicts(cur)
 
     # Close the connection
     cur.close()
     conn.close()
 
-    # Format results
-    if results:
-        connections = []
-        for result in results:
-            connection = {
-                "name": result[0],
-                "host": result[1],
-                "port": result[2],
-                "ssl": result[3],
-                "databasename": result[4],
-                "username": result[5],
-                "password": result[6],
-                "apikey": result[7],
-                "resourcename": result[8],
-                "datetime": result[9],
-                "connection_string_url": result[10],
-                "db_type": result[11],
-                "company_id": result[12],
-            }
-            connections.append(connection)
-        return connections
-    else:
-        return []
+    return connections
 
 
 def create_or_update_user_db_connection(
@@ -167,3 +128,5 @@ def create_or_update_user_db_connection(
         conn.commit()
         cur.close()
         conn.close()
+        # after the commit, so a concurrent lookup cannot cache the previous connection string again
+        invalidate_tenant_connection(company_id=company_id, resourcename=resourcename)
@@ -0,0 +1,110 @@
+import threading
+import time
+
+from config.settings.base import DATABASE_WRAPPER_CACHE_SIZE, DATABASE_WRAPPER_CACHE_TTL, \
+    SCHEMA_SNAPSHOT_CHECK_INTERVAL
+from src.utils.ttl_cache import TTLCache
+
+
+def _catalog_version(engine, db_schema):
+    from src.db.schema_snapshot import catalog_version
+    return catalog_version(engine, db_schema)
+
+
+class _Entry:
+    __slots__ = ("wrapper", "engine", "version", "checked_at")
+
+    def __init__(self, wrapper, engine, version):
+        self.wrapper = wrapper
+        self.engine = engine
+        self.version = version
+        self.checked_at = time.monotonic()
+
+
+class DatabaseWrapperRegistry:
+    """Ready SQLDatabase wrappers (agent, experimental agent, chain) keyed by
+    (kind, company_id, resourcename, db_schema, db_warehouse), db_warehouse because the factories take the
+    custom_table_info of the warehouse (get_table_info_fragments), so the table listing and MetaData.reflect in their __init__
+    run once per schema version instead of once per question.
+
+    A cached wrapper is trusted for check_interval seconds, then kept only while the catalog version (see
+    schema_snapshot.catalog_version) and the engine are unchanged. Wrappers older than max_age are rebuilt.
+    """
+
+    def __init__(self, maxsize=64, max_age=3600.0, check_interval=60.0, version=_catalog_version):
+        self.check_interval = check_interval
+        self._wrappers = TTLCache(maxsize=maxsize, ttl=max_age)
+        self._version = version
+        self._locks = {}
+        self._locks_lock = threading.Lock()
+        self._builds = 0
+
+    def _key_lock(self, key):
+        with self._locks_lock:
+            lock = self._locks.get(key)
+            if lock is None:
+                lock = self._locks[key] = threading.Lock()
+            return lock
+
+    def _is_current(self, entry, engine):
+        return (
+                entry is not None
+                and entry.engine is engine
+                and time.monotonic() - entry.checked_at < self.check_interval
+        )
+
+    def get(self, kind, company_id, resourcename, db_schema, db_warehouse, engine, factory):
+        """Cached wrapper, factory() builds a new one. Without a company_id nothing is cached."""
+        if company_id is None:
+            return factory()
+        key = (kind, company_id, resourcename or "", db_schema or "", db_warehouse or "")
+        entry = self._wrappers.get(key)
+        if self._is_current(entry, engine):
+            return entry.wrapper
+
+        # one build per key at a time, concurrent questions wait for it instead of reflecting too
+        with self._key_lock(key):
+            current = self._wrappers.get(key)
+            if self._is_current(current, engine):
+                return current.wrapper
+
+            version = self._version(engine, db_schema)
+            if current is not None and current.engine is engine and current.version == version:
+                current.checked_at = time.monotonic()
+                return current.wrapper
+
+            print(f"DatabaseWrapperRegistry.get, building, kind={kind}, company_id={company_id}, version={version}")
+            entry = _Entry(factory(), engine, version)
+            self._wrappers.set(key, entry)
+            self._builds += 1
+            return entry.wrapper
+
+    def invalidate(self, company_id=None, resourcename=None, db_schema=None, db_warehouse=None):
+        def matches(key, _):
+            return (
+                    (company_id is None or key[1] == company_id)
+                    and (resourcename is None or key[2] == resourcename)
+                    and (db_schema is None or key[3] == (db_schema or ""))
+                    and (db_warehouse is None or key[4] == (db_warehouse or ""))
+            )
+
+        return self._wrappers.invalidate_where(matches)
+
+    def stats(self):
+        return dict(self._wrappers.stats(), builds=self._builds)
+
+
+database_wrappers = DatabaseWrapperRegistry(
+    maxsize=DATABASE_WRAPPER_CACHE_SIZE,
+    max_age=DATABASE_WRAPPER_CACHE_TTL,
+    check_interval=SCHEMA_SNAPSHOT_CHECK_INTERVAL,
+)
+
+
+def get_database_wrapper(kind, company_id, resourcename, db_schema, db_warehouse, engine, factory):
+    return database_wrappers.get(kind, company_id, resourcename, db_schema, db_warehouse, engine, factory)
+
+
+def invalidate_database_wrappers(company_id=None, resourcename=None, db_schema=None, db_warehouse=None):
+    return database_wrappers.invalidate(
+        company_id=company_id, resourcename=resourcename, db_schema=db_schema, db_warehouse=db_warehouse)
@@ -3,11 +3,14 @@ import traceback
 
 import typing
 
+from config.settings.base import QUERY_STREAM_CHUNK_SIZE
 from src.db.database_connection import get_database_connection_by_company_id
+from src.db.engine_registry import tenant_engines, tenant_connection_strings
 from src.db.login_helpers import getConn
+from src.db.query_stream import stream_query
+from src.db.result_cache import result_cache
 from src.db.table_info import get_all_tables_and_views
 from src.db.utils import sanitize_sql_sqlglot, add_driver_to_connection_string
-from sqlalchemy import create_engine
 
 InfoSchemaCache = dict
 Schema = dict
@@ -28,7 +31,7 @@ def get_custom_driver_connection(resourcename: str, company_id: int):
 
         # print(f"get_custom_driver_connection, connecting to db, DATABASE_URL_CUSTOM={DATABASE_URL_CUSTOM}")
         DATABASE_URL_CUSTOM_DRIVER = add_driver_to_connection_string(DATABASE_URL_CUSTOM)
-        engine = create_engine(DATABASE_URL_CUSTOM_DRIVER)
+        engine = tenant_engines.get(company_id, resourcename, DATABASE_URL_CUSTOM_DRIVER)
         return engine, db_type
     except Exception as e:
         print(f"get_custom_driver_connection, cant connect to db, e={e}")
@@ -37,6 +40,10 @@ def get_custom_driver_connection(resourcename: str, company_id: int):
 
 
 def get_connection_string_url(company_id, resourcename):
+    cached = tenant_connection_strings.get((company_id, resourcename))
+    if cached is not None:
+        return cached
+
     db_connections = get_database_connection_by_company_id(conn=getConn(), company_id=company_id)
     for c in db_connections:
         if c["resourcename"] == resourcename:
@@ -48,11 +55,18 @@ def get_connection_string_url(company_id, resourcename):
                 db_type_new = get_database_type(DATABASE_URL_CUSTOM)
                 if db_type_new is not None:
                     db_type = db_type_new
+            tenant_connection_strings.set((company_id, resourcename), (DATABASE_URL_CUSTOM, db_type))
             return DATABASE_URL_CUSTOM, db_type
     return None, None
 
 
-def execute_query(engine, sql_query):
+def execute_query(engine, sql_query, company_id=None, resourcename=None, db_schema=None):
+    # with a company_id, read-only queries are answered from result_cache when the same normalized sql ran recently
+    cache_key = result_cache.key(company_id, resourcename, db_schema, sql_query)
+    cached = result_cache.get(cache_key)
+    if cached is not None:
+        print(f"execute_query, result_cache hit, company_id={company_id}, rows={len(cached)}")
+        return cached
     try:
         sanitized_query_sqlglot = sanitize_sql_sqlglot(sql_query)
         with engine.connect() as connection:
@@ -63,6 +77,7 @@ def execute_query(engine, sql_query):
             columns = execution.keys()
             columns = [item for item in columns]
             formatted_result = [dict(zip(columns, row)) for row in result]
+            result_cache.set(cache_key, formatted_result)
             return formatted_result
     except Exception as e:
         traceback.print_exc()
@@ -70,6 +85,23 @@ def execute_query(engine, sql_query):
         return []
 
 
+def execute_query_stream(engine, sql_query, chunk_size=QUERY_STREAM_CHUNK_SIZE):
+    """Like execute_query but yields the rows in chunks of chunk_size dicts from a server-side cursor, for results
+    written straight to a streaming response or S3. Errors are raised, a partial stream can not be turned into []."""
+    sanitized_query_sqlglot = sanitize_sql_sqlglot(sql_query)
+    print(f"execute_query_stream, sql_query={sql_query}, sanitized_query_sqlglot={sanitized_query_sqlglot}")
+    rows = 0
+    try:
+        for chunk in stream_query(engine, sql_query, chunk_size):
+            rows += len(chunk)
+            yield chunk
+    except Exception as e:
+        traceback.print_exc()
+        print(f"Error, execute_query_stream, Failed after rows={rows}, sql_query={sql_query}: error={e}")
+        raise
+    print(f"execute_query_stream, done, rows={rows}")
+
+
 def get_database_type(connection_string_url: str) -> str | None:
     if not connection_string_url:
         return None
@@ -0,0 +1,163 @@
+import hashlib
+import threading
+import time
+import traceback
+from collections import OrderedDict
+
+from config.settings.base import TENANT_ENGINE_MAX_ENGINES, TENANT_ENGINE_IDLE_TIMEOUT, TENANT_ENGINE_POOL_SIZE, \
+    TENANT_ENGINE_MAX_OVERFLOW, TENANT_ENGINE_POOL_TIMEOUT, TENANT_ENGINE_POOL_RECYCLE, TENANT_CONNECTION_CACHE_TTL
+from src.db.database_wrappers import invalidate_database_wrappers
+from src.db.result_cache import invalidate_query_results
+from src.db.table_info_fragments import invalidate_table_info_fragments
+from src.utils.ttl_cache import TTLCache
+
+# dialects whose default sqlalchemy pool does not accept the QueuePool sizing arguments
+_UNPOOLED_PREFIXES = ("sqlite", "duckdb")
+
+
+def _create_engine(url, **kwargs):
+    from sqlalchemy import create_engine
+    return create_engine(url, **kwargs)
+
+
+def url_fingerprint(url):
+    return hashlib.sha256(url.encode("utf-8")).hexdigest()[:16]
+
+
+class _Entry:
+    __slots__ = ("engine", "last_used")
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.last_used = time.monotonic()
+
+
+class EngineRegistry:
+    """Long-lived SQLAlchemy engines for customer warehouses, keyed by (company_id, resourcename, url fingerprint).
+
+    Least recently used engines are disposed once max_engines is reached, and engines unused for idle_timeout
+    seconds are disposed on the next lookup.
+    """
+
+    def __init__(
+            self,
+            max_engines=64,
+            idle_timeout=600.0,
+            pool_size=2,
+            max_overflow=3,
+            pool_timeout=30,
+            pool_recycle=1800,
+            create=_create_engine,
+    ):
+        self.max_engines = max_engines
+        self.idle_timeout = idle_timeout
+        self.pool_size = pool_size
+        self.max_overflow = max_overflow
+        self.pool_timeout = pool_timeout
+        self.pool_recycle = pool_recycle
+        self._create = create
+        self._engines = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._disposed = 0
+
+    def _engine_args(self, url):
+        if url.lower().startswith(_UNPOOLED_PREFIXES):
+            return {}
+        return {
+            "pool_size": self.pool_size,
+            "max_overflow": self.max_overflow,
+            "pool_timeout": self.pool_timeout,
+            "pool_recycle": self.pool_recycle,
+            "pool_pre_ping": True,
+        }
+
+    def get(self, company_id, resourcename, url):
+        key = (company_id, resourcename, url_fingerprint(url))
+        expired = []
+        with self._lock:
+            expired.extend(self._pop_idle())
+            entry = self._engines.get(key)
+            if entry is not None:
+                entry.last_used = time.monotonic()
+                self._engines.move_to_end(key)
+                self._hits += 1
+            else:
+                # a changed connection string leaves the old engine behind under another fingerprint
+                for stale in [k for k in self._engines if k[0] == company_id and k[1] == resourcename]:
+                    expired.append(self._engines.pop(stale))
+                entry = _Entry(self._create(url, **self._engine_args(url)))
+                self._engines[key] = entry
+                self._misses += 1
+                while len(self._engines) > self.max_engines:
+                    expired.append(self._engines.popitem(last=False)[1])
+        self._dispose(expired)
+        return entry.engine
+
+    def invalidate(self, company_id=None, resourcename=None):
+        with self._lock:
+            keys = [
+                key for key in self._engines
+                if (company_id is None or key[0] == company_id) and (resourcename is None or key[1] == resourcename)
+            ]
+            expired = [self._engines.pop(key) for key in keys]
+        self._dispose(expired)
+        return len(expired)
+
+    def dispose_all(self):
+        with self._lock:
+            expired = list(self._engines.values())
+            self._engines.clear()
+        self._dispose(expired)
+
+    def _pop_idle(self):
+        now = time.monotonic()
+        idle = [key for key, entry in self._engines.items() if now - entry.last_used >= self.idle_timeout]
+        return [self._engines.pop(key) for key in idle]
+
+    def _dispose(self, entries):
+        for entry in entries:
+            try:
+                entry.engine.dispose()
+            except Exception:
+                traceback.print_exc()
+        if len(entries) > 0:
+            with self._lock:
+                self._disposed += len(entries)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "engines": len(self._engines),
+                "max_engines": self.max_engines,
+                "hits": self._hits,
+                "misses": self._misses,
+                "disposed": self._disposed,
+            }
+
+
+tenant_engines = EngineRegistry(
+    max_engines=TENANT_ENGINE_MAX_ENGINES,
+    idle_timeout=TENANT_ENGINE_IDLE_TIMEOUT,
+    pool_size=TENANT_ENGINE_POOL_SIZE,
+    max_overflow=TENANT_ENGINE_MAX_OVERFLOW,
+    pool_timeout=TENANT_ENGINE_POOL_TIMEOUT,
+    pool_recycle=TENANT_ENGINE_POOL_RECYCLE,
+)
+
+# (company_id, resourcename) -> (connection_string_url, db_type), see db_utils.get_connection_string_url
+tenant_connection_strings = TTLCache(maxsize=TENANT_ENGINE_MAX_ENGINES * 4, ttl=TENANT_CONNECTION_CACHE_TTL)
+
+
+def invalidate_tenant_connection(company_id=None, resourcename=None):
+    def matches(key, _):
+        return (company_id is None or key[0] == company_id) and (resourcename is None or key[1] == resourcename)
+
+    removed = tenant_connection_strings.invalidate_where(matches)
+    disposed = tenant_engines.invalidate(company_id=company_id, resourcename=resourcename)
+    invalidate_query_results(company_id=company_id, resourcename=resourcename)
+    invalidate_database_wrappers(company_id=company_id, resourcename=resourcename)
+    invalidate_table_info_fragments(company_id=company_id, resourcename=resourcename)
+    print(
+        f"invalidate_tenant_connection, company_id={company_id}, resourcename={resourcename}, removed={removed}, disposed={disposed}")
@@ -2,11 +2,13 @@ from psycopg2 import sql
 import traceback
 
 from src.db.login_helpers import getConn
+from src.db.rows import fetch_dicts
 from src.db.table_info_helpers import get_genie_users_db_connection_details_by_company_id
 
 
 def create_or_update_genie_users_db_guardrails(conn, table_name, db_schema, resourcename, company_id, genie_users_id,
                                                table_column, access_type, db_warehouse):
+    # datetime is set on every change, cached answers older than it are not served (see src/db/answer_cache.py)
     cur = conn.cursor()
 
     if not db_schema:
@@ -40,7 +42,7 @@ def create_or_update_genie_users_db_guardrails(conn, table_name, db_schema, reso
             # If a record exists, perform an update
             update = sql.SQL(
                 """
-                UPDATE genie_users_db_guardrails SET access_type = %s 
+                UPDATE genie_users_db_guardrails SET access_type = %s, datetime = NOW() 
                 WHERE 
                 table_name = %s AND 
                 db_schema = %s AND 
@@ -61,8 +63,9 @@ def create_or_update_genie_users_db_guardrails(conn, table_name, db_schema, reso
             # If no record exists, perform an insert
             insert = sql.SQL(
                 """INSERT INTO genie_users_db_guardrails 
-                (table_name, db_schema, resourcename, company_id, genie_users_id, table_column, access_type, db_warehouse) 
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s) RETURNING id"""
+                (table_name, db_schema, resourcename, company_id, genie_users_id, table_column, access_type, db_warehouse, 
+                datetime) 
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, NOW()) RETURNING id"""
             )
             insert_values = (
                 table_name, db_schema, resourcename, company_id, genie_users_id, table_column, access_type,
@@ -107,24 +110,7 @@ def list_genie_users_db_guardrails(conn, db_schema, db_warehouse, resourcename,
         values = (db_schema, db_warehouse, resourcename, company_id, genie_users_id)
 
         cur.execute(select, values)
-        records = cur.fetchall()
-
-        # Format the records into a list of dictionaries
-        guardrails_data = []
-        for record in records:
-            guardrail_entry = {
-                "id": record[0],
-                "table_name": record[1],
-                "db_schema": record[2],
-                "resourcename": record[3],
-                "company_id": record[4],
-                "genie_users_id": record[5],
-                "table_column": record[6],
-                "access_type": record[7],
-                "datetime": record[8],
-                "db_warehouse": record[9],
-            }
-            guardrails_data.append(guardrail_entry)
+        guardrails_data = fetch_dicts(cur)
 
         return guardrails_data
 
@@ -163,24 +149,7 @@ def list_genie_users_db_guardrails(conn, db_schema, db_warehouse, resourcename,
         values = (db_schema, db_warehouse, resourcename, company_id, genie_users_id)
 
         cur.execute(select, values)
-        records = cur.fetchall()
-
-        # Format the records into a list of dictionaries
-        guardrails_data = []
-        for record in records:
-            guardrail_entry = {
-                "id": record[0],
-                "table_name": record[1],
-                "db_schema": record[2],
-                "resourcename": record[3],
-                "company_id": record[4],
-                "genie_users_id": record[5],
-                "table_column": record[6],
-                "access_type": record[7],
-                "datetime": record[8],
-                "db_warehouse": record[9],
-            }
-            guardrails_data.append(guardrail_entry)
+        guardrails_data = fetch_dicts(cur)
 
         return guardrails_data
 
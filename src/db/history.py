@@ -1,4 +1,6 @@
+import base64
 import calendar
+import json
 import traceback
 
 from psycopg2 import sql
@@ -6,18 +8,70 @@ import datetime
 import pytz
 
 from config.settings.base import AGENT_LLM_MODEL_CHART, TEMPERATURE
+from src.db.usage_counters import increment_usage_counters, get_usage_count, seed_usage_count, \
+    USAGE_SCOPE_COMPANY, USAGE_SCOPE_USER
+from src.db.rows import fetch_dicts, fetch_dict, fetch_records, select_columns
 
+HISTORY_COLUMNS = (
+    "id", "datetime", "question", "answer", "genie_users_id", "team_id_slack", "user_id_slack",
+    "company_id", "is_answered", "db_schema", "resourcename", "ai_engine", "results_len",
+    "score", "ai_response", "intermediate_steps", "chart_code", "total_tokens", "total_cost", "question_hash",
+    "total_time", "db_warehouse", "ai_model", "ai_temp", "chart_image_url", "client_type", "results_s3_key",
+)
+HISTORY_STATUS_COLUMNS = HISTORY_COLUMNS + ("error_msg", "status")
+HISTORY_DETAIL_COLUMNS = HISTORY_COLUMNS + ("status", "table_name")
+HISTORY_ALL_COLUMNS = HISTORY_COLUMNS + ("error_msg", "status", "table_name")
 
-def get_history_by_question_hash(conn, question_hash, genie_users_id):
+# Projection for list pages, without the large ai_response, intermediate_steps and chart_code values.
+# Keep id and datetime in any projection used with next_history_cursor.
+HISTORY_LIST_COLUMNS = tuple(
+    column for column in HISTORY_STATUS_COLUMNS if column not in ("ai_response", "intermediate_steps", "chart_code")
+)
+
+# What a cached answer returns in place of running the agent, see src/db/answer_cache.py
+ANSWER_CACHE_COLUMNS = ("id", "datetime", "question", "question_hash", "answer", "ai_response", "results_len",
+                        "results_s3_key", "chart_code", "chart_image_url", "ai_model", "status")
+HISTORY_USAGE_REPORT_COLUMNS = ("datetime", "resourcename", "ai_engine", "total_tokens", "total_cost", "total_time",
+                                "status")
+
+
+def encode_history_cursor(entry):
+    payload = json.dumps([entry.datetime.isoformat(), entry.id])
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii")
+
+
+class InvalidHistoryCursor(ValueError):
+    """A page_cursor that next_history_cursor did not produce, the API answers it with a 400."""
+
+
+def decode_history_cursor(page_cursor):
+    if not page_cursor:
+        return None, None
+    try:
+        after_datetime, after_id = json.loads(base64.urlsafe_b64decode(page_cursor.encode("ascii")))
+        return datetime.datetime.fromisoformat(after_datetime), int(after_id)
+    except (ValueError, TypeError) as e:
+        raise InvalidHistoryCursor(f"decode_history_cursor, invalid page_cursor={page_cursor}") from e
+
+
+def next_history_cursor(history, limit):
+    # Opaque continuation token for the listing functions below, None once the last page has been read.
+    # The listing functions return (history, next_history_cursor(history, limit)), (None, None) on database errors,
+    # history being fetch_records rows of HISTORY_LIST_COLUMNS unless columns is given.
+    if not history or len(history) < limit:
+        return None
+    return encode_history_cursor(history[-1])
+
+
+def get_history_by_question_hash(conn, question_hash, genie_users_id, columns=None):
+    if columns is None:
+        columns = HISTORY_COLUMNS
     cur = conn.cursor()
 
     try:
         # Query the genie_chat_history
         query = """
-            SELECT id, datetime, question, answer, genie_users_id, team_id_slack, user_id_slack,
-                   company_id, is_answered, db_schema, resourcename, ai_engine, results_len,
-                   score, ai_response, intermediate_steps, chart_code, total_tokens, total_cost, question_hash, total_time, db_warehouse,
-                   ai_model, ai_temp, chart_image_url, client_type, results_s3_key
+            SELECT {columns}
             FROM genie_chat_history 
             WHERE genie_users_id = %s
             AND question_hash = %s
@@ -26,41 +80,9 @@ def get_history_by_question_hash(conn, question_hash, genie_users_id):
             ORDER BY datetime DESC 
             LIMIT 1;
         """
+        query = sql.SQL(query).format(columns=select_columns(columns, HISTORY_ALL_COLUMNS))
         cur.execute(query, (genie_users_id, question_hash))
-        results = cur.fetchall()
-
-        history = []
-        for result in results:
-            history_entry = {
-                "id": result[0],
-                "datetime": result[1],
-                "question": result[2],
-                "answer": result[3],
-                "genie_users_id": result[4],
-                "team_id_slack": result[5],
-                "user_id_slack": result[6],
-                "company_id": result[7],
-                "is_answered": result[8],
-                "db_schema": result[9],
-                "resourcename": result[10],
-                "ai_engine": result[11],
-                "results_len": result[12],
-                "score": result[13],
-                "ai_response": result[14],
-                "intermediate_steps": result[15],
-                "chart_code": result[16],
-                "total_tokens": result[17],
-                "total_cost": result[18],
-                "question_hash": result[19],
-                "total_time": result[20],
-                "db_warehouse": result[21],
-                "ai_model": result[22],
-                "ai_temp": result[23],
-                "chart_image_url": result[24],
-                "client_type": result[25],
-                "results_s3_key": result[26],
-            }
-            history.append(history_entry)
+        history = fetch_dicts(cur)
 
         return history
     except Exception as e:
@@ -110,8 +132,10 @@ def count_history_by_question_hash_count(conn, genie_users_id, question_hash, re
 
 def list_history_by_question_hash(
         conn, genie_users_id, question_hash, resourcename, db_schema="", db_warehouse="",
-        limit=10, skip=0
+        limit=10, skip=0, page_cursor=None, columns=None
 ):
+    if columns is None:
+        columns = HISTORY_LIST_COLUMNS
     cur = conn.cursor()
 
     # Handle null values for db_schema and db_warehouse
@@ -121,12 +145,14 @@ def list_history_by_question_hash(
         db_warehouse = ""
 
     try:
+        # page_cursor takes precedence over skip, see next_history_cursor
+        after_datetime, after_id = decode_history_cursor(page_cursor)
+        if page_cursor:
+            skip = 0
+
         # Query to select all fields
         query = """
-            SELECT id, datetime, question, answer, genie_users_id, team_id_slack, user_id_slack,
-                   company_id, is_answered, db_schema, resourcename, ai_engine, results_len,
-                   score, ai_response, intermediate_steps, chart_code, total_tokens, total_cost, question_hash, total_time, db_warehouse,
-                   ai_model, ai_temp, chart_image_url, client_type, results_s3_key
+            SELECT {columns}
             FROM genie_chat_history
             WHERE 
                 genie_users_id = %s AND 
@@ -134,60 +160,148 @@ def list_history_by_question_hash(
                 resourcename = %s AND 
                 db_schema = %s AND 
                 db_warehouse = %s
+                AND (%s::timestamptz IS NULL OR (datetime, id) < (%s, %s))
             ORDER BY 
-                datetime DESC 
+                datetime DESC, id DESC 
             LIMIT %s OFFSET %s;
         """
+        query = sql.SQL(query).format(columns=select_columns(columns, HISTORY_ALL_COLUMNS))
         cur.execute(query, (
             genie_users_id, question_hash, resourcename,
             db_schema, db_warehouse,
-            limit, skip,
+            after_datetime, after_datetime, after_id, limit, skip,
         ))
-        results = cur.fetchall()
-
-        history = []
-        for result in results:
-            history_entry = {
-                "id": result[0],
-                "datetime": result[1],
-                "question": result[2],
-                "answer": result[3],
-                "genie_users_id": result[4],
-                "team_id_slack": result[5],
-                "user_id_slack": result[6],
-                "company_id": result[7],
-                "is_answered": result[8],
-                "db_schema": result[9],
-                "resourcename": result[10],
-                "ai_engine": result[11],
-                "results_len": result[12],
-                "score": result[13],
-                "ai_response": result[14],
-                "intermediate_steps": result[15],
-                "chart_code": result[16],
-                "total_tokens": result[17],
-                "total_cost": result[18],
-                "question_hash": result[19],
-                "total_time": result[20],
-                "db_warehouse": result[21],
-                "ai_model": result[22],
-                "ai_temp": result[23],
-                "chart_image_url": result[24],
-                "client_type": result[25],
-                "results_s3_key": result[26],
-            }
-            history.append(history_entry)
+        history = fetch_records(cur)
 
-        return history
+        return history, next_history_cursor(history, limit)
+    except InvalidHistoryCursor:
+        raise
     except Exception as e:
         traceback.print_exc()
         print(f"list_history_by_question_hash, Database error: {e}")
+        return None, None
+    finally:
+        cur.close()
+        conn.close()
+
+
+def get_answered_history_by_question_hash(
+        conn, company_id, genie_users_id, question_hash, resourcename, db_schema="", db_warehouse="", ai_model=None,
+        is_experimental=False, max_age_seconds=None, columns=None
+):
+    # Newest answered row for the user's question, through genie_chat_history_latest. Answers are not shared
+    # between users, their guardrails (genie_users_db_guardrails) differ, and are not served once a guardrail of the
+    # user changed after the answer or for the other agent path (is_experimental).
+    if columns is None:
+        columns = ANSWER_CACHE_COLUMNS
+    cur = conn.cursor()
+
+    if not db_schema:
+        db_schema = ""
+    if not db_warehouse:
+        db_warehouse = ""
+
+    try:
+        query = """
+            SELECT {columns}
+            FROM genie_chat_history_latest l
+            JOIN genie_chat_history gh ON gh.id = l.history_id
+            WHERE 
+                l.genie_users_id = %s AND 
+                l.company_id = %s AND 
+                l.resourcename = %s AND 
+                l.answered_only AND 
+                l.question_hash = %s AND 
+                l.db_schema = %s AND 
+                l.db_warehouse = %s
+                AND COALESCE(gh.status, 0) != 3
+                AND (%s::text IS NULL OR gh.ai_model = %s)
+                AND gh.is_experimental = %s
+                AND (%s::float IS NULL OR l.datetime >= NOW() - make_interval(secs => %s))
+                AND NOT EXISTS (
+                    SELECT 1 FROM genie_users_db_guardrails g
+                    WHERE g.company_id = l.company_id AND g.genie_users_id = l.genie_users_id
+                    AND COALESCE(g.resourcename, '') = l.resourcename AND g.db_schema = l.db_schema 
+                    AND g.db_warehouse = l.db_warehouse AND g.datetime > gh.datetime
+                )
+            ORDER BY 
+                l.datetime DESC, l.history_id DESC 
+            LIMIT 1;
+        """
+        query = sql.SQL(query).format(columns=select_columns(columns, HISTORY_ALL_COLUMNS, alias="gh"))
+        cur.execute(query, (
+            genie_users_id, company_id, resourcename or "", question_hash, db_schema, db_warehouse,
+            ai_model, ai_model, bool(is_experimental), max_age_seconds, max_age_seconds,
+        ))
+        return fetch_dict(cur)
+    except Exception as e:
+        traceback.print_exc()
+        print(f"get_answered_history_by_question_hash, Database error: {e}")
         return None
     finally:
         cur.close()
         conn.close()
 
 
+def list_answered_history_questions(
+        conn, company_id, genie_users_id, resourcename, db_schema="", db_warehouse="", ai_model=None,
+        is_experimental=False, max_age_seconds=None, limit=500
+):
+    # Newest answered question of the user per question_hash, the candidates of the semantic answer cache, with
+    # the guardrail and is_experimental conditions of get_answered_history_by_question_hash
+    cur = conn.cursor()
+
+    if not db_schema:
+        db_schema = ""
+    if not db_warehouse:
+        db_warehouse = ""
+
+    try:
+        query = """
+            SELECT id, question, question_hash 
+            FROM (
+                SELECT DISTINCT ON (l.question_hash) 
+                    gh.id, gh.question, l.question_hash, l.datetime
+                FROM genie_chat_history_latest l
+                JOIN genie_chat_history gh ON gh.id = l.history_id
+                WHERE 
+                    l.genie_users_id = %s AND 
+                    l.company_id = %s AND 
+                    l.resourcename = %s AND 
+                    l.answered_only AND 
+                    l.db_schema = %s AND 
+                    l.db_warehouse = %s
+                    AND gh.question IS NOT NULL
+                    AND COALESCE(gh.status, 0) != 3
+                    AND (%s::text IS NULL OR gh.ai_model = %s)
+                    AND gh.is_experimental = %s
+                    AND (%s::float IS NULL OR l.datetime >= NOW() - make_interval(secs => %s))
+                    AND NOT EXISTS (
+                        SELECT 1 FROM genie_users_db_guardrails g
+                        WHERE g.company_id = l.company_id AND g.genie_users_id = l.genie_users_id
+                        AND COALESCE(g.resourcename, '') = l.resourcename AND g.db_schema = l.db_schema 
+                        AND g.db_warehouse = l.db_warehouse AND g.datetime > gh.datetime
+                    )
+                ORDER BY 
+                    l.question_hash, l.datetime DESC, l.history_id DESC
+            ) latest
+            ORDER BY datetime DESC 
+            LIMIT %s;
+        """
+        cur.execute(query, (
+            genie_users_id, company_id, resourcename or "", db_schema, db_warehouse,
+            ai_model, ai_model, bool(is_experimental), max_age_seconds, max_age_seconds, limit,
+        ))
+        return fetch_dicts(cur)
+    except Exception as e:
+        traceback.print_exc()
+        print(f"list_answered_history_questions, Database error: {e}")
+        return []
+    finally:
+        cur.close()
+        conn.close()
+
+
 def update_history_chart_image_url(conn, id, chart_image_url):
     print(f"update_history_chart_image_url, id={id}, chart_image_url={len(chart_image_url)}")
     cur = conn.cursor()
@@ -332,6 +446,7 @@ def update_history_results_len(conn, id, results_len):
         )
         values = (results_len, id)
         cur.execute(update, values)
+        maintain_history(cur, id)
         return True
 
     except Exception as e:
@@ -396,6 +511,93 @@ def update_history_results_s3_key(conn, id, results_s3_key):
         conn.close()
 
 
+def refresh_latest_history(cur, id):
+    # Points genie_chat_history_latest at history row id if it is now the newest row for its question,
+    # once for every row and once more for answered rows. Runs on the caller's cursor and transaction.
+    upsert = sql.SQL(
+        """
+        INSERT INTO genie_chat_history_latest (
+            genie_users_id, company_id, user_id_slack, team_id_slack, client_type, resourcename, db_schema, 
+            db_warehouse, question_hash, answered_only, history_id, datetime
+        )
+        SELECT 
+            gh.genie_users_id, gh.company_id, COALESCE(gh.user_id_slack, ''), COALESCE(gh.team_id_slack, ''),
+            COALESCE(gh.client_type, 0), COALESCE(gh.resourcename, ''), COALESCE(gh.db_schema, ''), 
+            COALESCE(gh.db_warehouse, ''), gh.question_hash, flag.answered_only, gh.id, gh.datetime
+        FROM 
+            genie_chat_history gh
+        CROSS JOIN (VALUES (false), (true)) AS flag(answered_only)
+        WHERE 
+            gh.id = %s 
+            AND gh.question_hash IS NOT NULL 
+            AND (NOT flag.answered_only OR (gh.answer IS NOT NULL AND gh.results_len > 0))
+        ON CONFLICT (
+            genie_users_id, company_id, user_id_slack, team_id_slack, client_type, resourcename, db_schema, 
+            db_warehouse, question_hash, answered_only
+        )
+        DO UPDATE SET history_id = EXCLUDED.history_id, datetime = EXCLUDED.datetime
+        WHERE genie_chat_history_latest.datetime <= EXCLUDED.datetime
+        """
+    )
+    cur.execute(upsert, (id,))
+
+
+def maintain_history(cur, id, company_id=None, genie_users_id=None, when=None):
+    # Usage counters (when set, new rows only) and genie_chat_history_latest for history row id, in a savepoint:
+    # both can be rebuilt (reconcile_usage_counters, rebuild_latest_history), a failure here must not roll back
+    # the history row written in the same transaction.
+    cur.execute("SAVEPOINT maintain_history")
+    try:
+        if when is not None:
+            increment_usage_counters(cur, company_id=company_id, genie_users_id=genie_users_id, when=when)
+        refresh_latest_history(cur, id)
+    except Exception as e:
+        cur.execute("ROLLBACK TO SAVEPOINT maintain_history")
+        traceback.print_exc()
+        print(f"maintain_history, id={id}, Database error: {e}")
+    else:
+        cur.execute("RELEASE SAVEPOINT maintain_history")
+
+
+def rebuild_latest_history(conn):
+    cur = conn.cursor()
+    try:
+        print(f"rebuild_latest_history, DELETE and INSERT genie_chat_history_latest")
+        cur.execute("DELETE FROM genie_chat_history_latest;")
+        rebuild = sql.SQL(
+            """
+            INSERT INTO genie_chat_history_latest (
+                genie_users_id, company_id, user_id_slack, team_id_slack, client_type, resourcename, db_schema, 
+                db_warehouse, question_hash, answered_only, history_id, datetime
+            )
+            SELECT DISTINCT ON (1, 2, 3, 4, 5, 6, 7, 8, 9, 10)
+                gh.genie_users_id, gh.company_id, COALESCE(gh.user_id_slack, ''), COALESCE(gh.team_id_slack, ''),
+                COALESCE(gh.client_type, 0), COALESCE(gh.resourcename, ''), COALESCE(gh.db_schema, ''), 
+                COALESCE(gh.db_warehouse, ''), gh.question_hash, flag.answered_only, gh.id, gh.datetime
+            FROM 
+                genie_chat_history gh
+            CROSS JOIN (VALUES (false), (true)) AS flag(answered_only)
+            WHERE 
+                gh.question_hash IS NOT NULL 
+                AND (NOT flag.answered_only OR (gh.answer IS NOT NULL AND gh.results_len > 0))
+            ORDER BY 
+                1, 2, 3, 4, 5, 6, 7, 8, 9, 10, gh.datetime DESC, gh.id DESC
+            """
+        )
+        cur.execute(rebuild)
+        inserted = cur.rowcount
+        conn.commit()
+        return inserted
+    except Exception as e:
+        conn.rollback()
+        traceback.print_exc()
+        print(f"rebuild_latest_history, Database error: {e}")
+        return None
+    finally:
+        cur.close()
+        conn.close()
+
+
 def create_or_update_history(conn, question, answer, genie_users_id, team_id_slack, user_id_slack, company_id, id=None,
                              is_answered=False, db_schema="", resourcename="", ai_engine="", results_len=0,
                              score=0, ai_response="", intermediate_steps=None,
@@ -404,6 +606,7 @@ def create_or_update_history(conn, question, answer, genie_users_id, team_id_sla
                              ai_model=AGENT_LLM_MODEL_CHART,
                              ai_temp=TEMPERATURE,
                              client_type=0,
+                             is_experimental=False,
                              ):
     if intermediate_steps is None:
         intermediate_steps = []
@@ -432,6 +635,7 @@ def create_or_update_history(conn, question, answer, genie_users_id, team_id_sla
                 now, answer, is_answered, results_len, score, ai_response, intermediate_steps, chart_code, total_tokens,
                 total_cost, total_time, status, ai_model, ai_temp, client_type, id)
             cur.execute(update, values)
+            maintain_history(cur, id)
             return True
         else:
             print(f"create_or_update_history, INSERT")
@@ -441,20 +645,21 @@ def create_or_update_history(conn, question, answer, genie_users_id, team_id_sla
                 """
                 INSERT INTO genie_chat_history (datetime, question, answer, genie_users_id, team_id_slack, user_id_slack, company_id, is_answered, 
                 db_schema, resourcename, ai_engine, results_len, score, question_hash, db_warehouse,
-                ai_model, ai_temp, client_type
+                ai_model, ai_temp, client_type, is_experimental
                 )
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s) RETURNING id
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s) RETURNING id
                 """
             )
             values = (
                 now, question, answer, genie_users_id, team_id_slack, user_id_slack, company_id, is_answered, db_schema,
                 resourcename, ai_engine, results_len, score, question_hash, db_warehouse,
-                ai_model, ai_temp, client_type
+                ai_model, ai_temp, client_type, is_experimental
             )
             cur.execute(insert, values)
 
             # Retrieve and return the generated ID
             generated_id = cur.fetchone()[0]
+            maintain_history(cur, generated_id, company_id=company_id, genie_users_id=genie_users_id, when=now)
             return generated_id
     except Exception as e:
         print(f"create_or_update_history, Database error: {e}")
@@ -466,261 +671,138 @@ def create_or_update_history(conn, question, answer, genie_users_id, team_id_sla
         conn.close()
 
 
-def get_history_by_genie_users_id(conn, genie_users_id, limit=10, skip=0):
+def get_history_by_genie_users_id(conn, genie_users_id, limit=10, skip=0, page_cursor=None, columns=None):
+    if columns is None:
+        columns = HISTORY_LIST_COLUMNS
     cur = conn.cursor()
 
     try:
+        # page_cursor takes precedence over skip, see next_history_cursor
+        after_datetime, after_id = decode_history_cursor(page_cursor)
+        if page_cursor:
+            skip = 0
+
         # Query the genie_chat_history
         query = """
-            SELECT id, datetime, question, answer, genie_users_id, team_id_slack, user_id_slack,
-            company_id, is_answered, db_schema, resourcename, ai_engine, results_len,
-            score, ai_response, intermediate_steps, chart_code, total_tokens, total_cost, question_hash, total_time, db_warehouse,
-            ai_model, ai_temp, chart_image_url, client_type, results_s3_key
+            SELECT {columns}
             FROM genie_chat_history 
             WHERE genie_users_id = %s
-            ORDER BY datetime DESC 
+            AND (%s::timestamptz IS NULL OR (datetime, id) < (%s, %s))
+            ORDER BY datetime DESC, id DESC 
             LIMIT %s OFFSET %s
         """
-        cur.execute(query, (genie_users_id, limit, skip))
-        results = cur.fetchall()
-
-        history = []
-        for result in results:
-            history_entry = {
-                "id": result[0],
-                "datetime": result[1],
-                "question": result[2],
-                "answer": result[3],
-                "genie_users_id": result[4],
-                "team_id_slack": result[5],
-                "user_id_slack": result[6],
-                "company_id": result[7],
-                "is_answered": result[8],
-                "db_schema": result[9],
-                "resourcename": result[10],
-                "ai_engine": result[11],
-                "results_len": result[12],
-                "score": result[13],
-                "ai_response": result[14],
-                "intermediate_steps": result[15],
-                "chart_code": result[16],
-                "total_tokens": result[17],
-                "total_cost": result[18],
-                "question_hash": result[19],
-                "total_time": result[20],
-                "db_warehouse": result[21],
-                "ai_model": result[22],
-                "ai_temp": result[23],
-                "chart_image_url": result[24],
-                "client_type": result[25],
-                "results_s3_key": result[26],
-            }
-            history.append(history_entry)
+        query = sql.SQL(query).format(columns=select_columns(columns, HISTORY_ALL_COLUMNS))
+        cur.execute(query, (genie_users_id, after_datetime, after_datetime, after_id, limit, skip))
+        history = fetch_records(cur)
 
-        return history
+        return history, next_history_cursor(history, limit)
+    except InvalidHistoryCursor:
+        raise
     except Exception as e:
         traceback.print_exc()
         print(f"get_history_by_genie_users_id, Database error: {e}")
-        return None
+        return None, None
     finally:
         cur.close()
         conn.close()
 
 
-def get_history_by_user_and_team(conn, user_id_slack, team_id_slack, resourcename, limit=10, skip=0):
+def get_history_by_user_and_team(conn, user_id_slack, team_id_slack, resourcename, limit=10, skip=0,
+                                 page_cursor=None, columns=None):
+    if columns is None:
+        columns = HISTORY_LIST_COLUMNS
     cur = conn.cursor()
 
     try:
+        # page_cursor takes precedence over skip, see next_history_cursor
+        after_datetime, after_id = decode_history_cursor(page_cursor)
+        if page_cursor:
+            skip = 0
+
         # Query the genie_chat_history
         query = """
-            SELECT 
-                gh.id, 
-                gh.datetime, 
-                gh.question, 
-                gh.answer, 
-                gh.genie_users_id, 
-                gh.team_id_slack, 
-                gh.user_id_slack,
-                gh.company_id, 
-                gh.is_answered, 
-                gh.db_schema, 
-                gh.resourcename, 
-                gh.ai_engine, 
-                gh.results_len, 
-                gh.score, 
-                gh.ai_response, 
-                gh.intermediate_steps, 
-                gh.chart_code,
-                gh.total_tokens,
-                gh.total_cost,
-                gh.question_hash,
-                gh.total_time,
-                gh.db_warehouse,
-                gh.ai_model,
-                gh.ai_temp,
-                gh.chart_image_url,
-                gh.client_type,
-                gh.results_s3_key 
-            FROM 
-                genie_chat_history gh
-            INNER JOIN (
-                SELECT 
-                    question_hash, 
-                    MAX(datetime) AS latest_datetime
+            SELECT {columns}
+            FROM (
+                SELECT DISTINCT ON (l.question_hash) 
+                    l.history_id
                 FROM 
-                    genie_chat_history
+                    genie_chat_history_latest l
                 WHERE 
-                    user_id_slack = %s AND team_id_slack = %s AND resourcename = %s
-                GROUP BY 
-                    question_hash
-            ) latest_questions ON gh.question_hash = latest_questions.question_hash AND gh.datetime = latest_questions.latest_datetime
+                    l.user_id_slack = %s
+                    AND l.team_id_slack = %s
+                    AND l.resourcename = %s
+                    AND l.answered_only = false
+                ORDER BY 
+                    l.question_hash, l.datetime DESC, l.history_id DESC
+            ) latest_questions
+            INNER JOIN genie_chat_history gh ON gh.id = latest_questions.history_id
             WHERE 
-                gh.user_id_slack = %s AND gh.team_id_slack = %s AND resourcename = %s
+                (%s::timestamptz IS NULL OR (gh.datetime, gh.id) < (%s, %s))
             ORDER BY 
-                gh.datetime DESC 
+                gh.datetime DESC, gh.id DESC 
             LIMIT %s OFFSET %s;
         """
+        query = sql.SQL(query).format(columns=select_columns(columns, HISTORY_ALL_COLUMNS, alias="gh"))
         cur.execute(query, (
-            user_id_slack, team_id_slack, resourcename, user_id_slack, team_id_slack, resourcename, limit, skip))
-        results = cur.fetchall()
-
-        history = []
-        for result in results:
-            history_entry = {
-                "id": result[0],
-                "datetime": result[1],
-                "question": result[2],
-                "answer": result[3],
-                "genie_users_id": result[4],
-                "team_id_slack": result[5],
-                "user_id_slack": result[6],
-                "company_id": result[7],
-                "is_answered": result[8],
-                "db_schema": result[9],
-                "resourcename": result[10],
-                "ai_engine": result[11],
-                "results_len": result[12],
-                "score": result[13],
-                "ai_response": result[14],
-                "intermediate_steps": result[15],
-                "chart_code": result[16],
-                "total_tokens": result[17],
-                "total_cost": result[18],
-                "question_hash": result[19],
-                "total_time": result[20],
-                "db_warehouse": result[21],
-                "ai_model": result[22],
-                "ai_temp": result[23],
-                "chart_image_url": result[24],
-                "client_type": result[25],
-                "results_s3_key": result[26],
-            }
-            history.append(history_entry)
+            user_id_slack, team_id_slack, resourcename, after_datetime, after_datetime, after_id, limit, skip))
+        history = fetch_records(cur)
 
-        return history
+        return history, next_history_cursor(history, limit)
+    except InvalidHistoryCursor:
+        raise
     except Exception as e:
         traceback.print_exc()
         print(f"get_history_by_user_and_team, Database error: {e}")
-        return None
+        return None, None
     finally:
         cur.close()
         conn.close()
 
 
-def get_history_company_id(conn, company_id, resourcename, limit=10, skip=0):
+def get_history_company_id(conn, company_id, resourcename, limit=10, skip=0, page_cursor=None, columns=None):
+    if columns is None:
+        columns = HISTORY_LIST_COLUMNS
     cur = conn.cursor()
 
     try:
+        # page_cursor takes precedence over skip, see next_history_cursor
+        after_datetime, after_id = decode_history_cursor(page_cursor)
+        if page_cursor:
+            skip = 0
+
         # Query the genie_chat_history
         query = """
-            SELECT 
-                gh.id, 
-                gh.datetime, 
-                gh.question, 
-                gh.answer, 
-                gh.genie_users_id, 
-                gh.team_id_slack, 
-                gh.user_id_slack,
-                gh.company_id, 
-                gh.is_answered, 
-                gh.db_schema, 
-                gh.resourcename, 
-                gh.ai_engine, 
-                gh.results_len, 
-                gh.score, 
-                gh.ai_response, 
-                gh.intermediate_steps, 
-                gh.chart_code,
-                gh.total_tokens,
-                gh.total_cost,
-                gh.question_hash,
-                gh.total_time,
-                gh.db_warehouse,
-                gh.ai_model,
-                gh.ai_temp,
-                gh.chart_image_url,
-                gh.client_type,
-                gh.results_s3_key 
-            FROM 
-                genie_chat_history gh
-            INNER JOIN (
-                SELECT 
-                    question_hash, 
-                    MAX(datetime) AS latest_datetime
+            SELECT {columns}
+            FROM (
+                SELECT DISTINCT ON (l.question_hash) 
+                    l.history_id
                 FROM 
-                    genie_chat_history
+                    genie_chat_history_latest l
                 WHERE 
-                    company_id = %s AND resourcename = %s
-                GROUP BY 
-                    question_hash
-            ) latest_questions ON gh.question_hash = latest_questions.question_hash AND gh.datetime = latest_questions.latest_datetime
+                    l.company_id = %s
+                    AND l.resourcename = %s
+                    AND l.answered_only = false
+                ORDER BY 
+                    l.question_hash, l.datetime DESC, l.history_id DESC
+            ) latest_questions
+            INNER JOIN genie_chat_history gh ON gh.id = latest_questions.history_id
             WHERE 
-                gh.company_id = %s AND gh.resourcename = %s
+                (%s::timestamptz IS NULL OR (gh.datetime, gh.id) < (%s, %s))
             ORDER BY 
-                gh.datetime DESC 
+                gh.datetime DESC, gh.id DESC 
             LIMIT %s OFFSET %s;
         """
-        cur.execute(query, (company_id, resourcename, company_id, resourcename, limit, skip))
-        results = cur.fetchall()
-
-        history = []
-        for result in results:
-            history_entry = {
-                "id": result[0],
-                "datetime": result[1],
-                "question": result[2],
-                "answer": result[3],
-                "genie_users_id": result[4],
-                "team_id_slack": result[5],
-                "user_id_slack": result[6],
-                "company_id": result[7],
-                "is_answered": result[8],
-                "db_schema": result[9],
-                "resourcename": result[10],
-                "ai_engine": result[11],
-                "results_len": result[12],
-                "score": result[13],
-                "ai_response": result[14],
-                "intermediate_steps": result[15],
-                "chart_code": result[16],
-                "total_tokens": result[17],
-                "total_cost": result[18],
-                "question_hash": result[19],
-                "total_time": result[20],
-                "db_warehouse": result[21],
-                "ai_model": result[22],
-                "ai_temp": result[23],
-                "chart_image_url": result[24],
-                "client_type": result[25],
-                "results_s3_key": result[26],
-            }
-            history.append(history_entry)
+        query = sql.SQL(query).format(columns=select_columns(columns, HISTORY_ALL_COLUMNS, alias="gh"))
+        cur.execute(query, (company_id, resourcename, after_datetime, after_datetime, after_id, limit, skip))
+        history = fetch_records(cur)
 
-        return history
+        return history, next_history_cursor(history, limit)
+    except InvalidHistoryCursor:
+        raise
     except Exception as e:
         traceback.print_exc()
         print(f"get_history_company_id, Database error: {e}")
-        return None
+        return None, None
     finally:
         cur.close()
         conn.close()
@@ -731,106 +813,53 @@ def get_history_by_user_id_skip_limit(
         genie_users_id,
         resourcename,
         limit=10,
-        skip=0
+        skip=0,
+        page_cursor=None,
+        columns=None,
 ):
+    if columns is None:
+        columns = HISTORY_LIST_COLUMNS
     cur = conn.cursor()
 
     try:
+        # page_cursor takes precedence over skip, see next_history_cursor
+        after_datetime, after_id = decode_history_cursor(page_cursor)
+        if page_cursor:
+            skip = 0
+
         # Query the genie_chat_history
         query = """
-            SELECT 
-                gh.id, 
-                gh.datetime, 
-                gh.question, 
-                gh.answer, 
-                gh.genie_users_id, 
-                gh.team_id_slack, 
-                gh.user_id_slack,
-                gh.company_id, 
-                gh.is_answered, 
-                gh.db_schema, 
-                gh.resourcename, 
-                gh.ai_engine, 
-                gh.results_len, 
-                gh.score, 
-                gh.ai_response, 
-                gh.intermediate_steps, 
-                gh.chart_code,
-                gh.total_tokens,
-                gh.total_cost,
-                gh.question_hash,
-                gh.total_time,
-                gh.db_warehouse,
-                gh.ai_model,
-                gh.ai_temp,
-                gh.chart_image_url,
-                gh.client_type,
-                gh.results_s3_key,
-                gh.error_msg,
-                gh.status
-            FROM 
-                genie_chat_history gh
-            INNER JOIN (
-                SELECT 
-                    question_hash, 
-                    MAX(datetime) AS latest_datetime
+            SELECT {columns}
+            FROM (
+                SELECT DISTINCT ON (l.question_hash) 
+                    l.history_id
                 FROM 
-                    genie_chat_history
+                    genie_chat_history_latest l
                 WHERE 
-                    genie_users_id = %s AND resourcename = %s
-                GROUP BY 
-                    question_hash
-            ) latest_questions ON gh.question_hash = latest_questions.question_hash AND gh.datetime = latest_questions.latest_datetime
+                    l.genie_users_id = %s
+                    AND l.resourcename = %s
+                    AND l.answered_only = false
+                ORDER BY 
+                    l.question_hash, l.datetime DESC, l.history_id DESC
+            ) latest_questions
+            INNER JOIN genie_chat_history gh ON gh.id = latest_questions.history_id
             WHERE 
-                gh.genie_users_id = %s AND 
-                gh.resourcename = %s
+                (%s::timestamptz IS NULL OR (gh.datetime, gh.id) < (%s, %s))
             ORDER BY 
-                gh.datetime DESC 
+                gh.datetime DESC, gh.id DESC 
             LIMIT %s OFFSET %s;
         """
-        cur.execute(query, (genie_users_id, resourcename, genie_users_id, resourcename, limit, skip))
-        results = cur.fetchall()
-
-        history = []
-        for result in results:
-            history_entry = {
-                "id": result[0],
-                "datetime": result[1],
-                "question": result[2],
-                "answer": result[3],
-                "genie_users_id": result[4],
-                "team_id_slack": result[5],
-                "user_id_slack": result[6],
-                "company_id": result[7],
-                "is_answered": result[8],
-                "db_schema": result[9],
-                "resourcename": result[10],
-                "ai_engine": result[11],
-                "results_len": result[12],
-                "score": result[13],
-                "ai_response": result[14],
-                "intermediate_steps": result[15],
-                "chart_code": result[16],
-                "total_tokens": result[17],
-                "total_cost": result[18],
-                "question_hash": result[19],
-                "total_time": result[20],
-                "db_warehouse": result[21],
-                "ai_model": result[22],
-                "ai_temp": result[23],
-                "chart_image_url": result[24],
-                "client_type": result[25],
-                "results_s3_key": result[26],
-                "error_msg": result[27],
-                "status": result[28],
-            }
-            history.append(history_entry)
+        query = sql.SQL(query).format(columns=select_columns(columns, HISTORY_ALL_COLUMNS, alias="gh"))
+        cur.execute(query, (genie_users_id, resourcename, after_datetime, after_datetime, after_id, limit, skip))
+        history = fetch_records(cur)
 
-        return history
+        return history, next_history_cursor(history, limit)
+    except InvalidHistoryCursor:
+        raise
     except Exception as e:
         traceback.print_exc()
         print(f"get_history_by_user_id_skip_limit, Database error: {e}")
-        return None
+        return None, None
     finally:
         cur.close()
         conn.close()
@@ -844,8 +873,12 @@ def get_history_by_user_id_schema_warehouse_skip_limit(
         db_warehouse="",
         limit=10,
         skip=0,
+        page_cursor=None,
+        columns=None,
 
 ):
+    if columns is None:
+        columns = HISTORY_LIST_COLUMNS
     cur = conn.cursor()
 
     if not db_schema:
@@ -854,111 +887,50 @@ def get_history_by_user_id_schema_warehouse_skip_limit(
         db_warehouse = ""
 
     try:
+        # page_cursor takes precedence over skip, see next_history_cursor
+        after_datetime, after_id = decode_history_cursor(page_cursor)
+        if page_cursor:
+            skip = 0
+
         # Query the genie_chat_history
         query = """
-            SELECT 
-                gh.id, 
-                gh.datetime, 
-                gh.question, 
-                gh.answer, 
-                gh.genie_users_id, 
-                gh.team_id_slack, 
-                gh.user_id_slack,
-                gh.company_id, 
-                gh.is_answered, 
-                gh.db_schema, 
-                gh.resourcename, 
-                gh.ai_engine, 
-                gh.results_len, 
-                gh.score, 
-                gh.ai_response, 
-                gh.intermediate_steps, 
-                gh.chart_code,
-                gh.total_tokens,
-                gh.total_cost,
-                gh.question_hash,
-                gh.total_time,
-                gh.db_warehouse,
-                gh.ai_model,
-                gh.ai_temp,
-                gh.chart_image_url,
-                gh.client_type,
-                gh.results_s3_key,
-                gh.error_msg,
-                gh.status
-            FROM 
-                genie_chat_history gh
-            INNER JOIN (
-                SELECT 
-                    question_hash, 
-                    MAX(datetime) AS latest_datetime
+            SELECT {columns}
+            FROM (
+                SELECT DISTINCT ON (l.question_hash) 
+                    l.history_id
                 FROM 
-                    genie_chat_history
+                    genie_chat_history_latest l
                 WHERE 
-                    genie_users_id = %s AND 
-                    resourcename = %s AND
-                    db_schema = %s AND   
-                    db_warehouse = %s 
-                GROUP BY 
-                    question_hash
-            ) latest_questions ON gh.question_hash = latest_questions.question_hash AND gh.datetime = latest_questions.latest_datetime
+                    l.genie_users_id = %s
+                    AND l.resourcename = %s
+                    AND l.db_schema = %s
+                    AND l.db_warehouse = %s
+                    AND l.answered_only = false
+                ORDER BY 
+                    l.question_hash, l.datetime DESC, l.history_id DESC
+            ) latest_questions
+            INNER JOIN genie_chat_history gh ON gh.id = latest_questions.history_id
             WHERE 
-                gh.genie_users_id = %s AND 
-                gh.resourcename = %s AND
-                gh.db_schema = %s AND   
-                gh.db_warehouse = %s 
+                (%s::timestamptz IS NULL OR (gh.datetime, gh.id) < (%s, %s))
             ORDER BY 
-                gh.datetime DESC 
+                gh.datetime DESC, gh.id DESC 
             LIMIT %s OFFSET %s;
         """
+        query = sql.SQL(query).format(columns=select_columns(columns, HISTORY_ALL_COLUMNS, alias="gh"))
         cur.execute(query,
                     (
                         genie_users_id, resourcename, db_schema, db_warehouse,
-                        genie_users_id, resourcename, db_schema, db_warehouse,
-                        limit, skip
+                        after_datetime, after_datetime, after_id, limit, skip
                     ))
-        results = cur.fetchall()
-
-        history = []
-        for result in results:
-            history_entry = {
-                "id": result[0],
-                "datetime": result[1],
-                "question": result[2],
-                "answer": result[3],
-                "genie_users_id": result[4],
-                "team_id_slack": result[5],
-                "user_id_slack": result[6],
-                "company_id": result[7],
-                "is_answered": result[8],
-                "db_schema": result[9],
-                "resourcename": result[10],
-                "ai_engine": result[11],
-                "results_len": result[12],
-                "score": result[13],
-                "ai_response": result[14],
-                "intermediate_steps": result[15],
-                "chart_code": result[16],
-                "total_tokens": result[17],
-                "total_cost": result[18],
-                "question_hash": result[19],
-                "total_time": result[20],
-                "db_warehouse": result[21],
-                "ai_model": result[22],
-                "ai_temp": result[23],
-                "chart_image_url": result[24],
-                "client_type": result[25],
-                "results_s3_key": result[26],
-                "error_msg": result[27],
-                "status": result[28],
-            }
-            history.append(history_entry)
+        history = fetch_records(cur)
 
-        return history
+        return history, next_history_cursor(history, limit)
+    except InvalidHistoryCursor:
+        raise
     except Exception as e:
         traceback.print_exc()
         print(f"get_history_by_user_id_schema_warehouse_skip_limit, Database error: {e}")
-        return None
+        return None, None
     finally:
         cur.close()
         conn.close()
@@ -966,102 +938,55 @@ def get_history_by_user_id_schema_warehouse_skip_limit(
 
 def get_history_by_team_id_user_id_company_id_skip_limit(conn, slack_team_id, slack_user_id, company_id, resourcename,
                                                          limit=10,
-                                                         skip=0):
+                                                         skip=0,
+                                                         page_cursor=None, columns=None):
+    if columns is None:
+        columns = HISTORY_LIST_COLUMNS
     cur = conn.cursor()
 
     try:
+        # page_cursor takes precedence over skip, see next_history_cursor
+        after_datetime, after_id = decode_history_cursor(page_cursor)
+        if page_cursor:
+            skip = 0
+
         # Query the genie_chat_history
         query = """
-            SELECT 
-                gh.id, 
-                gh.datetime, 
-                gh.question, 
-                gh.answer, 
-                gh.genie_users_id, 
-                gh.team_id_slack, 
-                gh.user_id_slack,
-                gh.company_id, 
-                gh.is_answered, 
-                gh.db_schema, 
-                gh.resourcename, 
-                gh.ai_engine, 
-                gh.results_len,
-                gh.score, 
-                gh.ai_response, 
-                gh.intermediate_steps, 
-                gh.chart_code,
-                gh.total_tokens,
-                gh.total_cost,
-                gh.question_hash,
-                gh.total_time,
-                gh.db_warehouse,
-                gh.ai_model,
-                gh.ai_temp,
-                gh.chart_image_url,
-                gh.client_type,
-                gh.results_s3_key
-            FROM 
-                genie_chat_history gh
-            INNER JOIN (
-                SELECT 
-                    question_hash, 
-                    MAX(datetime) AS latest_datetime
+            SELECT {columns}
+            FROM (
+                SELECT DISTINCT ON (l.question_hash) 
+                    l.history_id
                 FROM 
-                    genie_chat_history
+                    genie_chat_history_latest l
                 WHERE 
-                    user_id_slack = %s AND team_id_slack = %s AND company_id = %s AND resourcename = %s AND answer IS NOT NULL AND results_len > 0
-                GROUP BY 
-                    question_hash
-            ) latest_questions ON gh.question_hash = latest_questions.question_hash AND gh.datetime = latest_questions.latest_datetime
+                    l.user_id_slack = %s
+                    AND l.team_id_slack = %s
+                    AND l.company_id = %s
+                    AND l.resourcename = %s
+                    AND l.answered_only = true
+                ORDER BY 
+                    l.question_hash, l.datetime DESC, l.history_id DESC
+            ) latest_questions
+            INNER JOIN genie_chat_history gh ON gh.id = latest_questions.history_id
             WHERE 
-                gh.user_id_slack = %s AND gh.team_id_slack = %s AND gh.company_id = %s AND gh.resourcename = %s
+                (%s::timestamptz IS NULL OR (gh.datetime, gh.id) < (%s, %s))
             ORDER BY 
-                gh.datetime DESC 
+                gh.datetime DESC, gh.id DESC 
             LIMIT %s OFFSET %s;
         """
+        query = sql.SQL(query).format(columns=select_columns(columns, HISTORY_ALL_COLUMNS, alias="gh"))
         cur.execute(query,
-                    (slack_user_id, slack_team_id, company_id, resourcename, slack_user_id, slack_team_id, company_id,
-                     resourcename, limit, skip))
-        results = cur.fetchall()
-
-        history = []
-        for result in results:
-            history_entry = {
-                "id": result[0],
-                "datetime": result[1],
-                "question": result[2],
-                "answer": result[3],
-                "genie_users_id": result[4],
-                "team_id_slack": result[5],
-                "user_id_slack": result[6],
-                "company_id": result[7],
-                "is_answered": result[8],
-                "db_schema": result[9],
-                "resourcename": result[10],
-                "ai_engine": result[11],
-                "results_len": result[12],
-                "score": result[13],
-                "ai_response": result[14],
-                "intermediate_steps": result[15],
-                "chart_code": result[16],
-                "total_tokens": result[17],
-                "total_cost": result[18],
-                "question_hash": result[19],
-                "total_time": result[20],
-                "db_warehouse": result[21],
-                "ai_model": result[22],
-                "ai_temp": result[23],
-                "chart_image_url": result[24],
-                "client_type": result[25],
-                "results_s3_key": result[26],
-            }
-            history.append(history_entry)
+                    (slack_user_id, slack_team_id, company_id, resourcename,
+                     after_datetime, after_datetime, after_id, limit, skip))
+        history = fetch_records(cur)
 
-        return history
+        return history, next_history_cursor(history, limit)
+    except InvalidHistoryCursor:
+        raise
     except Exception as e:
         traceback.print_exc()
         print(f"get_history_by_team_id_user_id_company_id_skip_limit, Database error: {e}")
-        return None
+        return None, None
     finally:
         cur.close()
         conn.close()
@@ -1076,8 +1001,12 @@ def get_history_by_client_type_skip_limit(
         db_warehouse,
         client_type,
         limit=10,
-        skip=0
+        skip=0,
+        page_cursor=None,
+        columns=None,
 ):
+    if columns is None:
+        columns = HISTORY_LIST_COLUMNS
     cur = conn.cursor()
 
     if not db_schema:
@@ -1089,169 +1018,72 @@ def get_history_by_client_type_skip_limit(
         f"get_history_by_client_type_skip_limit, genie_users_id={genie_users_id}, company_id={company_id}, client_type={client_type}, resourcename={resourcename}, db_schema={db_schema}, db_warehouse={db_warehouse}", )
 
     try:
+        # page_cursor takes precedence over skip, see next_history_cursor
+        after_datetime, after_id = decode_history_cursor(page_cursor)
+        if page_cursor:
+            skip = 0
+
         # Query the genie_chat_history
         query = """
-            SELECT 
-                gh.id, 
-                gh.datetime, 
-                gh.question, 
-                gh.answer, 
-                gh.genie_users_id, 
-                gh.team_id_slack, 
-                gh.user_id_slack,
-                gh.company_id, 
-                gh.is_answered, 
-                gh.db_schema, 
-                gh.resourcename, 
-                gh.ai_engine, 
-                gh.results_len,
-                gh.score, 
-                gh.ai_response, 
-                gh.intermediate_steps, 
-                gh.chart_code,
-                gh.total_tokens,
-                gh.total_cost,
-                gh.question_hash,
-                gh.total_time,
-                gh.db_warehouse,
-                gh.ai_model,
-                gh.ai_temp,
-                gh.chart_image_url,
-                gh.client_type,
-                gh.results_s3_key
-            FROM 
-                genie_chat_history gh
-            INNER JOIN (
-                SELECT 
-                    question_hash, 
-                    MAX(datetime) AS latest_datetime 
+            SELECT {columns}
+            FROM (
+                SELECT DISTINCT ON (l.question_hash) 
+                    l.history_id
                 FROM 
-                    genie_chat_history 
+                    genie_chat_history_latest l
                 WHERE 
-                    genie_users_id = %s 
-                    AND company_id = %s 
-                    AND client_type = %s 
-                    AND resourcename = %s 
-                    AND db_schema = %s 
-                    AND db_warehouse = %s 
-                    AND answer IS NOT NULL 
-                    AND results_len > 0
-                GROUP BY 
-                    question_hash
-            ) latest_questions ON gh.question_hash = latest_questions.question_hash AND gh.datetime = latest_questions.latest_datetime
+                    l.genie_users_id = %s
+                    AND l.company_id = %s
+                    AND l.client_type = %s
+                    AND l.resourcename = %s
+                    AND l.db_schema = %s
+                    AND l.db_warehouse = %s
+                    AND l.answered_only = true
+                ORDER BY 
+                    l.question_hash, l.datetime DESC, l.history_id DESC
+            ) latest_questions
+            INNER JOIN genie_chat_history gh ON gh.id = latest_questions.history_id
             WHERE 
-                gh.genie_users_id = %s 
-                AND gh.company_id = %s 
-                AND gh.client_type = %s 
-                AND gh.resourcename = %s
-                AND gh.db_schema = %s  
-                AND gh.db_warehouse = %s 
+                (%s::timestamptz IS NULL OR (gh.datetime, gh.id) < (%s, %s))
             ORDER BY 
-                gh.datetime DESC 
+                gh.datetime DESC, gh.id DESC 
             LIMIT %s OFFSET %s;
         """
+        query = sql.SQL(query).format(columns=select_columns(columns, HISTORY_ALL_COLUMNS, alias="gh"))
         cur.execute(query,
                     (genie_users_id, company_id, client_type, resourcename, db_schema, db_warehouse,
-
-                     genie_users_id, company_id, client_type, resourcename, db_schema, db_warehouse,
-                     limit, skip)
+                     after_datetime, after_datetime, after_id, limit, skip)
                     )
-        results = cur.fetchall()
-
-        history = []
-        for result in results:
-            history_entry = {
-                "id": result[0],
-                "datetime": result[1],
-                "question": result[2],
-                "answer": result[3],
-                "genie_users_id": result[4],
-                "team_id_slack": result[5],
-                "user_id_slack": result[6],
-                "company_id": result[7],
-                "is_answered": result[8],
-                "db_schema": result[9],
-                "resourcename": result[10],
-                "ai_engine": result[11],
-                "results_len": result[12],
-                "score": result[13],
-                "ai_response": result[14],
-                "intermediate_steps": result[15],
-                "chart_code": result[16],
-                "total_tokens": result[17],
-                "total_cost": result[18],
-                "question_hash": result[19],
-                "total_time": result[20],
-                "db_warehouse": result[21],
-                "ai_model": result[22],
-                "ai_temp": result[23],
-                "chart_image_url": result[24],
-                "client_type": result[25],
-                "results_s3_key": result[26],
-            }
-            history.append(history_entry)
+        history = fetch_records(cur)
 
-        return history
+        return history, next_history_cursor(history, limit)
+    except InvalidHistoryCursor:
+        raise
     except Exception as e:
         traceback.print_exc()
         print(f"get_history_by_client_type_skip_limit, Database error: {e}")
-        return None
+        return None, None
     finally:
         cur.close()
         conn.close()
 
 
-def get_history_by_id(conn, company_id, id):
+def get_history_by_id(conn, company_id, id, columns=None):
+    if columns is None:
+        columns = HISTORY_DETAIL_COLUMNS
     cur = conn.cursor()
 
     try:
         # Query the genie_chat_history
         query = """
-            SELECT id, datetime, question, answer, genie_users_id, team_id_slack, user_id_slack,
-            company_id, is_answered, db_schema, resourcename, ai_engine, results_len,
-            score, ai_response, intermediate_steps, chart_code, total_tokens, total_cost, question_hash, total_time,
-            status, table_name, db_warehouse, ai_model, ai_temp, chart_image_url, client_type, results_s3_key
+            SELECT {columns}
             FROM genie_chat_history 
             WHERE company_id = %s
             AND id = %s            
         """
+        query = sql.SQL(query).format(columns=select_columns(columns, HISTORY_ALL_COLUMNS))
         cur.execute(query, (company_id, id))
-        results = cur.fetchall()
-
-        history = []
-        for result in results:
-            history_entry = {
-                "id": result[0],
-                "datetime": result[1],
-                "question": result[2],
-                "answer": result[3],
-                "genie_users_id": result[4],
-                "team_id_slack": result[5],
-                "user_id_slack": result[6],
-                "company_id": result[7],
-                "is_answered": result[8],
-                "db_schema": result[9],
-                "resourcename": result[10],
-                "ai_engine": result[11],
-                "results_len": result[12],
-                "score": result[13],
-                "ai_response": result[14],
-                "intermediate_steps": result[15],
-                "chart_code": result[16],
-                "total_tokens": result[17],
-                "total_cost": result[18],
-                "question_hash": result[19],
-                "total_time": result[20],
-                "status": result[21],
-                "table_name": result[22],
-                "db_warehouse": result[23],
-                "ai_model": result[24],
-                "ai_temp": result[25],
-                "chart_image_url": result[26],
-                "client_type": result[27],
-                "results_s3_key": result[28],
-            }
-            history.append(history_entry)
+        history = fetch_dicts(cur)
 
         return history
     except Exception as e:
@@ -1279,7 +1111,11 @@ def get_chat_history_count_by_genie_users_id(conn, genie_users_id, year=None, mo
     last_day = datetime(year, month, calendar.monthrange(year, month)[1], 23, 59, 59)
 
     try:
-        # Query to count the requests
+        request_count = get_usage_count(cur, USAGE_SCOPE_USER, genie_users_id, year, month)
+        if request_count is not None:
+            return request_count
+
+        # No counter yet for this month, count once and seed it
         query = """
             SELECT COUNT(*)
             FROM genie_chat_history 
@@ -1289,6 +1125,8 @@ def get_chat_history_count_by_genie_users_id(conn, genie_users_id, year=None, mo
         result = cur.fetchone()
 
         request_count = result[0] if result else 0
+        seed_usage_count(cur, USAGE_SCOPE_USER, genie_users_id, year, month, request_count, datetime.now(tz=pytz.UTC))
+        conn.commit()
         return request_count
     except Exception as e:
         traceback.print_exc()
@@ -1315,7 +1153,11 @@ def get_chat_history_count_by_company_id(conn, company_id, year=None, month=None
     last_day = datetime(year, month, calendar.monthrange(year, month)[1], 23, 59, 59)
 
     try:
-        # Query to count the requests
+        request_count = get_usage_count(cur, USAGE_SCOPE_COMPANY, company_id, year, month)
+        if request_count is not None:
+            return request_count
+
+        # No counter yet for this month, count once and seed it
         query = """
             SELECT COUNT(*)
             FROM genie_chat_history 
@@ -1325,6 +1167,8 @@ def get_chat_history_count_by_company_id(conn, company_id, year=None, month=None
         result = cur.fetchone()
 
         request_count = result[0] if result else 0
+        seed_usage_count(cur, USAGE_SCOPE_COMPANY, company_id, year, month, request_count, datetime.now(tz=pytz.UTC))
+        conn.commit()
         return request_count
     except Exception as e:
         traceback.print_exc()
@@ -1335,9 +1179,11 @@ def get_chat_history_count_by_company_id(conn, company_id, year=None, month=None
         conn.close()
 
 
-def get_chat_history_list_by_company_id(conn, company_id, year=None, month=None):
+def get_chat_history_list_by_company_id(conn, company_id, year=None, month=None, columns=None):
     from datetime import datetime
 
+    if columns is None:
+        columns = HISTORY_DETAIL_COLUMNS
     cur = conn.cursor()
 
     # If year and month are not provided, use current year and month
@@ -1353,51 +1199,14 @@ def get_chat_history_list_by_company_id(conn, company_id, year=None, month=None)
     try:
         # Query to count the requests
         query = """
-            SELECT id, datetime, question, answer, genie_users_id, team_id_slack, user_id_slack,
-            company_id, is_answered, db_schema, resourcename, ai_engine, results_len,
-            score, ai_response, intermediate_steps, chart_code, total_tokens, total_cost, question_hash, total_time,
-            status, table_name, db_warehouse, ai_model, ai_temp, chart_image_url, client_type, results_s3_key
+            SELECT {columns}
             FROM genie_chat_history 
             WHERE company_id = %s AND datetime BETWEEN %s AND %s
         """
+        query = sql.SQL(query).format(columns=select_columns(columns, HISTORY_ALL_COLUMNS))
 
         cur.execute(query, (company_id, first_day, last_day))
-        results = cur.fetchall()
-
-        history = []
-        for result in results:
-            history_entry = {
-                "id": result[0],
-                "datetime": result[1],
-                "question": result[2],
-                "answer": result[3],
-                "genie_users_id": result[4],
-                "team_id_slack": result[5],
-                "user_id_slack": result[6],
-                "company_id": result[7],
-                "is_answered": result[8],
-                "db_schema": result[9],
-                "resourcename": result[10],
-                "ai_engine": result[11],
-                "results_len": result[12],
-                "score": result[13],
-                "ai_response": result[14],
-                "intermediate_steps": result[15],
-                "chart_code": result[16],
-                "total_tokens": result[17],
-                "total_cost": result[18],
-                "question_hash": result[19],
-                "total_time": result[20],
-                "status": result[21],
-                "table_name": result[22],
-                "db_warehouse": result[23],
-                "ai_model": result[24],
-                "ai_temp": result[25],
-                "chart_image_url": result[26],
-                "client_type": result[27],
-                "results_s3_key": result[28],
-            }
-            history.append(history_entry)
+        history = fetch_dicts(cur)
 
         return history
     except Exception as e:
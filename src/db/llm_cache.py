@@ -0,0 +1,225 @@
+import hashlib
+import json
+import threading
+import traceback
+
+from psycopg2 import sql
+
+from config.settings.base import LLM_CACHE_ENABLED, LLM_CACHE_MAX_BYTES, LLM_CACHE_LOCAL_MAX_BYTES, \
+    LLM_CACHE_LOCAL_TTL, LLM_CACHE_EVICT_EVERY
+from src.db.login_helpers import getConn
+from src.utils.ttl_cache import TTLCache
+
+
+def prompt_hash(llm_string, prompt):
+    """llm_string holds the model and its parameters (temperature included), prompt the serialized messages."""
+    return hashlib.sha256(f"{llm_string}\n{prompt}".encode("utf-8")).hexdigest()
+
+
+def get_llm_cache(conn, prompt_hash):
+    """Cached response of a prompt, counted as a hit so eviction keeps it."""
+    cur = conn.cursor()
+    try:
+        update = sql.SQL(
+            """
+            UPDATE genie_llm_cache SET hits = hits + 1, last_hit = NOW()
+            WHERE prompt_hash = %s
+            RETURNING response
+            """
+        )
+        cur.execute(update, (prompt_hash,))
+        row = cur.fetchone()
+        return row[0] if row else None
+    except Exception as e:
+        traceback.print_exc()
+        print(f"get_llm_cache, Database error: {e}")
+        return None
+    finally:
+        conn.commit()
+        cur.close()
+        conn.close()
+
+
+def save_llm_cache(conn, prompt_hash, response, size):
+    cur = conn.cursor()
+    try:
+        insert = sql.SQL(
+            """
+            INSERT INTO genie_llm_cache (prompt_hash, response, size, hits, datetime, last_hit)
+            VALUES (%s, %s::jsonb, %s, 0, NOW(), NOW())
+            ON CONFLICT (prompt_hash) DO UPDATE SET
+                response = EXCLUDED.response,
+                size = EXCLUDED.size,
+                last_hit = NOW()
+            """
+        )
+        cur.execute(insert, (prompt_hash, json.dumps(response), size))
+        return True
+    except Exception as e:
+        traceback.print_exc()
+        print(f"save_llm_cache, Database error: {e}")
+        return False
+    finally:
+        conn.commit()
+        cur.close()
+        conn.close()
+
+
+def evict_llm_cache(conn, max_bytes):
+    """Deletes the least recently hit responses beyond max_bytes in total."""
+    cur = conn.cursor()
+    try:
+        delete = sql.SQL(
+            """
+            DELETE FROM genie_llm_cache WHERE id IN (
+                SELECT id FROM (
+                    SELECT id, SUM(size) OVER (ORDER BY last_hit DESC, id DESC) AS total
+                    FROM genie_llm_cache
+                ) c
+                WHERE c.total > %s
+            )
+            """
+        )
+        cur.execute(delete, (max_bytes,))
+        print(f"evict_llm_cache, max_bytes={max_bytes}, deleted={cur.rowcount}")
+        return cur.rowcount
+    except Exception as e:
+        traceback.print_exc()
+        print(f"evict_llm_cache, Database error: {e}")
+        return 0
+    finally:
+        conn.commit()
+        cur.close()
+        conn.close()
+
+
+def clear_llm_cache(conn):
+    cur = conn.cursor()
+    try:
+        cur.execute(sql.SQL("DELETE FROM genie_llm_cache"))
+        return cur.rowcount
+    except Exception as e:
+        traceback.print_exc()
+        print(f"clear_llm_cache, Database error: {e}")
+        return 0
+    finally:
+        conn.commit()
+        cur.close()
+        conn.close()
+
+
+def _get(key):
+    return get_llm_cache(conn=getConn(), prompt_hash=key)
+
+
+def _save(key, response, size):
+    return save_llm_cache(conn=getConn(), prompt_hash=key, response=response, size=size)
+
+
+def _evict(max_bytes):
+    return evict_llm_cache(conn=getConn(), max_bytes=max_bytes)
+
+
+def _clear():
+    return clear_llm_cache(conn=getConn())
+
+
+class LLMCache:
+    """Completions of temperature 0 prompts keyed by prompt_hash, in genie_llm_cache with an in-process LRU of
+    local_max_bytes in front.
+
+    Every evict_every writes the least recently hit rows beyond max_bytes are deleted from genie_llm_cache.
+    """
+
+    def __init__(self, enabled=True, max_bytes=512 * 1024 * 1024, local_max_bytes=64 * 1024 * 1024,
+                 local_ttl=3600.0, evict_every=100, get=_get, save=_save, evict=_evict, clear=_clear):
+        self.enabled = enabled
+        self.max_bytes = max_bytes
+        self.evict_every = evict_every
+        self._get = get
+        self._save = save
+        self._evict = evict
+        self._clear = clear
+        self._local = TTLCache(maxsize=100_000, ttl=local_ttl, max_weight=local_max_bytes)
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._counts = {"local_hits": 0, "hits": 0, "misses": 0}
+
+    def _count(self, name):
+        with self._lock:
+            self._counts[name] += 1
+
+    def get(self, key):
+        """List of serialized generations, None on a miss."""
+        if not self.enabled:
+            return None
+        response = self._local.get(key)
+        if response is not None:
+            self._count("local_hits")
+            return response
+        response = self._get(key)
+        if response is None:
+            self._count("misses")
+            return None
+        self._count("hits")
+        self._local.set(key, response, weight=sum(len(value) for value in response))
+        return response
+
+    def set(self, key, response):
+        if not self.enabled:
+            return False
+        size = sum(len(value) for value in response)
+        self._local.set(key, response, weight=size)
+        saved = self._save(key, response, size)
+        with self._lock:
+            self._writes += 1
+            evict = self._writes % self.evict_every == 0
+        if evict:
+            self._evict(self.max_bytes)
+        return saved
+
+    def clear(self):
+        self._local.clear()
+        return self._clear()
+
+    def stats(self):
+        with self._lock:
+            counts = dict(self._counts, writes=self._writes)
+        lookups = counts["local_hits"] + counts["hits"] + counts["misses"]
+        counts["hit_rate"] = round((lookups - counts["misses"]) / lookups, 4) if lookups > 0 else 0.0
+        return dict(counts, local=self._local.stats())
+
+
+llm_cache = LLMCache(
+    enabled=LLM_CACHE_ENABLED,
+    max_bytes=LLM_CACHE_MAX_BYTES,
+    local_max_bytes=LLM_CACHE_LOCAL_MAX_BYTES,
+    local_ttl=LLM_CACHE_LOCAL_TTL,
+    evict_every=LLM_CACHE_EVICT_EVERY,
+)
+
+_langchain_cache = None
+_langchain_cache_lock = threading.Lock()
+
+
+def get_langchain_llm_cache():
+    """llm_cache as a langchain BaseCache, for the cache argument of temperature 0 chat models."""
+    global _langchain_cache
+    with _langchain_cache_lock:
+        if _langchain_cache is None:
+            from langchain_core.caches import BaseCache
+            from langchain_core.load import dumps, loads
+
+            class PostgresLLMCache(BaseCache):
+                def lookup(self, prompt, llm_string):
+                    response = llm_cache.get(prompt_hash(llm_string, prompt))
+                    return None if response is None else [loads(generation) for generation in response]
+
+                def update(self, prompt, llm_string, return_val):
+                    llm_cache.set(prompt_hash(llm_string, prompt), [dumps(generation) for generation in return_val])
+
+                def clear(self, **kwargs):
+                    llm_cache.clear()
+
+            _langchain_cache = PostgresLLMCache()
+        return _langchain_cache
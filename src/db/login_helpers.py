@@ -8,14 +8,31 @@ import psycopg2
 import pytz
 from psycopg2 import sql, Error
 
-from config.settings.base import DATABASE_URL
+from config.settings.base import DATABASE_URL, DB_POOL_ENABLED, DB_POOL_MIN_SIZE, DB_POOL_MAX_SIZE, \
+    DB_POOL_TIMEOUT, DB_POOL_MAX_IDLE, DB_POOL_MAX_LIFETIME, DB_POOL_HEALTHCHECK_INTERVAL
+from src.db.pool import get_pool, PoolTimeout
 
 
 def getConn(max_retries=10):
     for attempt in range(1, max_retries + 1):
         try:
+            if DB_POOL_ENABLED:
+                # conn.close() on the returned connection hands it back to the pool
+                return get_pool(
+                    DATABASE_URL,
+                    min_size=DB_POOL_MIN_SIZE,
+                    max_size=DB_POOL_MAX_SIZE,
+                    timeout=DB_POOL_TIMEOUT,
+                    max_idle=DB_POOL_MAX_IDLE,
+                    max_lifetime=DB_POOL_MAX_LIFETIME,
+                    health_check_interval=DB_POOL_HEALTHCHECK_INTERVAL,
+                ).getconn()
             conn = psycopg2.connect(DATABASE_URL)
             return conn
+        except PoolTimeout as e:
+            # the pool already waited DB_POOL_TIMEOUT, retrying only queues more requests behind a busy pool
+            print(f"getConn, pool exhausted, e={e}")
+            return None
         except Exception as e:
             print(e)
             if attempt < max_retries:
@@ -442,6 +459,24 @@ def login_user_with_key_genie(conn, key_hash):
         conn.close()
 
 
+def add_genie_api_key_usage_count(conn, id, count):
+    cur = conn.cursor()
+    try:
+        print(f"add_genie_api_key_usage_count, UPDATE, id={id}, count={count}")
+        update = sql.SQL("UPDATE genie_api_keys SET usage_count = usage_count + %s WHERE id = %s;")
+        cur.execute(update, (count, id))
+        return cur.rowcount
+    except Exception as e:
+        traceback.print_exc()
+        print(f"add_genie_api_key_usage_count, Database error: {e}")
+        return None
+
+    finally:
+        conn.commit()
+        cur.close()
+        conn.close()
+
+
 def get_user_key_genie(conn, genie_users_id):
     cur = conn.cursor()
     try:
@@ -0,0 +1,275 @@
+import os
+import threading
+import time
+import traceback
+from collections import deque
+
+import psycopg2
+from psycopg2 import extensions
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class _Slot:
+    __slots__ = ("raw", "created_at", "last_used")
+
+    def __init__(self, raw):
+        now = time.monotonic()
+        self.raw = raw
+        self.created_at = now
+        self.last_used = now
+
+
+class PooledConnection:
+    """Proxy around a psycopg2 connection checked out from a ConnectionPool.
+
+    Behaves like the raw connection, except that close() hands it back to the
+    pool instead of closing the socket, so helpers that call conn.close() in
+    their finally block keep working unchanged.
+    """
+
+    def __init__(self, pool, slot):
+        self._pool = pool
+        self._slot = slot
+        self._returned = False
+
+    def __getattr__(self, name):
+        if self._returned:
+            raise psycopg2.InterfaceError("connection already closed")
+        return getattr(self._slot.raw, name)
+
+    @property
+    def closed(self):
+        if self._returned:
+            return 1
+        return self._slot.raw.closed
+
+    def close(self):
+        if self._returned:
+            return
+        self._returned = True
+        self._pool.putconn(self._slot)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        return self._slot.raw.__exit__(exc_type, exc_value, tb)
+
+    def __del__(self):
+        # Safety net for helpers that never close their connection.
+        try:
+            if not self._returned:
+                self._returned = True
+                self._pool.putconn(self._slot, leaked=True)
+        except Exception:
+            pass
+
+
+class ConnectionPool:
+    def __init__(
+            self,
+            dsn,
+            min_size=1,
+            max_size=10,
+            timeout=30.0,
+            max_idle=300.0,
+            max_lifetime=3600.0,
+            health_check_interval=30.0,
+            connect=psycopg2.connect,
+    ):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError(f"invalid pool size, min_size={min_size}, max_size={max_size}")
+        self.dsn = dsn
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.max_lifetime = max_lifetime
+        self.health_check_interval = health_check_interval
+        self._connect = connect
+
+        self._cond = threading.Condition()
+        self._idle = deque()
+        self._size = 0
+        self._closed = False
+
+        self._checkouts = 0
+        self._checked_out = 0
+        self._waits = 0
+        self._wait_time_total = 0.0
+        self._wait_time_max = 0.0
+        self._timeouts = 0
+        self._opened = 0
+        self._discarded = 0
+        self._health_check_failures = 0
+        self._leaked = 0
+
+    def getconn(self):
+        start = time.monotonic()
+        deadline = start + self.timeout
+        waited = False
+
+        while True:
+            slot = None
+            with self._cond:
+                if self._closed:
+                    raise psycopg2.InterfaceError("connection pool is closed")
+                while True:
+                    if self._idle:
+                        slot = self._idle.pop()
+                        break
+                    if self._size < self.max_size:
+                        self._size += 1
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._timeouts += 1
+                        raise PoolTimeout(
+                            f"ConnectionPool, no connection available after {self.timeout}s, max_size={self.max_size}")
+                    waited = True
+                    self._cond.wait(remaining)
+
+            if slot is None:
+                try:
+                    slot = _Slot(self._connect(self.dsn))
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+                with self._cond:
+                    self._opened += 1
+            elif not self._is_usable(slot):
+                self._discard(slot)
+                continue
+
+            wait_time = time.monotonic() - start
+            with self._cond:
+                self._checkouts += 1
+                self._checked_out += 1
+                if waited:
+                    self._waits += 1
+                self._wait_time_total += wait_time
+                self._wait_time_max = max(self._wait_time_max, wait_time)
+            return PooledConnection(self, slot)
+
+    def putconn(self, slot, leaked=False):
+        raw = slot.raw
+        now = time.monotonic()
+        reusable = not self._closed and not raw.closed and now - slot.created_at < self.max_lifetime
+
+        if reusable:
+            try:
+                if raw.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+                    raw.rollback()
+            except Exception:
+                reusable = False
+
+        with self._cond:
+            self._checked_out -= 1
+            if leaked:
+                self._leaked += 1
+            if reusable:
+                slot.last_used = now
+                self._idle.append(slot)
+                self._cond.notify()
+
+        if not reusable:
+            self._discard(slot)
+        self._prune_idle()
+
+    def _is_usable(self, slot):
+        raw = slot.raw
+        now = time.monotonic()
+        if raw.closed or now - slot.created_at >= self.max_lifetime:
+            return False
+        if now - slot.last_used < self.health_check_interval:
+            return True
+        try:
+            cur = raw.cursor()
+            cur.execute("SELECT 1")
+            cur.close()
+            raw.rollback()
+            return True
+        except Exception as e:
+            print(f"ConnectionPool, health check failed, discarding connection, e={e}")
+            with self._cond:
+                self._health_check_failures += 1
+            return False
+
+    def _discard(self, slot):
+        try:
+            if not slot.raw.closed:
+                slot.raw.close()
+        except Exception:
+            traceback.print_exc()
+        with self._cond:
+            self._size -= 1
+            self._discarded += 1
+            self._cond.notify()
+
+    def _prune_idle(self):
+        now = time.monotonic()
+        expired = []
+        with self._cond:
+            while len(self._idle) > 0 and self._size - len(expired) > self.min_size:
+                oldest = self._idle[0]
+                if now - oldest.last_used < self.max_idle:
+                    break
+                expired.append(self._idle.popleft())
+        for slot in expired:
+            self._discard(slot)
+
+    def closeall(self):
+        with self._cond:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+        for slot in idle:
+            self._discard(slot)
+
+    def stats(self):
+        with self._cond:
+            return {
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+                "size": self._size,
+                "idle": len(self._idle),
+                "checked_out": self._checked_out,
+                "checkouts": self._checkouts,
+                "waits": self._waits,
+                "wait_time_total": self._wait_time_total,
+                "wait_time_avg": self._wait_time_total / self._checkouts if self._checkouts else 0.0,
+                "wait_time_max": self._wait_time_max,
+                "timeouts": self._timeouts,
+                "opened": self._opened,
+                "discarded": self._discarded,
+                "health_check_failures": self._health_check_failures,
+                "leaked": self._leaked,
+            }
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(dsn, **kwargs):
+    # Keyed by pid as well, so gunicorn workers forked after first use never share sockets.
+    key = (os.getpid(), dsn)
+    pool = _pools.get(key)
+    if pool is not None:
+        return pool
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = ConnectionPool(dsn, **kwargs)
+            _pools[key] = pool
+        return pool
+
+
+def get_pool_stats():
+    pid = os.getpid()
+    return [pool.stats() for (pool_pid, _), pool in list(_pools.items()) if pool_pid == pid]
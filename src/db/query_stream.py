@@ -0,0 +1,66 @@
+import io
+import json
+
+from config.settings.base import QUERY_STREAM_CHUNK_SIZE
+from src.db.utils import CustomJSONEncoder
+from src.utils.func_utils import iterate_in_thread
+
+NDJSON_CONTENT_TYPE = "application/x-ndjson"
+
+
+def stream_query(engine, sql_query, chunk_size=QUERY_STREAM_CHUNK_SIZE):
+    """Runs sql_query on a server-side cursor and yields the rows as lists of at most chunk_size dicts, so only one
+    chunk is held in memory. Dialects without server-side cursors ignore stream_results and buffer in the driver."""
+    from sqlalchemy import text
+
+    with engine.connect() as connection:
+        result = connection.execution_options(stream_results=True, max_row_buffer=chunk_size).execute(text(sql_query))
+        if not result.returns_rows:
+            return
+        columns = list(result.keys())
+        while True:
+            rows = result.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield [dict(zip(columns, row)) for row in rows]
+
+
+def ndjson_chunks(chunks):
+    """One bytes block per chunk of rows, each row a JSON document on its own line."""
+    for rows in chunks:
+        if len(rows) > 0:
+            yield "".join(json.dumps(row, cls=CustomJSONEncoder) + "\n" for row in rows).encode("utf-8")
+
+
+def ndjson_response(chunks):
+    """StreamingHttpResponse writing the rows as NDJSON while they are fetched, the rows are read in a worker thread
+    (see iterate_in_thread)."""
+    from django.http import StreamingHttpResponse
+
+    return StreamingHttpResponse(iterate_in_thread(ndjson_chunks(chunks)), content_type=NDJSON_CONTENT_TYPE)
+
+
+class IterableReader(io.RawIOBase):
+    """Read-only file object over an iterator of bytes blocks, lets upload_fileobj consume a stream part by part."""
+
+    def __init__(self, blocks):
+        self._blocks = iter(blocks)
+        self._block = memoryview(b"")
+
+    def readable(self):
+        return True
+
+    def readinto(self, target):
+        # fills target completely unless the stream ends, upload_fileobj treats a short read as the last part
+        written = 0
+        while written < len(target):
+            if len(self._block) == 0:
+                try:
+                    self._block = memoryview(next(self._blocks))
+                except StopIteration:
+                    break
+            size = min(len(target) - written, len(self._block))
+            target[written:written + size] = self._block[:size]
+            self._block = self._block[size:]
+            written += size
+        return written
@@ -0,0 +1,144 @@
+import json
+
+import sqlglot
+from sqlglot import exp
+
+from config.settings.base import RESULT_CACHE_ENABLED, RESULT_CACHE_TTL, RESULT_CACHE_TENANT_TTLS, \
+    RESULT_CACHE_MAX_BYTES, RESULT_CACHE_MAX_ENTRY_BYTES
+from src.utils.ttl_cache import TTLCache
+
+
+# Functions sqlglot does not model (exp.Anonymous) that are deterministic, any other one can have a side effect
+# (nextval, setval, pg_terminate_backend) or return a new value on every call (random, clock_timestamp, uuid).
+DETERMINISTIC_FUNCTIONS = frozenset((
+    "abs", "array_length", "bool_and", "bool_or", "btrim", "char_length", "character_length", "cume_dist", "date",
+    "date_part", "dateadd", "datediff", "dense_rank", "every", "first_value", "format", "ifnull", "iff", "initcap",
+    "json_build_object", "json_extract_path_text", "jsonb_build_object", "jsonb_extract_path_text", "lag",
+    "last_value", "lead", "left", "listagg", "ln", "log", "lpad", "ltrim", "md5", "median", "mod", "mode", "ntile",
+    "nullif", "nvl", "octet_length", "percent_rank", "percentile_cont", "percentile_disc", "power", "rank",
+    "regexp_replace", "replace", "reverse", "right", "round", "rpad", "rtrim", "sign", "split_part", "sqrt",
+    "stddev", "strpos", "to_date", "to_number", "to_timestamp", "trunc", "unnest", "variance", "width_bucket",
+))
+# Modelled functions whose value depends on when the query runs (now() parses as CURRENT_TIMESTAMP)
+VOLATILE_FUNCTIONS = (exp.CurrentDate, exp.CurrentDatetime, exp.CurrentTime, exp.CurrentTimestamp)
+# Niladic keywords sqlglot parses as column references
+VOLATILE_KEYWORDS = frozenset(("localtime", "localtimestamp", "sysdate", "current_user", "session_user"))
+
+
+def is_deterministic(expression):
+    """False when the query calls a function that is volatile, may have side effects or is not known to be neither."""
+    for node in expression.find_all(exp.Func, exp.Column):
+        if isinstance(node, exp.Column):
+            if not node.table and node.name.lower() in VOLATILE_KEYWORDS:
+                return False
+        elif isinstance(node, VOLATILE_FUNCTIONS):
+            return False
+        elif isinstance(node, exp.Anonymous) and node.name.lower() not in DETERMINISTIC_FUNCTIONS:
+            return False
+    return True
+
+
+def normalize_sql(sql_query, dialect=None):
+    """Canonical text of a single read-only, deterministic query (SELECT, UNION, ...), None for anything else,
+    including selects with INTO, a locking clause, a data-modifying CTE or a function outside is_deterministic.
+
+    sqlglot re-generates the query so formatting, comments and unquoted identifier case do not change the cache key.
+    Queries sqlglot can not parse are not cached, they may not be read-only.
+    """
+    try:
+        expressions = [e for e in sqlglot.parse(sql_query, read=dialect) if e is not None]
+    except Exception:
+        return None
+    if len(expressions) != 1 or not isinstance(expressions[0], exp.Subqueryable):
+        return None
+    expression = expressions[0]
+    # SELECT ... INTO creates a table, FOR UPDATE / FOR SHARE take row locks and a CTE can modify data
+    if expression.find(exp.Into, exp.Lock, exp.Insert, exp.Update, exp.Delete, exp.Merge) is not None:
+        return None
+    # a repeat must not skip a side effect or return a stale now() / random()
+    if not is_deterministic(expression):
+        return None
+    for node, _, _ in expression.walk():
+        node.comments = None
+    return expression.sql(dialect=dialect, normalize=True)
+
+
+def result_size(value):
+    """Approximate size in bytes of a cached result, used to bound the cache."""
+    if isinstance(value, (str, bytes)):
+        return len(value)
+    try:
+        return len(json.dumps(value, default=str))
+    except (TypeError, ValueError):
+        return len(str(value))
+
+
+class ResultCache:
+    """Query results keyed by (company_id, resourcename, db_schema, normalized sql, variant).
+
+    Entries expire after the company's TTL (tenant_ttls, else ttl, 0 disables caching for the company) and the
+    least recently used are evicted once the results exceed max_bytes in total.
+    """
+
+    def __init__(self, ttl=300.0, tenant_ttls=None, max_bytes=256 * 1024 * 1024, max_entry_bytes=None,
+                 enabled=True):
+        self.ttl = ttl
+        self.tenant_ttls = {str(company_id): float(value) for company_id, value in (tenant_ttls or {}).items()}
+        self.max_entry_bytes = max_entry_bytes
+        self.enabled = enabled
+        self._results = TTLCache(maxsize=1_000_000, ttl=ttl, max_weight=max_bytes, weigher=result_size)
+
+    def tenant_ttl(self, company_id):
+        return self.tenant_ttls.get(str(company_id), self.ttl)
+
+    def key(self, company_id, resourcename, db_schema, sql_query, variant=None):
+        """None when the query is not cacheable (not read-only, no company_id or caching disabled)."""
+        if not self.enabled or company_id is None or self.tenant_ttl(company_id) <= 0:
+            return None
+        normalized = normalize_sql(sql_query)
+        if normalized is None:
+            return None
+        return str(company_id), resourcename or "", db_schema or "", normalized, variant
+
+    def get(self, key):
+        if key is None:
+            return None
+        return self._results.get(key)
+
+    def set(self, key, value, size=None):
+        """size is the result size in bytes when the caller already knows it, else result_size(value)."""
+        if key is None:
+            return False
+        size = result_size(value) if size is None else size
+        if self.max_entry_bytes is not None and size > self.max_entry_bytes:
+            return False
+        return self._results.set(key, value, ttl=self.tenant_ttl(key[0]), weight=size)
+
+    def invalidate(self, company_id=None, resourcename=None, db_schema=None):
+        def matches(key, _):
+            return (
+                    (company_id is None or key[0] == str(company_id))
+                    and (resourcename is None or key[1] == resourcename)
+                    and (db_schema is None or key[2] == db_schema)
+            )
+
+        removed = self._results.invalidate_where(matches)
+        print(
+            f"ResultCache.invalidate, company_id={company_id}, resourcename={resourcename}, db_schema={db_schema}, removed={removed}")
+        return removed
+
+    def stats(self):
+        return self._results.stats()
+
+
+result_cache = ResultCache(
+    ttl=RESULT_CACHE_TTL,
+    tenant_ttls=RESULT_CACHE_TENANT_TTLS,
+    max_bytes=RESULT_CACHE_MAX_BYTES,
+    max_entry_bytes=RESULT_CACHE_MAX_ENTRY_BYTES,
+    enabled=RESULT_CACHE_ENABLED,
+)
+
+
+def invalidate_query_results(company_id=None, resourcename=None, db_schema=None):
+    return result_cache.invalidate(company_id=company_id, resourcename=resourcename, db_schema=db_schema)
@@ -0,0 +1,45 @@
+from collections import namedtuple
+
+from psycopg2 import sql
+
+_record_types = {}
+
+
+def column_names(cur):
+    return tuple(column[0] for column in cur.description)
+
+
+def fetch_dicts(cur):
+    names = column_names(cur)
+    return [dict(zip(names, row)) for row in cur.fetchall()]
+
+
+def fetch_dict(cur):
+    row = cur.fetchone()
+    if row is None:
+        return None
+    return dict(zip(column_names(cur), row))
+
+
+def record_type(names):
+    # namedtuple instances carry no per-row __dict__, one class is shared per column list
+    record = _record_types.get(names)
+    if record is None:
+        record = namedtuple("Record", names)
+        _record_types[names] = record
+    return record
+
+
+def fetch_records(cur):
+    record = record_type(column_names(cur))
+    return [record._make(row) for row in cur.fetchall()]
+
+
+def select_columns(columns, allowed, alias=None):
+    """Builds a SELECT list for the columns projection, restricted to the allowed column names."""
+    unknown = [column for column in columns if column not in allowed]
+    if len(unknown) > 0:
+        raise ValueError(f"select_columns, unknown columns={unknown}")
+    if alias:
+        return sql.SQL(", ").join(sql.Identifier(alias, column) for column in columns)
+    return sql.SQL(", ").join(sql.Identifier(column) for column in columns)
@@ -0,0 +1,225 @@
+import hashlib
+import threading
+import time
+
+from config.settings.base import SCHEMA_SNAPSHOT_CHECK_INTERVAL, SCHEMA_SNAPSHOT_MAX_AGE, SCHEMA_SNAPSHOT_MAX_SIZE
+from src.db.engine_registry import url_fingerprint
+from src.utils.ttl_cache import TTLCache
+
+CATALOG_VERSION_QUERY = """
+SELECT table_name, column_name, data_type
+FROM information_schema.columns
+WHERE table_schema = :schema
+"""
+
+TABLE_COLUMNS_QUERY = """
+SELECT table_name, column_name, data_type, is_nullable, ordinal_position
+FROM information_schema.columns
+WHERE UPPER(table_schema) = UPPER(:schema)
+"""
+
+TABLE_CONSTRAINTS_QUERY = """
+SELECT table_name, constraint_name, constraint_type
+FROM information_schema.table_constraints
+WHERE UPPER(table_schema) = UPPER(:schema)
+"""
+
+# last DDL time per table, only for the dialects that expose it
+TABLE_LAST_DDL_QUERIES = {
+    "mysql": "SELECT table_name, create_time FROM information_schema.tables WHERE table_schema = :schema",
+    "mariadb": "SELECT table_name, create_time FROM information_schema.tables WHERE table_schema = :schema",
+    "snowflake": "SELECT table_name, last_ddl FROM information_schema.tables WHERE UPPER(table_schema) = UPPER(:schema)",
+}
+
+
+def _schema_or_none(db_schema):
+    return None if db_schema == '' else db_schema
+
+
+def _digest(parts):
+    digest = hashlib.sha256()
+    for part in sorted(parts):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\n")
+    return digest.hexdigest()[:16]
+
+
+def catalog_version(engine, db_schema=None):
+    """Cheap stamp of the schema catalog, changes whenever a table, view or column is added, dropped or retyped."""
+    from sqlalchemy import inspect, text
+
+    rows = []
+    try:
+        schema = _schema_or_none(db_schema) or inspect(engine).default_schema_name
+        with engine.connect() as connection:
+            rows = connection.execute(text(CATALOG_VERSION_QUERY), {"schema": schema}).fetchall()
+    except Exception as e:
+        print(f"catalog_version, information_schema unavailable, falling back to table names, e={e}")
+
+    if len(rows) == 0:
+        # dialects without information_schema (or with upper-cased identifiers) only track table and view names
+        inspector = inspect(engine)
+        schema = _schema_or_none(db_schema)
+        rows = [(name,) for name in inspector.get_table_names(schema=schema) + inspector.get_view_names(schema=schema)]
+
+    return _digest("|".join(str(value) for value in row) for row in rows)
+
+
+def table_fingerprints(engine, db_schema=None):
+    """{lower-cased table name: fingerprint} over columns, types, constraint names and, where the dialect exposes it,
+    the last DDL time. Returns None when information_schema can not be read."""
+    from sqlalchemy import inspect, text
+
+    parts = {}
+    try:
+        schema = _schema_or_none(db_schema) or inspect(engine).default_schema_name
+        with engine.connect() as connection:
+            for row in connection.execute(text(TABLE_COLUMNS_QUERY), {"schema": schema}):
+                parts.setdefault(str(row[0]).lower(), []).append("column|" + "|".join(str(value) for value in row[1:]))
+            for row in connection.execute(text(TABLE_CONSTRAINTS_QUERY), {"schema": schema}):
+                parts.setdefault(str(row[0]).lower(), []).append("constraint|" + "|".join(str(value) for value in row[1:]))
+            last_ddl_query = TABLE_LAST_DDL_QUERIES.get(engine.dialect.name)
+            if last_ddl_query:
+                for row in connection.execute(text(last_ddl_query), {"schema": schema}):
+                    parts.setdefault(str(row[0]).lower(), []).append(f"ddl|{row[1]}")
+    except Exception as e:
+        print(f"table_fingerprints, information_schema unavailable, e={e}")
+        return None
+
+    if len(parts) == 0:
+        return None
+    return {table_name: _digest(table_parts) for table_name, table_parts in parts.items()}
+
+
+def reflected_table_fingerprint(table):
+    """Fingerprint of a reflected sqlalchemy Table, for dialects without a usable information_schema."""
+    parts = [f"column|{column.name}|{column.type}|{column.nullable}" for column in table.columns]
+    parts.extend(f"constraint|{constraint.name}|{type(constraint).__name__}" for constraint in table.constraints)
+    return _digest(parts)
+
+
+def _reflect(engine, db_schema=None):
+    from sqlalchemy import MetaData, inspect
+
+    schema = _schema_or_none(db_schema)
+    meta = MetaData(schema=schema)
+    meta.reflect(bind=engine, views=True, schema=schema)
+    return meta, inspect(engine)
+
+
+class SchemaSnapshot:
+    """One reflection of a warehouse schema: the MetaData with every table and view, plus an Inspector whose
+    info cache is shared by the scanners for column and foreign key lookups."""
+
+    def __init__(self, metadata, inspector, db_schema, version):
+        self.metadata = metadata
+        self.inspector = inspector
+        self.db_schema = _schema_or_none(db_schema)
+        self.version = version
+        self.created_at = time.time()
+
+    def find_table(self, table_name):
+        tables = self.metadata.tables
+        if self.db_schema:
+            table = tables.get(f"{self.db_schema}.{table_name}")
+            if table is not None:
+                return table
+        return tables.get(table_name)
+
+    def table_names(self):
+        return [table.name for table in self.metadata.tables.values()]
+
+
+class _Entry:
+    __slots__ = ("snapshot", "checked_at")
+
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+        self.checked_at = time.monotonic()
+
+
+class SchemaSnapshotRegistry:
+    """Schema snapshots keyed by (engine url fingerprint, db_schema).
+
+    A cached snapshot is trusted for check_interval seconds, after that the catalog version is recomputed and the
+    schema is reflected again only when it changed. Snapshots older than max_age are always rebuilt.
+    """
+
+    def __init__(self, check_interval=60.0, max_age=3600.0, maxsize=128, reflect=_reflect, version=catalog_version):
+        self.check_interval = check_interval
+        self._snapshots = TTLCache(maxsize=maxsize, ttl=max_age)
+        self._reflect = reflect
+        self._version = version
+        self._locks = {}
+        self._locks_lock = threading.Lock()
+        self._reflections = 0
+
+    def _key_lock(self, key):
+        with self._locks_lock:
+            lock = self._locks.get(key)
+            if lock is None:
+                lock = self._locks[key] = threading.Lock()
+            return lock
+
+    def _is_fresh(self, entry):
+        return entry is not None and time.monotonic() - entry.checked_at < self.check_interval
+
+    def get(self, engine, db_schema=None, refresh=False, recheck=False):
+        """refresh always reflects again, recheck skips check_interval and compares the catalog version now."""
+        key = (url_fingerprint(str(engine.url)), _schema_or_none(db_schema) or "")
+        entry = self._snapshots.get(key)
+        if not refresh and not recheck and self._is_fresh(entry):
+            return entry.snapshot
+
+        # one reflection per key at a time, concurrent scanners wait for it instead of reflecting too
+        with self._key_lock(key):
+            current = self._snapshots.get(key)
+            if not refresh and not recheck and self._is_fresh(current):
+                return current.snapshot
+
+            version = self._version(engine, db_schema)
+            if current is not None and not refresh and current.snapshot.version == version:
+                current.checked_at = time.monotonic()
+                return current.snapshot
+
+            print(f"SchemaSnapshotRegistry.get, reflecting, db_schema={db_schema}, version={version}")
+            metadata, inspector = self._reflect(engine, db_schema)
+            snapshot = SchemaSnapshot(metadata, inspector, db_schema, version)
+            self._snapshots.set(key, _Entry(snapshot))
+            self._reflections += 1
+            return snapshot
+
+    def table(self, engine, table_name, db_schema=None):
+        """Reflected Table from the snapshot, a miss rechecks the catalog version once before giving up."""
+        table = self.get(engine, db_schema).find_table(table_name)
+        if table is None:
+            table = self.get(engine, db_schema, recheck=True).find_table(table_name)
+        if table is None:
+            from sqlalchemy.exc import NoSuchTableError
+            raise NoSuchTableError(table_name)
+        return table
+
+    def invalidate(self, engine=None):
+        if engine is None:
+            self._snapshots.clear()
+            return
+        fingerprint = url_fingerprint(str(engine.url))
+        self._snapshots.invalidate_where(lambda key, _: key[0] == fingerprint)
+
+    def stats(self):
+        return {"snapshots": len(self._snapshots), "reflections": self._reflections}
+
+
+schema_snapshots = SchemaSnapshotRegistry(
+    check_interval=SCHEMA_SNAPSHOT_CHECK_INTERVAL,
+    max_age=SCHEMA_SNAPSHOT_MAX_AGE,
+    maxsize=SCHEMA_SNAPSHOT_MAX_SIZE,
+)
+
+
+def get_schema_snapshot(engine, db_schema=None, refresh=False, recheck=False):
+    return schema_snapshots.get(engine, db_schema, refresh=refresh, recheck=recheck)
+
+
+def get_snapshot_table(engine, table_name, db_schema=None):
+    return schema_snapshots.table(engine, table_name, db_schema)
@@ -4,6 +4,7 @@ import stripe
 
 import pytz
 from psycopg2 import sql, Error
+from src.db.rows import fetch_dict, fetch_dicts
 from src.utils.func_utils import timestamp_to_date
 
 
@@ -240,19 +241,7 @@ def get_genie_payment_plan(conn, id):
 
     try:
         cur.execute(select, values)
-        plan = cur.fetchone()
-
-        if plan:
-            return {
-                "id": plan[0],
-                "plan": plan[1],
-                "description": plan[2],
-                "amount": plan[3],
-                "datetime": plan[4],
-                "stripe_price_id": plan[5],
-            }
-        else:
-            return None
+        return fetch_dict(cur)
     except Error as e:
         print(f"get_genie_payment_plan, Database error: {e}")
         return None
@@ -279,21 +268,9 @@ def get_genie_payment_history(conn, id):
 
     try:
         cur.execute(select, values)
-        results = cur.fetchall()
-
-        if results:
-            genie_users_payments = []
-            for result in results:
-                genie_users_payment = {
-                    "id": result[0],
-                    "provider": result[1],
-                    "genie_payment_plan_id": result[2],
-                    "status": result[3],
-                    "datetime": result[4],
-                    "genie_users_id": result[5],
-                    "amount": result[6],
-                }
-                genie_users_payments.append(genie_users_payment)
+        genie_users_payments = fetch_dicts(cur)
+
+        if genie_users_payments:
             return genie_users_payments
         else:
             return None
@@ -340,25 +317,9 @@ def get_genie_users_payments_by_genie_users_id(conn, genie_users_id):
         cur.execute(select, select_values)
 
         # Fetch result of the select statement
-        result = cur.fetchone()
+        payment_details = fetch_dict(cur)
 
-        if result:
-            payment_details = {
-                "id": result[0],
-                "genie_users_id": result[1],
-                "status": result[2],
-                "genie_payment_plan_id": result[3],
-                "subscription_id": result[4],
-                "datetime": result[5],
-                "subscription_start_date": result[6],
-                "subscription_status": result[7],
-                "subscription_current_period_start_date": result[8],
-                "subscription_current_period_end_date": result[9],
-                "subscription_item_id": result[10],
-                "plan": result[11],
-                "amount": result[12],
-                "stripe_price_id": result[13]
-            }
+        if payment_details:
             return payment_details
         else:
             print(f"get_genie_users_payments_by_genie_users_id, COULD NOT FIND ANY DATA!! ")
@@ -413,20 +374,9 @@ def get_genie_users_payments_by_genie_users_id_with_period(conn, genie_users_id,
         cur.execute(select, select_values)
 
         # Fetch result of the select statement
-        result = cur.fetchone()
+        payment_details = fetch_dict(cur)
 
-        if result:
-            payment_details = {
-                "id": result[0],
-                "genie_users_id": result[1],
-                "status": result[2],
-                "genie_payment_plan_id": result[3],
-                "subscription_id": result[4],
-                "datetime": result[5],
-                "plan": result[6],
-                "amount": result[7],
-                "stripe_price_id": result[8]
-            }
+        if payment_details:
             return payment_details
         else:
             print(f"get_genie_users_payments_by_genie_users_id_with_period, COULD NOT FIND ANY DATA!! ")
@@ -0,0 +1,116 @@
+import hashlib
+import json
+import traceback
+
+import numpy as np
+import psycopg2
+from psycopg2 import sql
+from psycopg2.extras import execute_values
+
+from src.db.login_helpers import getConn
+from src.db.utils import CustomJSONEncoder
+
+
+def _canonical(value):
+    # A table scanned in this process holds tuples, datetimes and Decimals where the copy read back from jsonb holds
+    # lists, strings and floats, both have to give the same text (and content_hash).
+    return json.dumps(value, sort_keys=True, cls=CustomJSONEncoder)
+
+
+def table_representation(table):
+    """Text embedded for a table in TablesSQLDatabaseTool, built from a db_scan / get_all_tables_and_views entry."""
+    table_name = table["table_name"]
+    filtered_columns = [column for column in table["table_columns"] if '_airbyte' not in column["name"]]
+    foreign_keys = table["foreign_keys"]
+    examples = table["examples"]
+    return (f"-- Table={table_name}, columns={_canonical(filtered_columns)}, "
+            f"foreign_keys={_canonical(foreign_keys)}, examples={_canonical(examples)}. ")
+
+
+def representation_hash(model, representation):
+    return hashlib.sha256(f"{model}\n{representation}".encode("utf-8")).hexdigest()
+
+
+def get_table_embeddings(conn, content_hashes):
+    cur = conn.cursor()
+    try:
+        select = sql.SQL(
+            "SELECT content_hash, dims, embedding FROM genie_table_embeddings WHERE content_hash = ANY(%s);"
+        )
+        cur.execute(select, (list(content_hashes),))
+        embeddings = {}
+        for content_hash, dims, embedding in cur.fetchall():
+            vector = np.frombuffer(bytes(embedding), dtype="<f4")
+            if vector.shape[0] == dims:
+                embeddings[content_hash] = vector
+        return embeddings
+    except Exception as e:
+        traceback.print_exc()
+        print(f"get_table_embeddings, Database error: {e}")
+        return {}
+    finally:
+        cur.close()
+        conn.close()
+
+
+def save_table_embeddings(conn, model, embeddings):
+    """embeddings maps content_hash -> vector"""
+    cur = conn.cursor()
+    try:
+        rows = []
+        for content_hash, vector in embeddings.items():
+            vector = np.asarray(vector, dtype="<f4")
+            rows.append((content_hash, model, vector.shape[0], psycopg2.Binary(vector.tobytes())))
+        insert = sql.SQL(
+            """
+            INSERT INTO genie_table_embeddings (content_hash, model, dims, embedding, datetime)
+            VALUES %s
+            ON CONFLICT (content_hash) DO NOTHING
+            """
+        )
+        execute_values(cur, insert.as_string(conn), rows, template="(%s, %s, %s, %s, NOW())")
+        return len(rows)
+    except Exception as e:
+        traceback.print_exc()
+        print(f"save_table_embeddings, Database error: {e}")
+        return 0
+    finally:
+        conn.commit()
+        cur.close()
+        conn.close()
+
+
+def embed_table_representations(embedding, model, representations):
+    """Returns a (len(representations), dims) float32 matrix, only representations missing from
+    genie_table_embeddings are sent to the embedding model, in a single embed_documents batch."""
+    hashes = [representation_hash(model, representation) for representation in representations]
+    cached = get_table_embeddings(conn=getConn(), content_hashes=set(hashes))
+
+    missing = {}
+    for content_hash, representation in zip(hashes, representations):
+        if content_hash not in cached and content_hash not in missing:
+            missing[content_hash] = representation.replace("\n", " ")
+    print(f"embed_table_representations, tables={len(representations)}, cached={len(cached)}, missing={len(missing)}")
+
+    if len(missing) > 0:
+        vectors = embedding.embed_documents(list(missing.values()))
+        computed = {
+            content_hash: np.asarray(vector, dtype="<f4") for content_hash, vector in zip(missing.keys(), vectors)
+        }
+        save_table_embeddings(conn=getConn(), model=model, embeddings=computed)
+        cached.update(computed)
+
+    if len(hashes) == 0:
+        return np.zeros((0, 0), dtype=np.float32)
+    return np.vstack([cached[content_hash] for content_hash in hashes])
+
+
+def relevance_scores(matrix, question_embedding):
+    """Cosine similarity of every row of matrix against the question, as one matrix-vector product."""
+    if matrix.shape[0] == 0:
+        return np.zeros(0)
+    question = np.asarray(question_embedding, dtype=np.float64)
+    matrix = np.asarray(matrix, dtype=np.float64)
+    norms = np.linalg.norm(matrix, axis=1) * np.linalg.norm(question)
+    norms[norms == 0] = 1.0
+    return np.round(matrix @ question / norms, 4)
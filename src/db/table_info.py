@@ -1,15 +1,29 @@
 import traceback
 
 import sqlalchemy
-from sqlalchemy import MetaData, Table, inspect
+from sqlalchemy import inspect
 from llama_index.core import SQLDatabase
-from sqlalchemy.sql import func
 from sqlalchemy.schema import CreateTable
 
+from config.settings.base import TABLE_EMBEDDING_MODEL, SCHEMA_SCAN_PARALLELISM, SCHEMA_SCAN_TABLE_TIMEOUT, \
+    SCHEMA_SCAN_WRITE_BATCH_SIZE, SCHEMA_SCAN_COLUMN_DISTINCT_ENABLED, COLUMN_VALUE_INDEX_ENABLED, \
+    SCHEMA_REFRESH_MAX_DROP_FRACTION
+from src.db.column_profiler import profile_table_columns
 from src.db.login_helpers import getConn
-from src.db.table_info_helpers import create_genie_users_db_connection_details, \
+from src.db.database_wrappers import invalidate_database_wrappers
+from src.db.result_cache import invalidate_query_results
+from src.db.schema_snapshot import get_schema_snapshot, get_snapshot_table, table_fingerprints, \
+    reflected_table_fingerprint
+from src.db.table_embeddings import table_representation, embed_table_representations
+from src.db.table_info_fragments import index_summaries, invalidate_table_info_fragments
+from src.db.table_scan import scan_tables, scan_parallelism, SCAN_COMPLETED
+from src.db.table_info_helpers import upsert_genie_users_db_connection_details_bulk, \
+    upsert_genie_users_db_connection_details_column_distinct_bulk, set_genie_users_db_connection_details_status, \
+    get_genie_users_db_connection_details_fingerprints, delete_genie_users_db_connection_details_tables, \
     create_genie_users_db_connection_details_column_description_column_distinct, \
-    get_genie_users_db_connection_details_by_company_id_join_column_description
+    get_genie_users_db_connection_details_by_company_id_join_column_description, \
+    upsert_genie_users_db_connection_details_value_index_bulk
+from src.db.value_index import build_column_value_indexes, value_index_expired
 
 
 def get_all_tables_and_views(
@@ -35,12 +49,6 @@ def get_all_tables_and_views(
         filtered_existing_details = [
             t for t in existing_details if t.get("table_schema") and t.get("table_name")
         ]
-        for f in existing_details:
-            table_schema = f.get("table_schema")
-            table_name = f.get("table_name")
-            #print(f"existing_details, table_name={table_name}, table_schema={table_schema}, f={f}")
-
-
 
         print(
             f"get_all_tables_and_views, existing_details={len(existing_details)}, filtered_existing_details={len(filtered_existing_details)}")
@@ -51,102 +59,291 @@ def get_all_tables_and_views(
             print(f"get_all_tables_and_views, filtered_existing_details, failed to fetch data!!!")
 
 
-    inspector = inspect(database.engine)
-    meta = MetaData(bind=database.engine, schema=(None if db_schema == '' else db_schema))
-    MetaData.reflect(meta, views=True, schema=(None if db_schema == '' else db_schema))
+    # reflected once here, the per-table helpers below read from the same snapshot
+    snapshot = get_schema_snapshot(database.engine, db_schema, refresh=force_refresh)
+    if force_refresh:
+        invalidate_database_wrappers(
+            company_id=company_id, resourcename=resourcename, db_schema=db_schema, db_warehouse=db_warehouse)
     if table_name:
         tables = [table_name]
     else:
         print(f"get_all_tables_and_views, tables_from_inspect")
-        tables_from_inspect = inspector.get_table_names(schema=(None if db_schema == '' else db_schema)) + inspector.get_view_names(schema=(None if db_schema == '' else db_schema))
-        tables = [
-            table for table in tables_from_inspect if table and table.lower() in tables_from_inspect
-        ]
-    list_tables = []
+        tables = list_snapshot_tables(snapshot, db_schema)
+
+    list_tables = scan_and_save_tables(
+        database=database, tables=tables, db_schema=db_schema, company_id=company_id, resourcename=resourcename,
+        genie_users_id=genie_users_id, db_warehouse=db_warehouse, max_examples_count=max_examples_count,
+        fingerprints=current_table_fingerprints(database, snapshot, tables, db_schema),
+    )
+    warm_table_embeddings(list_tables)
+    return list_tables
+
+
+def refresh_tables_incremental(
+        database: SQLDatabase,
+        db_schema=None,
+        company_id=None,
+        resourcename=None,
+        genie_users_id=None,
+        db_warehouse=None,
+        max_examples_count=1
+):
+    """Rescans only the tables whose catalog fingerprint changed since the last scan or whose value indexes are
+    older than COLUMN_VALUE_INDEX_MAX_AGE, and removes dropped tables."""
+    snapshot = get_schema_snapshot(database.engine, db_schema, recheck=True)
+    tables = list_snapshot_tables(snapshot, db_schema)
+    fingerprints = current_table_fingerprints(database, snapshot, tables, db_schema)
+    stored = get_genie_users_db_connection_details_fingerprints(
+        conn=getConn(), company_id=company_id, db_schema=db_schema, resourcename=resourcename,
+        db_warehouse=db_warehouse,
+    )
+    if stored is None:
+        return None
+
+    changed = [
+        table for table in tables
+        if table not in stored
+        or stored[table]["status"] != "COMPLETED"
+        or not stored[table]["fingerprint"]
+        or stored[table]["fingerprint"] != fingerprints.get(table)
+    ]
+    # unchanged tables are rescanned once their value indexes are too old to hold the values inserted since
+    expired = [
+        table for table in tables
+        if COLUMN_VALUE_INDEX_ENABLED and table not in changed
+        and value_index_expired(stored[table].get("value_index_datetime"))
+    ]
+    current = set(tables)
+    dropped = [table for table in stored if table not in current]
+    print(
+        f"refresh_tables_incremental, company_id={company_id}, resourcename={resourcename}, db_schema={db_schema}, tables={len(tables)}, changed={len(changed)}, expired={len(expired)}, dropped={len(dropped)}")
+
+    if len(tables) == 0 or len(dropped) > max(1, len(stored) * SCHEMA_REFRESH_MAX_DROP_FRACTION):
+        if len(dropped) > 0:
+            print(
+                f"refresh_tables_incremental, SKIP delete, company_id={company_id}, tables={len(tables)}, stored={len(stored)}, dropped={len(dropped)}")
+        dropped = []
+    delete_genie_users_db_connection_details_tables(
+        conn=getConn(), table_names=dropped, company_id=company_id, db_schema=db_schema,
+        resourcename=resourcename, db_warehouse=db_warehouse,
+    )
+    list_tables = scan_and_save_tables(
+        database=database, tables=changed + expired, db_schema=db_schema, company_id=company_id, resourcename=resourcename,
+        genie_users_id=genie_users_id, db_warehouse=db_warehouse, max_examples_count=max_examples_count,
+        fingerprints=fingerprints,
+    )
+    warm_table_embeddings(list_tables)
+    if len(changed) > 0 or len(dropped) > 0:
+        # cached results may read tables that changed shape or no longer exist
+        invalidate_query_results(company_id=company_id, resourcename=resourcename, db_schema=db_schema)
+        invalidate_table_info_fragments(company_id=company_id, resourcename=resourcename, db_schema=db_schema)
+        invalidate_database_wrappers(
+            company_id=company_id, resourcename=resourcename, db_schema=db_schema, db_warehouse=db_warehouse)
+    return {
+        "tables": len(tables),
+        "changed": len(changed),
+        "expired": len(expired),
+        "scanned": len(list_tables),
+        "dropped": len(dropped),
+    }
+
+
+def list_snapshot_tables(snapshot, db_schema=None):
+    inspector = snapshot.inspector
+    tables_from_inspect = inspector.get_table_names(schema=(None if db_schema == '' else db_schema)) + inspector.get_view_names(schema=(None if db_schema == '' else db_schema))
+    return [
+        table for table in tables_from_inspect if table and table.lower() in tables_from_inspect
+    ]
+
+
+def current_table_fingerprints(database: SQLDatabase, snapshot, tables, db_schema=None):
+    """{table: fingerprint} from information_schema, falling back to the reflected tables of the snapshot."""
+    by_name = table_fingerprints(database.engine, db_schema) or {}
+    fingerprints = {}
     for table in tables:
-        print(f"get_all_tables_and_views, get_columns, table={table}")
-        columns = inspector.get_columns(table_name=table, schema=(None if db_schema == '' else db_schema))
-        columns = [column for column in columns if column["name"].find(".") < 0]
-        columns_ret = []
-        for column in columns:
-            col_name = column.get("name")
-            col_type = column.get("type")
-            columns_ret.append(
-                {
-                    "name": col_name,
-                    "type": str(col_type),
-                    "description": "",  # TODO add description
-                    "categories": ""  # TODO add categories
-                }
+        fingerprint = by_name.get(table.lower())
+        if fingerprint is None:
+            reflected = snapshot.find_table(table)
+            fingerprint = reflected_table_fingerprint(reflected) if reflected is not None else None
+        fingerprints[table] = fingerprint
+    return fingerprints
+
+
+def scan_and_save_tables(
+        database: SQLDatabase,
+        tables,
+        db_schema=None,
+        company_id=None,
+        resourcename=None,
+        genie_users_id=None,
+        db_warehouse=None,
+        max_examples_count=1,
+        fingerprints=None,
+):
+    if len(tables) == 0:
+        return []
+    fingerprints = fingerprints or {}
+
+    # rows stay PENDING until their table is scanned, an interrupted scan leaves them that way
+    set_genie_users_db_connection_details_status(
+        conn=getConn(), table_names=tables, company_id=company_id, genie_users_id=genie_users_id,
+        status="PENDING", db_schema=db_schema, resourcename=resourcename, db_warehouse=db_warehouse,
+    )
+
+    def scan(table):
+        table_info = scan_table(database, table, db_schema, max_examples_count)
+        profiles = None
+        if SCHEMA_SCAN_COLUMN_DISTINCT_ENABLED or COLUMN_VALUE_INDEX_ENABLED:
+            try:
+                # one profile serves both, the value indexes skip the columns it estimates too distinct to index
+                profiles = get_all_columns_distinct_for_table(database, table, db_schema)
+            except Exception as e:
+                traceback.print_exc()
+                print(f"scan_and_save_tables, column profile failed, table={table}, e={e}")
+        if SCHEMA_SCAN_COLUMN_DISTINCT_ENABLED and profiles is not None:
+            table_info["column_distincts"] = column_distinct_records(table, profiles)
+        if COLUMN_VALUE_INDEX_ENABLED:
+            try:
+                table_info["value_indexes"] = build_column_value_indexes(
+                    database.engine, table, db_schema, profiles=profiles)
+            except Exception as e:
+                traceback.print_exc()
+                print(f"scan_and_save_tables, value indexes failed, table={table}, e={e}")
+        return table_info
+
+    completed = []
+    failed = []
+    column_distincts = []
+    value_indexes = []
+
+    def flush():
+        # Save this data to the database, SCHEMA_SCAN_WRITE_BATCH_SIZE tables per transaction
+        if len(completed) > 0:
+            upsert_genie_users_db_connection_details_bulk(
+                conn=getConn(), records=completed, company_id=company_id, genie_users_id=genie_users_id,
+                db_schema=db_schema, resourcename=resourcename, db_warehouse=db_warehouse,
+            )
+            completed.clear()
+        if len(column_distincts) > 0:
+            upsert_genie_users_db_connection_details_column_distinct_bulk(
+                conn=getConn(), records=column_distincts, company_id=company_id,
+                db_schema=db_schema, resourcename=resourcename, db_warehouse=db_warehouse,
+            )
+            column_distincts.clear()
+        if len(value_indexes) > 0:
+            upsert_genie_users_db_connection_details_value_index_bulk(
+                conn=getConn(), records=value_indexes, company_id=company_id,
+                db_schema=db_schema, resourcename=resourcename, db_warehouse=db_warehouse,
             )
+            value_indexes.clear()
+        if len(failed) > 0:
+            set_genie_users_db_connection_details_status(
+                conn=getConn(), table_names=failed, company_id=company_id, genie_users_id=genie_users_id,
+                status="FAILED", db_schema=db_schema, resourcename=resourcename, db_warehouse=db_warehouse,
+            )
+            failed.clear()
 
-        foreign_keys = get_all_foreign_keys_for_table(database, table, db_schema)
-        examples = get_table_samples(database, table, max_examples_count, db_schema)
-        table_schema = get_table_schema(database, table, db_schema)
-        description = ""
-        if not table_schema:
-            print(f"get_all_tables_and_views, SKIP, table_schema is invalid, table={table}")
+    def save(table, status, result):
+        if status != SCAN_COMPLETED:
+            failed.append(table)
         else:
-            table_info = {
-                "table_name": table,
-                "table_columns": columns_ret,
-                "foreign_keys": foreign_keys,
-                "examples": examples,
-                "table_schema": table_schema,
-                "description": "",
-            }
-            print(f"get_all_tables_and_views, adding table_info={table}")
+            column_distincts.extend(result.pop("column_distincts", []))
+            value_indexes.extend(result.pop("value_indexes", []))
+            completed.append(dict(result, status="COMPLETED", fingerprint=fingerprints.get(table)))
+        if len(completed) + len(failed) >= SCHEMA_SCAN_WRITE_BATCH_SIZE:
+            flush()
+
+    workers = scan_parallelism(database.engine, SCHEMA_SCAN_PARALLELISM)
+    print(f"scan_and_save_tables, scanning tables={len(tables)}, workers={workers}")
+    try:
+        scanned = scan_tables(scan, tables, workers=workers, timeout=SCHEMA_SCAN_TABLE_TIMEOUT, on_result=save)
+    finally:
+        flush()
+        # the wrappers take the table info of the scanned tables when they are built
+        invalidate_table_info_fragments(company_id=company_id, resourcename=resourcename, db_schema=db_schema)
+        invalidate_database_wrappers(
+            company_id=company_id, resourcename=resourcename, db_schema=db_schema, db_warehouse=db_warehouse)
+
+    list_tables = []
+    for table in tables:
+        table_info = scanned.get(table)
+        if table_info is None:
+            continue
+        if not table_info["table_schema"]:
+            print(f"scan_and_save_tables, SKIP, table_schema is invalid, table={table}")
+        else:
+            print(f"scan_and_save_tables, adding table_info={table}")
             list_tables.append(table_info)
+    return list_tables
+
 
-        # Save this data to the database
-        create_genie_users_db_connection_details(
-            conn=getConn(), table_name=table, table_columns=columns_ret, foreign_keys=foreign_keys, examples=examples,
-            company_id=company_id, genie_users_id=genie_users_id, status="COMPLETED", db_schema=db_schema,
-            resourcename=resourcename, table_schema=table_schema, description=description, db_warehouse=db_warehouse
+def scan_table(database: SQLDatabase, table, db_schema=None, max_examples_count=1):
+    print(f"scan_table, get_columns, table={table}")
+    inspector = get_schema_snapshot(database.engine, db_schema).inspector
+    columns = inspector.get_columns(table_name=table, schema=(None if db_schema == '' else db_schema))
+    columns = [column for column in columns if column["name"].find(".") < 0]
+    columns_ret = []
+    for column in columns:
+        col_name = column.get("name")
+        col_type = column.get("type")
+        columns_ret.append(
+            {
+                "name": col_name,
+                "type": str(col_type),
+                "description": "",  # TODO add description
+                "categories": ""  # TODO add categories
+            }
         )
 
-    return list_tables
+    return {
+        "table_name": table,
+        "table_columns": columns_ret,
+        "foreign_keys": get_all_foreign_keys_for_table(database, table, db_schema),
+        "examples": get_table_samples(database, table, max_examples_count, db_schema),
+        "table_schema": get_table_schema(database, table, db_schema),
+        "table_indexes": index_summaries(
+            inspector.get_indexes(table_name=table, schema=(None if db_schema == '' else db_schema))),
+        "description": "",
+    }
+
+
+def warm_table_embeddings(list_tables):
+    # Embeds the scanned tables up front so TablesSQLDatabaseTool finds them in genie_table_embeddings
+    if len(list_tables) == 0:
+        return
+    try:
+        from src.query_engine.llm_clients import get_embeddings
+
+        embedding = get_embeddings(TABLE_EMBEDDING_MODEL)
+        embed_table_representations(
+            embedding=embedding,
+            model=TABLE_EMBEDDING_MODEL,
+            representations=[table_representation(table) for table in list_tables],
+        )
+    except Exception as e:
+        traceback.print_exc()
+        print(f"warm_table_embeddings, failed to warm table embeddings: {e}")
 
 
 def get_all_foreign_keys_for_table(database: SQLDatabase, table_name, db_schema=None):
     print(f"get_all_foreign_keys_for_table, get_columns, table_name={table_name}, db_schema={db_schema}")
-    inspector = inspect(database.engine)
-    meta = MetaData(bind=database.engine, schema=(None if db_schema == '' else db_schema))
-    MetaData.reflect(meta, views=True, schema=(None if db_schema == '' else db_schema))
+    inspector = get_schema_snapshot(database.engine, db_schema).inspector
     foreign_keys = inspector.get_foreign_keys(table_name=table_name, schema=(None if db_schema == '' else db_schema))
     return foreign_keys
 
 
 def get_table_samples(database: SQLDatabase, table_name, max_examples_count, db_schema=None):
     print(f"get_table_samples, table_name={table_name}, db_schema={db_schema}, ")
-    meta = MetaData(schema=(None if db_schema == '' else db_schema))
-    MetaData.reflect(meta, bind=database.engine, views=True, schema=(None if db_schema == '' else db_schema))
-    table = Table(table_name, meta, autoload=True, autoload_with=database.engine)
-
-    is_table_found = table_name in meta.tables
-    is_found_retry = False
-
-    if not is_table_found:
-        # print(f"get_table_samples, try again")
-        new_table_name = f"{db_schema}.{table_name}"
-        is_found_retry = new_table_name in meta.tables
-        # print(f"get_table_samples, try again, is_found_retry={is_found_retry}, new_table_name={new_table_name}")
-        if is_found_retry:
-            table_name = new_table_name
-
-    # print(f"get_table_samples, meta.tables_len={len(meta.tables)}, is_table_found={is_table_found}, is_found_retry={is_found_retry}, meta.tables.keys={meta.tables.keys()}")
-    # Print all table names available in metadata
-    for table_name in meta.tables.keys():
-        print(f"get_table_samples, table_name={table_name}")
-
-    if is_table_found or is_found_retry:
+    table = get_schema_snapshot(database.engine, db_schema).find_table(table_name)
+
+    if table is not None:
         try:
             examples_query = (
                 sqlalchemy.select(table)
                 .with_only_columns(
                     [
                         column
-                        for column in meta.tables[table_name].columns
+                        for column in table.columns
                         if column.name.find(".") < 0
                     ]
                 )
@@ -173,84 +370,17 @@ def get_table_samples(database: SQLDatabase, table_name, max_examples_count, db_
         return []
 
 def get_table_column_distinct(database: SQLDatabase, table_name, column_dict, db_schema=None):
-    meta = MetaData(bind=database.engine, schema=(None if db_schema == '' else db_schema))
-    MetaData.reflect(meta, views=True, schema=(None if db_schema == '' else db_schema))
     column_name = column_dict["name"]
-    column_type = str(column_dict["type"])
-
-
-    table = Table(table_name, meta, autoload=True, autoload_with=database.engine, schema=(None if db_schema == '' else db_schema))
-    # warehouse bug ?
-    field_size_query = sqlalchemy.select(
-        [table.c[column_name]]
-    ).limit(1)
-    print(f"get_table_column_distinct, checking field sizes, field_size_query={field_size_query}")
-
-    field_to_check = database.engine.engine.execute(field_size_query).first()
-    if not field_to_check:
-        field_to_check = [""]
-    field_size = len(str(str(field_to_check[0])))
-    if field_size > 50:
-        print(f"get_table_column_distinct field_size>50, return. field_size={field_size}, field_to_check={field_to_check}")
-        return {
-            "column_name": column_name,
-            "column_type": column_type,
-            "categories": [],
-        }
-
-    try:
-        cardinality_query = sqlalchemy.select(
-            [func.distinct(table.c[column_name])]
-        ).limit(200)
-        print(f"get_table_column_distinct, checking field cardinality, cardinality_query={cardinality_query}")
-
-        cardinality = database.engine.engine.execute(cardinality_query).fetchall()
-    except Exception as e:
-        traceback.print_exc()
-        print(f"get_table_column_distinct, ERROR, cardinality, {e}")
-        return {
-            "column_name": column_name,
-            "column_type": column_type,
-            "categories": [],
-        }
-
-    print(f"get_table_column_distinct, checking len cardinality {len(cardinality)}")
-
-    if len(cardinality) > 60:
-        return {
-            "column_name": column_name,
-            "column_type": column_type,
-            "categories": [],
-        }
-
-    print("get_table_column_distinct, get categories, count, group_by, build query")
-
-    query = sqlalchemy.select(
-        [
-            table.c[column_name],
-            sqlalchemy.func.count(table.c[column_name]),
-        ]
-    ).group_by(table.c[column_name])
-
-    print(f"get_table_column_distinct, get categories, count, group_by, query={query}")
-
-    categories = database.engine.engine.execute(query).fetchall()
-    if 1 < len(categories) <= 60:
-        categories = [str(category[0]) for category in categories]
-        return {
-            "column_name": column_name,
-            "column_type": column_type,
-            "categories": categories,
-        }
-    else:
+    profiles = profile_table_columns(database.engine, table_name, db_schema, column_names=[column_name])
+    if len(profiles) == 0:
+        print(f"get_table_column_distinct, column not found, table_name={table_name}, column_name={column_name}")
         return None
+    print(f"get_table_column_distinct, profile={profiles[0]}")
+    return profiles[0]
 
 
 def get_table_schema(database: SQLDatabase, table_name, db_schema=None):
-    meta = MetaData(bind=database.engine, schema=(None if db_schema == '' else db_schema))
-    MetaData.reflect(meta, views=True, schema=(None if db_schema == '' else db_schema))
-
-    table = Table(table_name, meta, autoload=True, autoload_with=database.engine, schema=(None if db_schema == '' else db_schema))
+    table = get_snapshot_table(database.engine, table_name, db_schema)
 
     create_table = str(
         CreateTable(table).compile(
@@ -263,16 +393,40 @@ def get_table_schema(database: SQLDatabase, table_name, db_schema=None):
 
 
 def get_all_columns_distinct_for_table(database: SQLDatabase, table_name, db_schema=None):
-    inspector = inspect(database.engine)
-    table_columns = []
-    columns = inspector.get_columns(table_name=table_name, schema=(None if db_schema == '' else db_schema))
-    columns = [column for column in columns if column["name"].find(".") < 0]
+    # one sampled pass (or pg_stats) for every column of the table
+    return profile_table_columns(database.engine, table_name, db_schema)
 
-    for column in columns:
-        print(f"Scanning column: {column['name']}")
-        table_columns.append(
-            get_table_column_distinct(database, table_name, column)
-        )
+
+def column_distinct_records(table_name, profiles):
+    """profile_table_columns results as records for upsert_genie_users_db_connection_details_column_distinct_bulk"""
+    return [
+        {
+            "table_name": table_name,
+            "column_name": column["column_name"],
+            "column_distinct": column.get("categories", []),
+        }
+        for column in profiles
+    ]
+
+
+def save_all_columns_distinct_for_table(
+        database: SQLDatabase,
+        table_name,
+        db_schema=None,
+        company_id=None,
+        resourcename=None,
+        db_warehouse=None,
+):
+    table_columns = get_all_columns_distinct_for_table(database, table_name, db_schema)
+    # Save this data to the database, one transaction for every column of the table
+    return upsert_genie_users_db_connection_details_column_distinct_bulk(
+        conn=getConn(),
+        records=column_distinct_records(table_name, table_columns),
+        company_id=company_id,
+        db_schema=db_schema,
+        resourcename=resourcename,
+        db_warehouse=db_warehouse,
+    )
 
 
 def get_all_db_schemas(database: SQLDatabase):
@@ -0,0 +1,128 @@
+from config.settings.base import TABLE_INFO_CACHE_ENABLED, TABLE_INFO_CACHE_TTL
+from src.db.login_helpers import getConn
+from src.db.table_info_helpers import get_genie_users_db_connection_details_table_info
+from src.utils.ttl_cache import TTLCache
+
+# same truncation SQLDatabase._get_sample_rows applies to the values of the sample rows
+MAX_SAMPLE_VALUE_LENGTH = 100
+
+
+def index_summaries(indexes):
+    """The reflected indexes of a table reduced to what the table info shows, JSON serializable for the scan."""
+    return [
+        {
+            "name": index.get("name"),
+            "unique": bool(index.get("unique")),
+            "column_names": list(index.get("column_names") or []),
+        }
+        for index in indexes or []
+    ]
+
+
+def format_table_indexes(indexes):
+    indexes_formatted = "\n".join(
+        f'Name: {index["name"]}, Unique: {index["unique"]}, Columns: {str(index["column_names"])}'
+        for index in indexes
+    )
+    return f"Table Indexes:\n{indexes_formatted}"
+
+
+def format_sample_rows(table_name, examples, sample_rows):
+    rows = (examples or [])[:sample_rows]
+    columns = list(rows[0].keys()) if len(rows) > 0 else []
+    columns_str = "\t".join(columns)
+    sample_rows_str = "\n".join(
+        "\t".join(str(row.get(column))[:MAX_SAMPLE_VALUE_LENGTH] for column in columns) for row in rows
+    )
+    return f"{len(rows)} rows from {table_name} table:\n{columns_str}\n{sample_rows_str}"
+
+
+def table_info_fragment(table_name, table_schema, table_indexes=None, examples=None, sample_rows=3,
+                        indexes_in_table_info=True):
+    """Table info of one table laid out like SQLDatabase.get_table_info (DDL, then indexes and sample rows in a
+    comment), built from what the schema scan stored. None when the scan did not store the DDL, or the indexes
+    are asked for and the row predates table_indexes, so the caller falls back to the live table info."""
+    if not table_schema or (indexes_in_table_info and table_indexes is None):
+        return None
+    table_info = table_schema.rstrip()
+    if indexes_in_table_info or sample_rows:
+        table_info += "\n\n/*"
+    if indexes_in_table_info:
+        table_info += f"\n{format_table_indexes(table_indexes)}\n"
+    if sample_rows:
+        table_info += f"\n{format_sample_rows(table_name, examples, sample_rows)}\n"
+    if indexes_in_table_info or sample_rows:
+        table_info += "*/"
+    return table_info
+
+
+def _load(company_id, resourcename, db_schema, db_warehouse):
+    return get_genie_users_db_connection_details_table_info(
+        conn=getConn(), company_id=company_id, db_schema=db_schema, resourcename=resourcename,
+        db_warehouse=db_warehouse,
+    )
+
+
+class TableInfoFragments:
+    """Table info fragments of the scanned tables of a connection, keyed by
+    (company_id, resourcename, db_schema, db_warehouse), passed to the SQLDatabase wrappers as custom_table_info so
+    prompt assembly does not compile DDL, list indexes or select sample rows from the warehouse.
+
+    Loaded from genie_users_db_connection_details once per ttl seconds, the scans invalidate their connection.
+    """
+
+    def __init__(self, ttl=3600.0, enabled=True, load=_load):
+        self.enabled = enabled
+        self._load = load
+        self._fragments = TTLCache(maxsize=256, ttl=ttl)
+
+    def get(self, company_id, resourcename, db_schema="", db_warehouse="", sample_rows=3,
+            indexes_in_table_info=True):
+        """{table_name: table info}, None when disabled or nothing was scanned, the wrappers then describe every
+        table from the warehouse."""
+        if not self.enabled or company_id is None:
+            return None
+        key = (company_id, resourcename or "", db_schema or "", db_warehouse or "", sample_rows, indexes_in_table_info)
+        fragments = self._fragments.get(key)
+        if fragments is not None:
+            return fragments or None
+
+        stored = self._load(company_id, resourcename or "", db_schema or "", db_warehouse or "")
+        if stored is None:
+            return None
+        fragments = {}
+        for table_name, table in stored.items():
+            fragment = table_info_fragment(
+                table_name, table.get("table_schema"), table.get("table_indexes"), table.get("examples"),
+                sample_rows=sample_rows, indexes_in_table_info=indexes_in_table_info,
+            )
+            if fragment is not None:
+                fragments[table_name] = fragment
+        print(f"TableInfoFragments.get, company_id={company_id}, tables={len(stored)}, fragments={len(fragments)}")
+        self._fragments.set(key, fragments)
+        return fragments or None
+
+    def invalidate(self, company_id=None, resourcename=None, db_schema=None):
+        def matches(key, _):
+            return (
+                    (company_id is None or key[0] == company_id)
+                    and (resourcename is None or key[1] == resourcename)
+                    and (db_schema is None or key[2] == (db_schema or ""))
+            )
+
+        return self._fragments.invalidate_where(matches)
+
+
+table_info_fragments = TableInfoFragments(ttl=TABLE_INFO_CACHE_TTL, enabled=TABLE_INFO_CACHE_ENABLED)
+
+
+def get_table_info_fragments(company_id, resourcename, db_schema="", db_warehouse="", sample_rows=3,
+                             indexes_in_table_info=True):
+    return table_info_fragments.get(
+        company_id, resourcename, db_schema=db_schema, db_warehouse=db_warehouse, sample_rows=sample_rows,
+        indexes_in_table_info=indexes_in_table_info,
+    )
+
+
+def invalidate_table_info_fragments(company_id=None, resourcename=None, db_schema=None):
+    return table_info_fragments.invalidate(company_id=company_id, resourcename=resourcename, db_schema=db_schema)
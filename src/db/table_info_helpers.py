@@ -2,13 +2,14 @@ import json
 import traceback
 from datetime import datetime
 
-from psycopg2 import sql
+from psycopg2 import Binary, sql
+from psycopg2.extras import execute_values
 
 
 def create_genie_users_db_connection_details(
         conn, table_name, table_columns, foreign_keys, examples, company_id,
         genie_users_id, status="COMPLETED", db_schema="",
-        resourcename="", description="", table_schema="", db_warehouse=""
+        resourcename="", description="", table_schema="", db_warehouse="", fingerprint=None
 ):
     cur = conn.cursor()
     if db_schema is None:
@@ -20,9 +21,9 @@ def create_genie_users_db_connection_details(
         insert = sql.SQL(
             """
                 INSERT INTO genie_users_db_connection_details 
-                    (table_name, table_columns, foreign_keys, examples, datetime, company_id, genie_users_id, status, db_schema, resourcename, description, table_schema, db_warehouse) 
+                    (table_name, table_columns, foreign_keys, examples, datetime, company_id, genie_users_id, status, db_schema, resourcename, description, table_schema, db_warehouse, fingerprint) 
                 VALUES 
-                    (%s, %s, %s, %s, NOW(), %s, %s, %s, %s, %s, %s, %s, %s)
+                    (%s, %s, %s, %s, NOW(), %s, %s, %s, %s, %s, %s, %s, %s, %s)
                 ON CONFLICT (company_id, table_name, db_schema, db_warehouse, resourcename)
                 DO UPDATE SET
                     table_columns = EXCLUDED.table_columns,
@@ -32,7 +33,8 @@ def create_genie_users_db_connection_details(
                     genie_users_id = EXCLUDED.genie_users_id,
                     status = EXCLUDED.status,
                     description = EXCLUDED.description,
-                    table_schema = EXCLUDED.table_schema
+                    table_schema = EXCLUDED.table_schema,
+                    fingerprint = EXCLUDED.fingerprint
                 RETURNING id;
             """
         )
@@ -40,7 +42,7 @@ def create_genie_users_db_connection_details(
         print(
             f"create_genie_users_db_connection_details, table_name={table_name}, table_columns={table_columns}, foreign_keys={foreign_keys}, examples={examples}, company_id={company_id}, genie_users_id={genie_users_id}, status={status} ")
         values = (table_name, json.dumps(table_columns), json.dumps(foreign_keys), json.dumps(examples), company_id,
-                  genie_users_id, status, db_schema, resourcename, description, table_schema, db_warehouse)
+                  genie_users_id, status, db_schema, resourcename, description, table_schema, db_warehouse, fingerprint)
 
         cur.execute(insert.as_string(conn), values)
         generated_id = cur.fetchone()[0]
@@ -58,6 +60,234 @@ def create_genie_users_db_connection_details(
         conn.close()
 
 
+def upsert_genie_users_db_connection_details_bulk(
+        conn, records, company_id, genie_users_id, db_schema="",
+        resourcename="", db_warehouse=""
+):
+    """Upserts scanned tables in one transaction, records are dicts with table_name, table_columns, foreign_keys,
+    examples, status, description, table_schema, table_indexes and fingerprint. Rows whose content did not change are
+    left untouched; returns the number of rows inserted or updated."""
+    cur = conn.cursor()
+    if db_schema is None:
+        db_schema = ""
+    if db_warehouse is None:
+        db_warehouse = ""
+    try:
+        if len(records) == 0:
+            return 0
+        # one row per key, a statement can not upsert the same row twice
+        records = list({record["table_name"]: record for record in records}.values())
+        upsert = sql.SQL(
+            """
+                INSERT INTO genie_users_db_connection_details AS d
+                    (table_name, table_columns, foreign_keys, examples, datetime, company_id, genie_users_id, status, db_schema, resourcename, description, table_schema, db_warehouse, fingerprint, table_indexes) 
+                VALUES %s
+                ON CONFLICT (company_id, table_name, db_schema, db_warehouse, resourcename)
+                DO UPDATE SET
+                    table_columns = EXCLUDED.table_columns,
+                    foreign_keys = EXCLUDED.foreign_keys,
+                    examples = EXCLUDED.examples,
+                    datetime = NOW(),
+                    genie_users_id = EXCLUDED.genie_users_id,
+                    status = EXCLUDED.status,
+                    description = EXCLUDED.description,
+                    table_schema = EXCLUDED.table_schema,
+                    fingerprint = EXCLUDED.fingerprint,
+                    table_indexes = EXCLUDED.table_indexes
+                WHERE (d.table_columns, d.foreign_keys, d.examples, d.status, d.description, d.table_schema, d.fingerprint, d.table_indexes)
+                    IS DISTINCT FROM
+                    (EXCLUDED.table_columns, EXCLUDED.foreign_keys, EXCLUDED.examples, EXCLUDED.status, EXCLUDED.description, EXCLUDED.table_schema, EXCLUDED.fingerprint, EXCLUDED.table_indexes)
+                RETURNING d.id
+            """
+        )
+        values = [
+            (
+                record["table_name"], json.dumps(record.get("table_columns", [])),
+                json.dumps(record.get("foreign_keys", [])), json.dumps(record.get("examples", [])), company_id,
+                genie_users_id, record.get("status", "COMPLETED"), db_schema, resourcename,
+                record.get("description", ""), record.get("table_schema", ""), db_warehouse,
+                record.get("fingerprint"), json.dumps(record.get("table_indexes", [])),
+            )
+            for record in records
+        ]
+        changed = execute_values(
+            cur, upsert.as_string(conn), values,
+            template="(%s, %s::jsonb, %s::jsonb, %s::jsonb, NOW(), %s, %s, %s, %s, %s, %s, %s, %s, %s, %s::jsonb)",
+            page_size=500, fetch=True,
+        )
+        print(
+            f"upsert_genie_users_db_connection_details_bulk, company_id={company_id}, records={len(records)}, changed={len(changed)}")
+        return len(changed)
+
+    except Exception as e:
+        conn.rollback()
+        traceback.print_exc()
+        print(f"upsert_genie_users_db_connection_details_bulk, Database error: {e}")
+        return False
+
+    finally:
+        conn.commit()
+        cur.close()
+        conn.close()
+
+
+def set_genie_users_db_connection_details_status(
+        conn, table_names, company_id, genie_users_id, status, db_schema="",
+        resourcename="", db_warehouse=""
+):
+    """Records scan progress: creates placeholder rows for new tables and only updates status on existing ones,
+    so the last completed scan of a table stays readable while it is rescanned."""
+    cur = conn.cursor()
+    if db_schema is None:
+        db_schema = ""
+    if db_warehouse is None:
+        db_warehouse = ""
+    try:
+        if len(table_names) == 0:
+            return 0
+        insert = sql.SQL(
+            """
+                INSERT INTO genie_users_db_connection_details 
+                    (table_name, table_columns, foreign_keys, examples, datetime, company_id, genie_users_id, status, db_schema, resourcename, description, table_schema, db_warehouse) 
+                VALUES %s
+                ON CONFLICT (company_id, table_name, db_schema, db_warehouse, resourcename)
+                DO UPDATE SET
+                    status = EXCLUDED.status
+            """
+        )
+        print(
+            f"set_genie_users_db_connection_details_status, tables={len(table_names)}, company_id={company_id}, status={status}")
+        values = [
+            (table_name, "[]", "[]", "[]", company_id, genie_users_id, status, db_schema, resourcename, "", "",
+             db_warehouse)
+            for table_name in table_names
+        ]
+        execute_values(
+            cur, insert.as_string(conn), values,
+            template="(%s, %s, %s, %s, NOW(), %s, %s, %s, %s, %s, %s, %s, %s)",
+        )
+        return len(values)
+
+    except Exception as e:
+        traceback.print_exc()
+        print(f"set_genie_users_db_connection_details_status, Database error: {e}")
+        return False
+
+    finally:
+        conn.commit()
+        cur.close()
+        conn.close()
+
+
+def get_genie_users_db_connection_details_fingerprints(
+        conn, company_id, db_schema="", resourcename="", db_warehouse=""
+):
+    """Returns {table_name: {"fingerprint", "status", "value_index_datetime"}} for the scanned tables of a
+    connection, value_index_datetime being when its oldest value index was built (None without value indexes)."""
+    cur = conn.cursor()
+    if db_schema is None:
+        db_schema = ""
+    if db_warehouse is None:
+        db_warehouse = ""
+    select = sql.SQL(
+        """
+        SELECT d.table_name, d.fingerprint, d.status, vi.value_index_datetime
+        FROM genie_users_db_connection_details d
+        LEFT JOIN (
+            SELECT table_name, MIN(datetime) AS value_index_datetime
+            FROM genie_users_db_connection_details_value_index
+            WHERE company_id = %s AND resourcename = %s AND db_schema = %s AND db_warehouse = %s
+            GROUP BY table_name
+        ) vi ON vi.table_name = d.table_name
+        WHERE d.company_id = %s AND d.resourcename = %s AND d.db_schema = %s AND d.db_warehouse = %s
+        """
+    )
+    try:
+        scope = (int(company_id), resourcename, db_schema, db_warehouse)
+        cur.execute(select, scope + scope)
+        return {
+            table_name: {"fingerprint": fingerprint, "status": status, "value_index_datetime": value_index_datetime}
+            for table_name, fingerprint, status, value_index_datetime in cur.fetchall()
+        }
+    except Exception as e:
+        traceback.print_exc()
+        print(f"get_genie_users_db_connection_details_fingerprints, Database error: {e}")
+        return None
+    finally:
+        cur.close()
+        conn.close()
+
+
+def get_genie_users_db_connection_details_table_info(
+        conn, company_id, db_schema="", resourcename="", db_warehouse=""
+):
+    """Returns {table_name: {"table_schema", "table_indexes", "examples"}} for the completed tables of a connection,
+    what SQLDatabase.get_table_info needs to describe them without querying the warehouse."""
+    cur = conn.cursor()
+    if db_schema is None:
+        db_schema = ""
+    if db_warehouse is None:
+        db_warehouse = ""
+    select = sql.SQL(
+        """
+        SELECT table_name, table_schema, table_indexes, examples
+        FROM genie_users_db_connection_details
+        WHERE company_id = %s AND resourcename = %s AND db_schema = %s AND db_warehouse = %s
+        AND status = 'COMPLETED'
+        """
+    )
+    try:
+        cur.execute(select, (int(company_id), resourcename, db_schema, db_warehouse))
+        return {
+            table_name: {"table_schema": table_schema, "table_indexes": table_indexes, "examples": examples}
+            for table_name, table_schema, table_indexes, examples in cur.fetchall()
+        }
+    except Exception as e:
+        traceback.print_exc()
+        print(f"get_genie_users_db_connection_details_table_info, Database error: {e}")
+        return None
+    finally:
+        cur.close()
+        conn.close()
+
+
+def delete_genie_users_db_connection_details_tables(
+        conn, table_names, company_id, db_schema="", resourcename="", db_warehouse=""
+):
+    cur = conn.cursor()
+    if db_schema is None:
+        db_schema = ""
+    if db_warehouse is None:
+        db_warehouse = ""
+    delete = sql.SQL(
+        """
+        DELETE FROM {table}
+        WHERE company_id = %s AND resourcename = %s AND db_schema = %s AND db_warehouse = %s
+        AND table_name = ANY(%s)
+        """
+    )
+    try:
+        if len(table_names) == 0:
+            return 0
+        print(
+            f"delete_genie_users_db_connection_details_tables, company_id={company_id}, resourcename={resourcename}, table_names={table_names}")
+        values = (int(company_id), resourcename, db_schema, db_warehouse, list(table_names))
+        # the column descriptions and value indexes of a dropped table go with it, in the same transaction
+        for table in ("genie_users_db_connection_details_column_description",
+                      "genie_users_db_connection_details_value_index"):
+            cur.execute(delete.format(table=sql.Identifier(table)), values)
+        cur.execute(delete.format(table=sql.Identifier("genie_users_db_connection_details")), values)
+        return cur.rowcount
+    except Exception as e:
+        traceback.print_exc()
+        print(f"delete_genie_users_db_connection_details_tables, Database error: {e}")
+        return False
+    finally:
+        conn.commit()
+        cur.close()
+        conn.close()
+
+
 def get_genie_users_db_connection_details_by_company_id(
         conn, company_id, db_schema="", resourcename="", skip=0,
         limit=100, db_warehouse="",
@@ -329,6 +559,163 @@ def create_genie_users_db_connection_details_column_description_column_distinct(
         conn.close()
 
 
+def upsert_genie_users_db_connection_details_column_distinct_bulk(
+        conn, records, company_id, db_schema="", resourcename="", db_warehouse=""
+):
+    """Upserts column_distinct for many columns in one transaction, records are dicts with table_name,
+    column_name and column_distinct. Returns the number of rows inserted or changed."""
+    cur = conn.cursor()
+    if db_schema is None:
+        db_schema = ""
+    if db_warehouse is None:
+        db_warehouse = ""
+    try:
+        if len(records) == 0:
+            return 0
+        records = list({(record["table_name"], record["column_name"]): record for record in records}.values())
+        upsert = sql.SQL(
+            """
+            INSERT INTO genie_users_db_connection_details_column_description AS cd
+            (table_name, db_schema, db_warehouse, resourcename, company_id, column_name, column_distinct, datetime) 
+            VALUES %s
+            ON CONFLICT (table_name, db_schema, db_warehouse, resourcename, company_id, column_name)
+            DO UPDATE SET
+            column_distinct = EXCLUDED.column_distinct
+            WHERE cd.column_distinct IS DISTINCT FROM EXCLUDED.column_distinct
+            RETURNING cd.id
+            """
+        )
+        values = [
+            (
+                record["table_name"], db_schema, db_warehouse, resourcename, company_id, record["column_name"],
+                json.dumps(record.get("column_distinct", [])),
+            )
+            for record in records
+        ]
+        changed = execute_values(
+            cur, upsert.as_string(conn), values,
+            template="(%s, %s, %s, %s, %s, %s, %s::jsonb, NOW())",
+            page_size=1000, fetch=True,
+        )
+        print(
+            f"upsert_genie_users_db_connection_details_column_distinct_bulk, company_id={company_id}, records={len(records)}, changed={len(changed)}")
+        return len(changed)
+
+    except Exception as e:
+        conn.rollback()
+        traceback.print_exc()
+        print(f"upsert_genie_users_db_connection_details_column_distinct_bulk, Database error: {e}")
+        return False
+
+    finally:
+        conn.commit()
+        cur.close()
+        conn.close()
+
+
+def upsert_genie_users_db_connection_details_value_index_bulk(
+        conn, records, company_id, db_schema="", resourcename="", db_warehouse=""
+):
+    """Upserts the value indexes of many columns in one transaction, records are dicts with table_name,
+    column_name, value_count and value_index (ValueIndex.to_bytes). Returns the number of rows written.
+    Unchanged indexes are written too, datetime is what COLUMN_VALUE_INDEX_MAX_AGE is measured from."""
+    cur = conn.cursor()
+    if db_schema is None:
+        db_schema = ""
+    if db_warehouse is None:
+        db_warehouse = ""
+    try:
+        if len(records) == 0:
+            return 0
+        records = list({(record["table_name"], record["column_name"]): record for record in records}.values())
+        upsert = sql.SQL(
+            """
+            INSERT INTO genie_users_db_connection_details_value_index AS vi
+            (table_name, db_schema, db_warehouse, resourcename, company_id, column_name, value_count, value_index, datetime) 
+            VALUES %s
+            ON CONFLICT (table_name, db_schema, db_warehouse, resourcename, company_id, column_name)
+            DO UPDATE SET
+            value_count = EXCLUDED.value_count,
+            value_index = EXCLUDED.value_index,
+            datetime = EXCLUDED.datetime
+            RETURNING vi.id
+            """
+        )
+        values = [
+            (
+                record["table_name"], db_schema, db_warehouse, resourcename, company_id, record["column_name"],
+                record["value_count"], Binary(record["value_index"]),
+            )
+            for record in records
+        ]
+        changed = execute_values(
+            cur, upsert.as_string(conn), values,
+            template="(%s, %s, %s, %s, %s, %s, %s, %s, NOW())",
+            page_size=100, fetch=True,
+        )
+        print(
+            f"upsert_genie_users_db_connection_details_value_index_bulk, company_id={company_id}, records={len(records)}, changed={len(changed)}")
+        return len(changed)
+
+    except Exception as e:
+        conn.rollback()
+        traceback.print_exc()
+        print(f"upsert_genie_users_db_connection_details_value_index_bulk, Database error: {e}")
+        return False
+
+    finally:
+        conn.commit()
+        cur.close()
+        conn.close()
+
+
+def get_genie_users_db_connection_details_value_index(
+        conn, company_id, table_name, db_schema, db_warehouse,
+        resourcename, column_name
+):
+    cur = conn.cursor()
+
+    if not db_schema:
+        db_schema = ""
+    if not db_warehouse:
+        db_warehouse = ""
+
+    select = sql.SQL(
+        """
+        SELECT value_count, value_index, datetime 
+        FROM genie_users_db_connection_details_value_index 
+        WHERE 
+            company_id = %s 
+            AND table_name = %s 
+            AND db_schema = %s  
+            AND db_warehouse = %s  
+            AND resourcename = %s 
+            AND column_name = %s
+        """
+    )
+
+    values = (company_id, table_name, db_schema, db_warehouse, resourcename, column_name)
+
+    try:
+        cur.execute(select, values)
+        details = cur.fetchone()
+
+        if details:
+            return {
+                "value_count": details[0],
+                "value_index": bytes(details[1]),
+                "datetime": details[2],
+            }
+        else:
+            return None
+    except Exception as e:
+        print(f"get_genie_users_db_connection_details_value_index, Database error: {e}")
+        return None
+    finally:
+        cur.close()
+        conn.close()
+
+
 def get_genie_users_db_connection_details_column_description(
         conn, company_id, table_name, db_schema, db_warehouse,
         resourcename, column_name
@@ -0,0 +1,73 @@
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from config.settings.base import TENANT_ENGINE_POOL_SIZE, TENANT_ENGINE_MAX_OVERFLOW
+
+SCAN_COMPLETED = "COMPLETED"
+SCAN_FAILED = "FAILED"
+SCAN_TIMEOUT = "TIMEOUT"
+
+# single-connection dialects, tables are scanned one at a time
+_SERIAL_PREFIXES = ("sqlite", "duckdb")
+
+
+def scan_parallelism(engine, parallelism):
+    """Number of scan workers for a tenant engine, bounded by its connection pool (see engine_registry)."""
+    if str(engine.url).lower().startswith(_SERIAL_PREFIXES):
+        return 1
+    return max(1, min(parallelism, TENANT_ENGINE_POOL_SIZE + TENANT_ENGINE_MAX_OVERFLOW))
+
+
+def scan_tables(scan, tables, workers=1, timeout=None, on_result=None):
+    """Runs scan(table) for every table on a bounded thread pool.
+
+    on_result(table, status, result) is called from the calling thread as each table finishes, with status
+    COMPLETED, FAILED or TIMEOUT. A table running longer than timeout seconds is reported as TIMEOUT and its late
+    result is discarded, the worker thread itself cannot be interrupted.
+    Returns {table: result} for the completed tables.
+    """
+    results = {}
+    started = {}
+    started_lock = threading.Lock()
+
+    def run(table):
+        with started_lock:
+            started[table] = time.monotonic()
+        return scan(table)
+
+    def report(table, status, result=None):
+        if on_result is not None:
+            on_result(table, status, result)
+
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="table-scan")
+    futures = {executor.submit(run, table): table for table in tables}
+    pending = set(futures)
+    try:
+        while len(pending) > 0:
+            done, pending = wait(pending, timeout=min(timeout, 1.0) if timeout else None, return_when=FIRST_COMPLETED)
+            for future in done:
+                table = futures[future]
+                try:
+                    results[table] = future.result()
+                    report(table, SCAN_COMPLETED, results[table])
+                except Exception as e:
+                    traceback.print_exc()
+                    print(f"scan_tables, table={table}, failed, e={e}")
+                    report(table, SCAN_FAILED)
+
+            if timeout:
+                now = time.monotonic()
+                with started_lock:
+                    expired = [
+                        future for future in pending
+                        if futures[future] in started and now - started[futures[future]] > timeout
+                    ]
+                for future in expired:
+                    pending.discard(future)
+                    print(f"scan_tables, table={futures[future]}, timed out after {timeout}s")
+                    report(futures[future], SCAN_TIMEOUT)
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+    return results
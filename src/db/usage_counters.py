@@ -0,0 +1,122 @@
+import calendar
+import traceback
+from datetime import datetime
+
+from psycopg2 import sql
+
+USAGE_SCOPE_COMPANY = "company"
+USAGE_SCOPE_USER = "user"
+
+
+def month_bounds(year, month):
+    # Same month window as get_chat_history_count_by_* and reconcile_usage_counters
+    first_day = datetime(year, month, 1)
+    last_day = datetime(year, month, calendar.monthrange(year, month)[1], 23, 59, 59)
+    return first_day, last_day
+
+
+def increment_usage_counters(cur, company_id, genie_users_id, when, delta=1):
+    # Runs on the caller's cursor so the counters commit together with the genie_chat_history row.
+    # The first increment of a month seeds the counter with COUNT(*) of the month's history, which already
+    # includes the caller's row, so rows written before the counter existed are not lost.
+    first_day, last_day = month_bounds(when.year, when.month)
+    update = sql.SQL(
+        """
+        UPDATE genie_usage_counters SET count = GREATEST(count + %s, 0), updated_at = %s
+        WHERE scope = %s AND scope_id = %s AND year = %s AND month = %s
+        """
+    )
+    for scope, column, scope_id in (
+            (USAGE_SCOPE_COMPANY, "company_id", company_id),
+            (USAGE_SCOPE_USER, "genie_users_id", genie_users_id),
+    ):
+        cur.execute(update, (delta, when, scope, scope_id, when.year, when.month))
+        if cur.rowcount > 0:
+            continue
+
+        # ON CONFLICT: a concurrent first increment seeded the row without our uncommitted history row
+        seed = sql.SQL(
+            """
+            INSERT INTO genie_usage_counters (scope, scope_id, year, month, count, updated_at)
+            SELECT %s, %s, %s, %s, COUNT(*), %s
+            FROM genie_chat_history
+            WHERE {column} = %s AND datetime BETWEEN %s AND %s
+            ON CONFLICT (scope, scope_id, year, month)
+            DO UPDATE SET count = GREATEST(genie_usage_counters.count + %s, 0), updated_at = EXCLUDED.updated_at
+            """
+        ).format(column=sql.Identifier(column))
+        cur.execute(seed, (scope, scope_id, when.year, when.month, when, scope_id, first_day, last_day, delta))
+
+
+def get_usage_count(cur, scope, scope_id, year, month):
+    select = sql.SQL(
+        "SELECT count FROM genie_usage_counters WHERE scope = %s AND scope_id = %s AND year = %s AND month = %s;"
+    )
+    cur.execute(select, (scope, scope_id, year, month))
+    result = cur.fetchone()
+    return result[0] if result else None
+
+
+def seed_usage_count(cur, scope, scope_id, year, month, count, when):
+    # DO NOTHING: a concurrent increment that created the row first wins, reconcile_usage_counters fixes any drift.
+    insert = sql.SQL(
+        """
+        INSERT INTO genie_usage_counters (scope, scope_id, year, month, count, updated_at)
+        VALUES (%s, %s, %s, %s, %s, %s)
+        ON CONFLICT (scope, scope_id, year, month) DO NOTHING
+        """
+    )
+    cur.execute(insert, (scope, scope_id, year, month, count, when))
+
+
+def reconcile_usage_counters(conn, first_day, last_day, year, month, now):
+    cur = conn.cursor()
+    try:
+        print(f"reconcile_usage_counters, year={year}, month={month}")
+        upsert = sql.SQL(
+            """
+            INSERT INTO genie_usage_counters (scope, scope_id, year, month, count, updated_at)
+            SELECT %s, company_id, %s, %s, COUNT(*), %s
+            FROM genie_chat_history
+            WHERE datetime BETWEEN %s AND %s
+            GROUP BY company_id
+            UNION ALL
+            SELECT %s, genie_users_id, %s, %s, COUNT(*), %s
+            FROM genie_chat_history
+            WHERE datetime BETWEEN %s AND %s
+            GROUP BY genie_users_id
+            ON CONFLICT (scope, scope_id, year, month)
+            DO UPDATE SET count = EXCLUDED.count, updated_at = EXCLUDED.updated_at
+            """
+        )
+        cur.execute(upsert, (
+            USAGE_SCOPE_COMPANY, year, month, now, first_day, last_day,
+            USAGE_SCOPE_USER, year, month, now, first_day, last_day,
+        ))
+        upserted = cur.rowcount
+
+        # Counters whose history rows were all deleted since the last run
+        reset = sql.SQL(
+            """
+            UPDATE genie_usage_counters c SET count = 0, updated_at = %s
+            WHERE c.year = %s AND c.month = %s AND c.count <> 0
+            AND NOT EXISTS (
+                SELECT 1 FROM genie_chat_history h
+                WHERE h.datetime BETWEEN %s AND %s
+                AND ((c.scope = %s AND h.company_id = c.scope_id) OR (c.scope = %s AND h.genie_users_id = c.scope_id))
+            )
+            """
+        )
+        cur.execute(reset, (now, year, month, first_day, last_day, USAGE_SCOPE_COMPANY, USAGE_SCOPE_USER))
+        reset_count = cur.rowcount
+
+        conn.commit()
+        return upserted, reset_count
+    except Exception as e:
+        conn.rollback()
+        traceback.print_exc()
+        print(f"reconcile_usage_counters, Database error: {e}")
+        return None
+    finally:
+        cur.close()
+        conn.close()
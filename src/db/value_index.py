@@ -0,0 +1,201 @@
+import datetime
+import io
+import traceback
+import zlib
+
+import numpy as np
+import pytz
+
+from config.settings.base import COLUMN_VALUE_INDEX_MAX_VALUES, COLUMN_VALUE_INDEX_CACHE_TTL, \
+    COLUMN_VALUE_INDEX_MAX_AGE
+from src.db.login_helpers import getConn
+from src.db.schema_snapshot import get_snapshot_table
+from src.db.table_info_helpers import get_genie_users_db_connection_details_value_index
+from src.utils.ttl_cache import TTLCache
+
+SIMILARITY_THRESHOLD = 0.3
+MAX_MATCHES = 25
+# longer cells (free text, json) are not entities worth matching
+MAX_VALUE_LENGTH = 256
+
+_NOT_CACHED = object()
+
+
+def trigrams(value):
+    """pg_trgm style trigrams of a lower-cased value padded with two leading blanks and one trailing blank."""
+    padded = f"  {value.strip().lower()} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def trigram_keys(value):
+    return np.array(sorted({zlib.crc32(gram.encode("utf-8")) for gram in trigrams(value)}), dtype=np.uint32)
+
+
+class ValueIndex:
+    """Trigram postings over the distinct values of one column.
+
+    keys holds the sorted trigram hashes, postings[indptr[k]:indptr[k + 1]] the value ids containing keys[k], so a
+    lookup gathers the postings of the entity's trigrams and counts shared trigrams per value with np.bincount.
+    """
+
+    def __init__(self, values, keys, indptr, postings, gram_counts):
+        self.values = values
+        self.keys = keys
+        self.indptr = indptr
+        self.postings = postings
+        self.gram_counts = gram_counts
+
+    @classmethod
+    def build(cls, values):
+        values = list(dict.fromkeys(str(value).strip() for value in values if value is not None and str(value).strip()))
+        per_value = [trigram_keys(value) for value in values]
+        gram_counts = np.array([len(keys) for keys in per_value], dtype=np.uint32)
+        if len(values) > 0:
+            all_keys = np.concatenate(per_value)
+            value_ids = np.repeat(np.arange(len(values), dtype=np.uint32), gram_counts)
+        else:
+            all_keys = np.zeros(0, dtype=np.uint32)
+            value_ids = np.zeros(0, dtype=np.uint32)
+        order = np.argsort(all_keys, kind="stable")
+        all_keys = all_keys[order]
+        keys, starts = np.unique(all_keys, return_index=True)
+        indptr = np.append(starts, len(all_keys)).astype(np.uint64)
+        return cls(values, keys, indptr, value_ids[order], gram_counts)
+
+    def __len__(self):
+        return len(self.values)
+
+    def _shared(self, query):
+        """Number of trigrams of query each value contains."""
+        positions = np.searchsorted(self.keys, query)
+        positions = positions[positions < len(self.keys)]
+        positions = positions[np.isin(self.keys[positions], query)]
+        if len(positions) == 0:
+            return np.zeros(len(self.values), dtype=np.int64)
+        postings = np.concatenate([self.postings[self.indptr[p]:self.indptr[p + 1]] for p in positions])
+        return np.bincount(postings, minlength=len(self.values))
+
+    def search(self, entity, limit=MAX_MATCHES, threshold=SIMILARITY_THRESHOLD):
+        """Values similar to entity (trigram similarity, best first), followed by values containing it."""
+        query = trigram_keys(entity)
+        if len(self.values) == 0 or len(query) == 0:
+            return []
+        shared = self._shared(query)
+        candidates = np.flatnonzero(shared)
+        similarity = shared[candidates] / (len(query) + self.gram_counts[candidates] - shared[candidates])
+
+        keep = similarity >= threshold
+        similar = candidates[keep][np.argsort(-similarity[keep], kind="stable")][:limit]
+        matches = [self.values[i] for i in similar]
+
+        # only values holding every unpadded trigram of the entity can contain it
+        needle = entity.strip().lower()
+        inner = np.array(
+            sorted({zlib.crc32(needle[i:i + 3].encode("utf-8")) for i in range(len(needle) - 2)}), dtype=np.uint32)
+        if len(inner) > 0:
+            contains = np.flatnonzero(self._shared(inner) == len(inner))
+        else:
+            contains = candidates
+        seen = set(similar.tolist())
+        for i in contains:
+            if len(matches) >= limit * 2:
+                break
+            if i not in seen and needle in self.values[i].lower():
+                matches.append(self.values[i])
+        return matches
+
+    def to_bytes(self):
+        encoded = [value.encode("utf-8") for value in self.values]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.uint64)
+        np.cumsum([len(value) for value in encoded], out=offsets[1:])
+        buffer = io.BytesIO()
+        np.savez_compressed(
+            buffer,
+            values=np.frombuffer(b"".join(encoded), dtype=np.uint8),
+            offsets=offsets,
+            keys=self.keys,
+            indptr=self.indptr,
+            postings=self.postings,
+            gram_counts=self.gram_counts,
+        )
+        return buffer.getvalue()
+
+    @classmethod
+    def from_bytes(cls, data):
+        arrays = np.load(io.BytesIO(bytes(data)))
+        raw = arrays["values"].tobytes()
+        offsets = arrays["offsets"]
+        values = [raw[offsets[i]:offsets[i + 1]].decode("utf-8") for i in range(len(offsets) - 1)]
+        return cls(values, arrays["keys"], arrays["indptr"], arrays["postings"], arrays["gram_counts"])
+
+
+def build_column_value_indexes(engine, table_name, db_schema=None, max_values=COLUMN_VALUE_INDEX_MAX_VALUES,
+                               profiles=None):
+    """Value indexes for the string columns of a table, as records for
+    upsert_genie_users_db_connection_details_value_index_bulk. Columns with more than max_values distinct values
+    are skipped, ColumnEntityChecker keeps querying the warehouse for them.
+
+    profiles (profile_table_columns of the table) lets columns whose distinct_estimate is already above max_values
+    skip the DISTINCT scan, the LIMIT on the scan still catches the ones the estimate placed too low."""
+    import sqlalchemy
+    from sqlalchemy.sql import func
+
+    table = get_snapshot_table(engine, table_name, db_schema)
+    estimates = {profile["column_name"]: profile["distinct_estimate"] for profile in profiles or []}
+    records = []
+    with engine.connect() as connection:
+        for column in table.columns:
+            if column.name.find(".") >= 0 or not isinstance(column.type, sqlalchemy.String):
+                continue
+            if estimates.get(column.name, 0) > max_values:
+                print(f"build_column_value_indexes, SKIP, table_name={table_name}, column={column.name}, distinct_estimate={estimates[column.name]}")
+                continue
+            try:
+                query = sqlalchemy.select([func.distinct(column)]).where(column.isnot(None)).limit(max_values + 1)
+                values = [row[0] for row in connection.execute(query)]
+            except Exception as e:
+                traceback.print_exc()
+                print(f"build_column_value_indexes, table_name={table_name}, column={column.name}, e={e}")
+                continue
+            if len(values) > max_values:
+                print(f"build_column_value_indexes, SKIP, table_name={table_name}, column={column.name}, too many values")
+                continue
+            index = ValueIndex.build(value for value in values if len(str(value)) <= MAX_VALUE_LENGTH)
+            records.append({
+                "table_name": table_name,
+                "column_name": column.name,
+                "value_count": len(index),
+                "value_index": index.to_bytes(),
+            })
+    return records
+
+
+def value_index_expired(built_at, max_age=COLUMN_VALUE_INDEX_MAX_AGE):
+    """True when an index built at built_at may miss values inserted since, the caller treats it as missing."""
+    if built_at is None or not max_age:
+        return False
+    now = datetime.datetime.now(tz=pytz.UTC) if built_at.tzinfo is not None else datetime.datetime.utcnow()
+    return (now - built_at).total_seconds() > max_age
+
+
+_value_indexes = TTLCache(maxsize=256, ttl=COLUMN_VALUE_INDEX_CACHE_TTL)
+
+
+def get_column_value_index(company_id, table_name, column_name, db_schema="", db_warehouse="", resourcename=""):
+    """Stored ValueIndex of a column, None when the scan did not build one or it is older than
+    COLUMN_VALUE_INDEX_MAX_AGE. Both outcomes are cached in process."""
+    key = (company_id, resourcename, db_schema or "", db_warehouse or "", table_name, column_name)
+    index = _value_indexes.get(key, _NOT_CACHED)
+    if index is not _NOT_CACHED:
+        return index
+
+    stored = get_genie_users_db_connection_details_value_index(
+        conn=getConn(), company_id=company_id, table_name=table_name, db_schema=db_schema,
+        db_warehouse=db_warehouse, resourcename=resourcename, column_name=column_name,
+    )
+    if stored and value_index_expired(stored["datetime"]):
+        print(f"get_column_value_index, EXPIRED, table_name={table_name}, column_name={column_name}")
+        stored = None
+    index = ValueIndex.from_bytes(stored["value_index"]) if stored else None
+    _value_indexes.set(key, index)
+    return index
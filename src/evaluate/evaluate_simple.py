@@ -1,9 +1,7 @@
 import json
 import traceback
 
-from sqlalchemy import MetaData
 from llama_index.objects import SQLTableSchema
-from langchain.chat_models import ChatOpenAI
 from llama_index import SQLDatabase
 
 from sql_metadata import Parser
@@ -15,8 +13,10 @@ from langchain.prompts.chat import (
     HumanMessagePromptTemplate, SystemMessagePromptTemplate,
 )
 
-from config.settings.base import OPEN_API_TOKEN, AGENT_LLM_MODEL_EVAL
+from config.settings.base import AGENT_LLM_MODEL_EVAL
+from src.db.schema_snapshot import get_schema_snapshot
 from src.db.utils import CustomJSONEncoder
+from src.query_engine.llm_clients import get_chat_model
 
 SYSTEM_TEMPLATE = """You are a {dialect} expert.
 Given a question, a SQL query, and the database schema, analyze the correctness of the SQL query and provide a score.
@@ -74,9 +74,9 @@ def evaluate_sql_query_simple(text_query, generated_sql, engine, formatted_resul
         if generated_sql is None:
             return 0
 
-        metadata_obj = MetaData()
-        metadata_obj.reflect(engine)
-        llm = ChatOpenAI(model_name=AGENT_LLM_MODEL_EVAL, openai_api_key=OPEN_API_TOKEN)
+        metadata_obj = get_schema_snapshot(engine).metadata
+        # 0.7 is the ChatOpenAI default the evaluation always ran with
+        llm = get_chat_model(AGENT_LLM_MODEL_EVAL, temperature=0.7)
         table_schema_objs = [SQLTableSchema(table_name=table_name) for table_name in metadata_obj.tables.keys()]
         database = SQLDatabase(engine=engine)
         system_message_prompt = SystemMessagePromptTemplate.from_template(
@@ -1,8 +1,10 @@
+import json
+
 from config.settings.base import AGENT_LLM_MODEL, TEMPERATURE
 from src.api.openapi_helpers import START_CODE_TAG, END_CODE_TAG
+from src.db.llm_cache import llm_cache, prompt_hash
 from src.db.utils import get_dialect_name
-import openai
-
+from src.query_engine.llm_clients import get_openai_client
 from src.query_engine.utils import extract_sql_custom
 
 
@@ -48,8 +50,7 @@ def generate_query_with_custom_prompt(
                   {"role": "user", "content": prompt}]
     print(f"generate_query, chat_query={chat_query}")
 
-    response = openai.ChatCompletion.create(
-        messages=chat_query,
+    completion_args = dict(
         model=AGENT_LLM_MODEL,
         temperature=TEMPERATURE,
         max_tokens=1000,
@@ -58,8 +59,19 @@ def generate_query_with_custom_prompt(
         presence_penalty=0,
         stop=" ;",
     )
-    # read the chat completion config and generate the required params to be passed to Chat Completion
+    # only temperature 0 completions are repeatable enough to cache
+    cache_key = None
+    if TEMPERATURE == 0:
+        cache_key = prompt_hash(json.dumps(completion_args, sort_keys=True), json.dumps(chat_query))
+    cached = llm_cache.get(cache_key) if cache_key else None
+    if cached is not None:
+        content = cached[0]
+    else:
+        response = get_openai_client().chat.completions.create(messages=chat_query, **completion_args)
+        content = str(response.choices[0].message.content)
+        if cache_key:
+            llm_cache.set(cache_key, [content])
 
-    generated_query = extract_sql_custom(str(response["choices"][0]["message"]["content"]))
+    generated_query = extract_sql_custom(content)
 
     return generated_query
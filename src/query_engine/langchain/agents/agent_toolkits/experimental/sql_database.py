@@ -15,6 +15,8 @@ from sqlalchemy import MetaData, create_engine, text
 from sqlalchemy.engine import Engine
 from sshtunnel import SSHTunnelForwarder
 
+from src.db.result_cache import result_cache
+
 logger = logging.getLogger(__name__)
 
 
@@ -99,6 +101,9 @@ class SQLDatabase(LangchainSQLDatabase):
 
     """
 
+    # (company_id, resourcename) of the warehouse, when set run_sql results are shared through result_cache
+    result_cache_scope: tuple | None = None
+
     @property
     def engine(self) -> Engine:
         """Return SQL Alchemy engine."""
@@ -198,15 +203,26 @@ class SQLDatabase(LangchainSQLDatabase):
         If the statement returns rows, a string of the results is returned.
         If the statement returns no rows, an empty string is returned.
         """
+        command = self.parser_to_filter_commands(command)
+        cache_key = None
+        if self.result_cache_scope is not None:
+            company_id, resourcename = self.result_cache_scope
+            cache_key = result_cache.key(company_id, resourcename, self._schema, command, variant=top_k)
+            cached = result_cache.get(cache_key)
+            if cached is not None:
+                return cached
         with self._engine.connect() as connection:
-            command = self.parser_to_filter_commands(command)
             cursor = connection.execute(text(command))
             if cursor.returns_rows and top_k:
                 result = cursor.fetchmany(top_k)
-                return str(result), {"result": result}
+                ret = str(result), {"result": result}
+                result_cache.set(cache_key, ret, size=len(ret[0]))
+                return ret
             if cursor.returns_rows:
                 result = cursor.fetchall()
-                return str(result), {"result": result}
+                ret = str(result), {"result": result}
+                result_cache.set(cache_key, ret, size=len(ret[0]))
+                return ret
         return "", {}
 
     # from llama-index's sql-wrapper
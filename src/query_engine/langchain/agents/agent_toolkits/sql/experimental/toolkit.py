@@ -63,7 +63,7 @@ class SQLDatabaseToolkit(BaseToolkit):
             db=self.db, context=self.context, db_scan=self.db_scan
         )
         tools.append(info_relevant_tool)
-        column_sample_tool = ColumnEntityChecker(db=self.db, context=self.context)
+        column_sample_tool = ColumnEntityChecker(db=self.db, context=self.context, db_scan=self.db_scan)
         tools.append(column_sample_tool)
         if self.context is not None:
             context = self.context
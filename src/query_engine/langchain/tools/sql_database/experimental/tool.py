@@ -7,7 +7,6 @@ from typing import Any, Callable, List
 
 import numpy as np
 import openai
-import pandas as pd
 import sqlalchemy
 from langchain.callbacks.manager import (
     AsyncCallbackManagerForToolRun,
@@ -16,17 +15,20 @@ from langchain.callbacks.manager import (
 from langchain.embeddings import OpenAIEmbeddings
 from langchain.tools.base import BaseTool
 from pydantic import BaseModel, Field
-from sqlalchemy import MetaData
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.sql import func
 
+from config.settings.base import TABLE_EMBEDDING_MODEL
+from src.db.schema_snapshot import get_snapshot_table
+from src.db.table_embeddings import table_representation, embed_table_representations, relevance_scores
+from src.db.value_index import get_column_value_index
 from src.query_engine.langchain.agents.agent_toolkits.experimental.sql_database import \
     SQLDatabase as SQLDatabaseExperimental
 
 logger = logging.getLogger(__name__)
 
 TOP_K = int(os.getenv("UPPER_LIMIT_QUERY_RETURN_ROWS", "50"))
-EMBEDDING_MODEL = "text-embedding-ada-002"
+EMBEDDING_MODEL = TABLE_EMBEDDING_MODEL
 
 
 def catch_exceptions():  # noqa: C901
@@ -203,33 +205,18 @@ class TablesSQLDatabaseTool(BaseSQLDatabaseTool, BaseTool):
     ) -> str:
         """Use the concatenation of table name, columns names, and the description of the table as the table representation"""
         question_embedding = self.get_embedding(user_question)
-        table_representations = []
-        for table in self.db_scan:
-            col_rep = ""
-            for column in table["table_columns"]:
-                col_rep += column["name"] + " "
-            table_name = table["table_name"]
-            selected_table_columns = table["table_columns"]
-            foreign_keys = table["foreign_keys"]
-            examples = table["examples"]
-            filtered_columns = [column for column in selected_table_columns if '_airbyte' not in column["name"]]
-
-            table_rep = f"""-- Table={table_name}, columns={filtered_columns}, foreign_keys={foreign_keys}, examples={examples}. """
-            table_representations.append([table["table_name"], table_rep])
-        df = pd.DataFrame(
-            table_representations, columns=["table_name", "table_representation"]
-        )
-        df["table_embedding"] = df.table_representation.apply(
-            lambda x: self.get_embedding(x)
-        )
-        df["similarities"] = df.table_embedding.apply(
-            lambda x: self.cosine_similarity(x, question_embedding)
+        table_names = [table["table_name"] for table in self.db_scan]
+        table_representations = [table_representation(table) for table in self.db_scan]
+        # vectors are cached in genie_table_embeddings, only new or changed tables hit the embedding API
+        table_embeddings = embed_table_representations(
+            embedding=self.embedding,
+            model=getattr(self.embedding, "model", EMBEDDING_MODEL),
+            representations=table_representations,
         )
+        similarities = relevance_scores(table_embeddings, question_embedding)
         table_relevance = ""
-        for _, row in df.iterrows():
-            table_relevance += (
-                f'Table: {row["table_name"]}, relevance score: {row["similarities"]}\n'
-            )
+        for table_name, similarity in zip(table_names, similarities):
+            table_relevance += f"Table: {table_name}, relevance score: {similarity}\n"
         return table_relevance
 
     async def _arun(
@@ -251,6 +238,22 @@ class ColumnEntityChecker(BaseSQLDatabaseTool, BaseTool):
 
     Example Input: table1 -> column2, entity
     """
+    db_scan: List = Field(default_factory=list)
+
+    def value_index(self, table_name: str, column_name: str):
+        """ValueIndex stored by the schema scan for the column, None when there is none."""
+        for table in self.db_scan:
+            # freshly scanned tables carry no company_id, they are looked up in the warehouse
+            if table["table_name"] == table_name and table.get("company_id"):
+                return get_column_value_index(
+                    company_id=table["company_id"],
+                    table_name=table_name,
+                    column_name=column_name,
+                    db_schema=table.get("db_schema"),
+                    db_warehouse=table.get("db_warehouse"),
+                    resourcename=table.get("resourcename"),
+                )
+        return None
 
     def find_similar_strings(
             self, input_list: List[tuple], target_string: str, threshold=0.4
@@ -276,9 +279,16 @@ class ColumnEntityChecker(BaseSQLDatabaseTool, BaseTool):
             table_name, column_name = schema.split("->")
         except ValueError:
             return "Invalid input format, use following format: table_name -> column_name, entity (entity should be a string without ',')"
+        index = self.value_index(table_name.strip(), column_name.strip())
+        matches = index.search(entity.strip()) if index is not None else []
+        if len(matches) > 0:
+            similar_items = "Similar items:\n"
+            for item in matches:
+                similar_items += f"{item}\n"
+            return similar_items
+        # no index, or a value inserted after the index was built, the warehouse has it
         search_pattern = f"%{entity.strip().lower()}%"
-        meta = MetaData(bind=self.db.engine)
-        table = sqlalchemy.Table(table_name.strip(), meta, autoload=True)
+        table = get_snapshot_table(self.db.engine, table_name.strip(), getattr(self.db, "_schema", None))
         try:
             search_query = sqlalchemy.select(
                 [func.distinct(table.c[column_name.strip()])]
@@ -2,7 +2,7 @@
 from __future__ import annotations
 
 import warnings
-from typing import Any, Dict, Iterable, List, Literal, Optional, Sequence, Union
+from typing import Any, Dict, Iterable, Iterator, List, Literal, Optional, Sequence, Union
 
 import sqlalchemy
 from sqlalchemy import MetaData, Table, create_engine, inspect, select, text
@@ -13,6 +13,9 @@ from sqlalchemy.types import NullType
 
 from langchain.utils import get_from_env
 
+from config.settings.base import QUERY_STREAM_CHUNK_SIZE
+from src.db.query_stream import stream_query
+
 
 def _format_index(index: sqlalchemy.engine.interfaces.ReflectedIndex) -> str:
     return (
@@ -106,6 +109,8 @@ class SQLDatabase:
             )
 
         self._max_string_length = max_string_length
+        # table info built from the warehouse for the tables without custom_table_info, once per wrapper
+        self._table_info_fragments: Dict[str, str] = {}
 
         self._metadata = metadata or MetaData(bind=self._engine, schema=(None if self._schema == '' else self._schema))
         # including view support if view_support = true
@@ -314,6 +319,9 @@ class SQLDatabase:
             if self._custom_table_info and table.name in self._custom_table_info:
                 tables.append(self._custom_table_info[table.name])
                 continue
+            if table.name in self._table_info_fragments:
+                tables.append(self._table_info_fragments[table.name])
+                continue
 
             # Ignore JSON datatyped columns
             for k, v in table.columns.items():
@@ -334,6 +342,7 @@ class SQLDatabase:
                 table_info += f"\n{self._get_sample_rows(table)}\n"
             if has_extra_info:
                 table_info += "*/"
+            self._table_info_fragments[table.name] = table_info
             tables.append(table_info)
         tables.sort()
         final_str = "\n\n".join(tables)
@@ -422,6 +431,19 @@ class SQLDatabase:
                 return result
         return []
 
+    def _execute_stream(
+        self,
+        command: str,
+        chunk_size: int = QUERY_STREAM_CHUNK_SIZE,
+    ) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Executes SQL command on a server-side cursor and yields the rows in lists of at most chunk_size,
+        see src.db.query_stream.stream_query.
+
+        If the statement returns no rows, nothing is yielded.
+        """
+        return stream_query(self._engine, command, chunk_size)
+
     def run(
         self,
         command: str,
@@ -4,9 +4,8 @@ import traceback
 
 from sqlalchemy.engine import Engine
 # from langchain.chat_models import ChatOpenAI
-from langchain_openai import ChatOpenAI
-from config.settings.base import OPEN_API_TOKEN, AGENT_LLM_MODEL, LANGCHAIN_MAX_EXECUTION_TIME, \
-    LANGCHAIN_MAX_ITERATIONS, TEMPERATURE, LANGCHAIN_VERBOSE
+from config.settings.base import AGENT_LLM_MODEL, LANGCHAIN_MAX_EXECUTION_TIME, \
+    LANGCHAIN_MAX_ITERATIONS, TEMPERATURE, LANGCHAIN_VERBOSE, TABLE_EMBEDDING_MODEL
 
 # from langchain.agents.agent_toolkits import SQLDatabaseToolkit
 from langchain_community.agent_toolkits import SQLDatabaseToolkit
@@ -20,12 +19,15 @@ from langchain.agents import create_agent
 # from langchain.agents.agent_types import AgentType
 from langchain.callbacks import get_openai_callback
 from langchain.schema import AgentAction
-from langchain.embeddings import OpenAIEmbeddings
 from langchain.agents.mrkl.base import ZeroShotAgent
 from langchain.agents.agent import AgentExecutor
 from langchain.chains.llm import LLMChain
 
 from src.context_store.context_store import retrieve_context_for_question
+from src.db.answer_cache import answer_cache, cached_agent_response
+from src.db.database_wrappers import get_database_wrapper
+from src.db.table_info_fragments import get_table_info_fragments
+from src.query_engine.llm_clients import get_chat_model, get_embeddings
 from src.query_engine.langchain.agents.agent_toolkits.sql.experimental.toolkit import \
     SQLDatabaseToolkit as SQLDatabaseToolkitExperimental
 from src.query_engine.langchain.agents.agent_toolkits.experimental.sql_database import \
@@ -34,11 +36,12 @@ from src.query_engine.langchain_sql_agent_prompts import PLAN_WITH_FEWSHOT_EXAMP
     SUFFIX_WITH_FEW_SHOT_SAMPLES, PLAN_WITH_FEWSHOT_EXAMPLES, PLAN_WITH_INSTRUCTIONS, SUFFIX_WITHOUT_FEW_SHOT_SAMPLES, \
     PLAN_BASE, AGENT_PREFIX, FORMAT_INSTRUCTIONS
 from src.query_engine.utils import extract_sql_query
+from src.utils.event_stream import EventStream
 
 from datetime import datetime
 from typing import Dict, List, Any, Tuple, Optional
 from langchain.callbacks.streaming_stdout_final_only import FinalStreamingStdOutCallbackHandler
-from langchain.schema import LLMResult
+from langchain.schema import AgentFinish, LLMResult
 from uuid import UUID
 
 
@@ -63,17 +66,23 @@ def format_intermediate_representations(
 
 
 class CustomStreamingStdOutCallbackHandler(FinalStreamingStdOutCallbackHandler):
-    buffer: List[Tuple[str, float]] = []
-    stop_token = "#!stop!#"
+    """Final answer tokens for stream_chars, handed over through a bounded EventStream: the reader blocks until a
+    token arrives instead of polling, and a slow reader holds the LLM back instead of growing a buffer."""
 
-    def on_llm_start(
-            self, serialized: Dict[str, Any], prompts: List[str], **kwargs: Any
-    ) -> None:
-        super().on_llm_start(serialized, prompts, **kwargs)
-        self.buffer = []
+    def __init__(self, *args: Any, stream: Optional[EventStream] = None, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.stream = stream or EventStream()
 
     def on_llm_end(self, response: LLMResult, **kwargs: Any) -> None:
-        self.add_to_buffer(self.stop_token)
+        # the earlier LLM calls of the agent (thoughts, tool inputs) end before the answer starts
+        if self.answer_reached:
+            self.stream.finish()
+
+    def on_llm_error(self, error: BaseException, **kwargs: Any) -> None:
+        self.stream.finish()
+
+    def on_agent_finish(self, finish: AgentFinish, **kwargs: Any) -> None:
+        self.stream.finish()
 
     def on_llm_new_token(self, token: str, **kwargs: Any) -> None:
         # Remember the last n tokens, where n = len(answer_prefix_tokens)
@@ -93,23 +102,15 @@ class CustomStreamingStdOutCallbackHandler(FinalStreamingStdOutCallbackHandler):
             self.add_to_buffer(token)
 
     def add_to_buffer(self, token: str) -> None:
-        now = datetime.now()
-        self.buffer.append((token, now))
+        self.stream.put({"token": token, "timestamp": datetime.now()})
 
     def stream_chars(self):
-        while True:
-            # when we didn't receive any token yet, just continue
-            if len(self.buffer) == 0:
+        for event in self.stream.events():
+            # None is the keep-alive of an idle stream
+            if event is None:
                 continue
-
-            token, timestamp = self.buffer.pop(0)
-
-            if token != self.stop_token:
-                for character in token:
-                    yield (character, timestamp)
-                    time.sleep(0.2)  # Remove this line. It's just for illustration purposes
-            else:
-                break
+            for character in event["token"]:
+                yield (character, event["timestamp"])
 
 
 def generate_query_with_langchain_custom_agent(
@@ -125,25 +126,50 @@ def generate_query_with_langchain_custom_agent(
         db_warehouse=None,
         ai_model=AGENT_LLM_MODEL,
         ai_temp=TEMPERATURE,
+        question_hash=None,
+        callbacks=None,
 ):
     number_of_instructions = len(context)
     max_examples = 20
 
     start_time = time.time()
 
-    llm = ChatOpenAI(model_name=ai_model, openai_api_key=OPEN_API_TOKEN, temperature=ai_temp)
+    # CACHED_HISTORY_ENABLED: an answered question (or a close enough one) is served without calling the LLM
+    cached = answer_cache.lookup(
+        company_id=company_id, genie_users_id=genie_users_id, question=question, resourcename=resourcename,
+        db_schema=db_schema, db_warehouse=db_warehouse, ai_model=ai_model, question_hash=question_hash,
+        is_experimental=is_experimental,
+    )
+    if cached is not None:
+        print(
+            f"generate_query_with_langchain_custom_agent, answer_cache hit, cache={cached['cache']}, history_id={cached.get('id')}")
+        return cached_agent_response(cached, exec_time=time.time() - start_time)
+
+    # with callbacks (src/api/stream.py) the LLM streams its tokens to them as they are generated
+    llm = get_chat_model(ai_model, temperature=ai_temp, streaming=callbacks is not None)
 
+    # wrappers are shared per tenant and schema version, their __init__ lists and reflects every table and the
+    # table info of the scanned tables comes from the scan instead of the warehouse
     if is_experimental:
-        db = LangchainSQLDatabaseExperimental(
-            engine=engine,
-            schema=(None if db_schema == '' else db_schema),
-            indexes_in_table_info=True,
+        db = get_database_wrapper(
+            "agent_experimental", company_id, resourcename, db_schema, db_warehouse, engine,
+            lambda: LangchainSQLDatabaseExperimental(
+                engine=engine,
+                schema=(None if db_schema == '' else db_schema),
+                indexes_in_table_info=True,
+                custom_table_info=get_table_info_fragments(company_id, resourcename, db_schema, db_warehouse),
+            ),
         )
+        db.result_cache_scope = (company_id, resourcename)
     else:
-        db = LangchainSQLDatabase(
-            engine=engine,
-            schema=(None if db_schema == '' else db_schema),
-            indexes_in_table_info=True,
+        db = get_database_wrapper(
+            "agent", company_id, resourcename, db_schema, db_warehouse, engine,
+            lambda: LangchainSQLDatabase(
+                engine=engine,
+                schema=(None if db_schema == '' else db_schema),
+                indexes_in_table_info=True,
+                custom_table_info=get_table_info_fragments(company_id, resourcename, db_schema, db_warehouse),
+            ),
         )
 
     if is_experimental:
@@ -164,10 +190,7 @@ def generate_query_with_langchain_custom_agent(
             few_shot_examples=samples,
             security_instructions=security_instructions,
             db_scan=list_tables,
-            embedding=OpenAIEmbeddings(
-                openai_api_key=OPEN_API_TOKEN,
-                model="text-embedding-ada-002",
-            ),
+            embedding=get_embeddings(TABLE_EMBEDDING_MODEL),
         )
         tools = toolkit.get_tools()
         if max_examples > 0 and number_of_instructions > 0:
@@ -245,7 +268,7 @@ def generate_query_with_langchain_custom_agent(
         else question
     )
     with get_openai_callback() as cb:
-        result = agent_executor(question_with_context)
+        result = agent_executor(question_with_context, callbacks=callbacks)
     sql_query_list = []
     for step in result.get("intermediate_steps", []):
         action = step[0]
@@ -2,17 +2,15 @@ import time
 from typing import List
 
 from sqlalchemy.engine import Engine
-from langchain.chat_models import ChatOpenAI
-from config.settings.base import OPEN_API_TOKEN, AGENT_LLM_MODEL, TEMPERATURE, LANGCHAIN_VERBOSE
+from config.settings.base import AGENT_LLM_MODEL, TEMPERATURE, LANGCHAIN_VERBOSE
 from langchain.callbacks import get_openai_callback
 from langchain_experimental.sql import SQLDatabaseChain
 from langchain.sql_database import SQLDatabase as LangchainSQLDatabase
-# from langchain.globals import set_llm_cache
-#
-# from langchain.cache import RedisSemanticCache
-# from langchain.embeddings import OpenAIEmbeddings
 
 from src.db.utils import get_dialect_name
+from src.db.database_wrappers import get_database_wrapper
+from src.db.table_info_fragments import get_table_info_fragments
+from src.query_engine.llm_clients import get_chat_model
 from src.query_engine.langchain_sql_agent import format_intermediate_representations
 from src.query_engine.utils import extract_sql_query
 import sqlparse
@@ -52,16 +50,14 @@ def generate_query_with_langchain_sql_chain(
         db_schema=None,
         ai_model=AGENT_LLM_MODEL,
         ai_temp=TEMPERATURE,
+        company_id=None,
+        resourcename=None,
+        db_warehouse=None,
 ):
     db_dialect = get_dialect_name(db_type)
 
-    llm = ChatOpenAI(model_name=ai_model, openai_api_key=OPEN_API_TOKEN, temperature=ai_temp)
-    # llm.cache = True
-    #
-    # set_llm_cache(RedisSemanticCache(
-    #     redis_url="redis://localhost:6379",
-    #     embedding=OpenAIEmbeddings()
-    # ))
+    # at temperature 0 repeated prompts (the query checker on the same SQL) are answered from llm_cache
+    llm = get_chat_model(ai_model, temperature=ai_temp)
 
     start_time = time.time()
     if context is not None:
@@ -81,10 +77,14 @@ def generate_query_with_langchain_sql_chain(
     # should top_k be an argument?
     db_chain = SQLDatabaseChain.from_llm(
         llm=llm,
-        db=LangchainSQLDatabase(
-            engine=engine,
-            schema=(None if db_schema == '' else db_schema),
-            indexes_in_table_info=True,
+        db=get_database_wrapper(
+            "chain", company_id, resourcename, db_schema, db_warehouse, engine,
+            lambda: LangchainSQLDatabase(
+                engine=engine,
+                schema=(None if db_schema == '' else db_schema),
+                indexes_in_table_info=True,
+                custom_table_info=get_table_info_fragments(company_id, resourcename, db_schema, db_warehouse),
+            ),
         ),
         top_k=100,
         # return_intermediate_steps=True,
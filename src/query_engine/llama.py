@@ -1,8 +1,7 @@
 import traceback
 
-from config.settings.base import OPEN_API_TOKEN, AGENT_LLM_MODEL
+from config.settings.base import AGENT_LLM_MODEL
 from llama_index import SQLDatabase
-from langchain.chat_models import ChatOpenAI
 from sqlalchemy import MetaData
 
 from llama_index import (
@@ -15,6 +14,8 @@ from llama_index.indices.struct_store import (
 )
 from llama_index.objects import ObjectIndex, SQLTableNodeMapping, SQLTableSchema
 
+from src.query_engine.llm_clients import get_chat_model
+
 
 def generate_sql_query_llama_index(engine, text_query):
     try:
@@ -23,7 +24,8 @@ def generate_sql_query_llama_index(engine, text_query):
         metadata_obj.reflect(engine)
 
         # Initialize LLM Model
-        llm = ChatOpenAI(model_name=AGENT_LLM_MODEL, openai_api_key=OPEN_API_TOKEN)
+        # 0.7 is the ChatOpenAI default this engine always ran with
+        llm = get_chat_model(AGENT_LLM_MODEL, temperature=0.7)
 
         llm_predictor = LLMPredictor(llm=llm)
         service_context = ServiceContext.from_defaults(
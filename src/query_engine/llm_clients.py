@@ -0,0 +1,186 @@
+import os
+import threading
+import time
+
+from config.settings.base import LLM_HTTP_MAX_CONNECTIONS, LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS, \
+    LLM_HTTP_KEEPALIVE_EXPIRY, LLM_HTTP_TIMEOUT
+
+_START = "llm_clients_start"
+
+
+def _api_key(api_key):
+    if api_key is not None:
+        return api_key
+    from config.settings.base import OPEN_API_TOKEN
+    return OPEN_API_TOKEN
+
+
+class HTTPStats:
+    """Requests, new connections and time to response headers of the shared HTTP client.
+
+    httpcore reports connection.connect_tcp through the trace extension only when it opens a connection, every
+    other request reused one from the keep-alive pool.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.new_connections = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+
+    def _trace(self, event_name, info):
+        if event_name == "connection.connect_tcp.complete":
+            with self._lock:
+                self.new_connections += 1
+
+    def on_request(self, request):
+        request.extensions["trace"] = self._trace
+        request.extensions[_START] = time.monotonic()
+
+    def on_response(self, response):
+        start = response.request.extensions.get(_START)
+        if start is None:
+            return
+        latency = time.monotonic() - start
+        with self._lock:
+            self.requests += 1
+            self.latency_total += latency
+            self.latency_max = max(self.latency_max, latency)
+
+    def stats(self):
+        with self._lock:
+            reused = max(self.requests - self.new_connections, 0)
+            return {
+                "requests": self.requests,
+                "new_connections": self.new_connections,
+                "reused_connections": reused,
+                "reuse_rate": round(reused / self.requests, 4) if self.requests > 0 else 0.0,
+                "latency_avg_ms": round(self.latency_total / self.requests * 1000, 1) if self.requests > 0 else 0.0,
+                "latency_max_ms": round(self.latency_max * 1000, 1),
+            }
+
+
+def _http_client(stats):
+    import httpx
+
+    return httpx.Client(
+        limits=httpx.Limits(
+            max_connections=LLM_HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=LLM_HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=LLM_HTTP_KEEPALIVE_EXPIRY,
+        ),
+        timeout=LLM_HTTP_TIMEOUT,
+        event_hooks={"request": [stats.on_request], "response": [stats.on_response]},
+    )
+
+
+def _chat(model, temperature, api_key, http_client, cache=None, streaming=False):
+    from langchain_openai import ChatOpenAI
+    return ChatOpenAI(
+        model_name=model, openai_api_key=api_key, temperature=temperature, http_client=http_client, cache=cache,
+        streaming=streaming,
+    )
+
+
+def _embeddings(model, api_key, http_client):
+    from langchain_openai import OpenAIEmbeddings
+    return OpenAIEmbeddings(openai_api_key=api_key, model=model, http_client=http_client)
+
+
+def _llm_cache():
+    from src.db.llm_cache import get_langchain_llm_cache, llm_cache
+    return get_langchain_llm_cache() if llm_cache.enabled else None
+
+
+def _openai(api_key, http_client):
+    import openai
+    return openai.OpenAI(api_key=api_key, http_client=http_client)
+
+
+class LLMClientRegistry:
+    """One configured client per (model, temperature, api key) for the process, all of them sending through the
+    same pooled keep-alive HTTP client, so a question does not build clients or open TLS connections.
+
+    Keyed by pid as well, like src/db/pool.py, so gunicorn workers forked after first use never share sockets.
+    Temperature 0 chat models answer repeated prompts from llm_cache (src/db/llm_cache.py).
+    """
+
+    def __init__(self, http_client=_http_client, chat=_chat, embeddings=_embeddings, openai_client=_openai,
+                 llm_cache=_llm_cache):
+        self._http_client_factory = http_client
+        self._chat_factory = chat
+        self._llm_cache = llm_cache
+        self._embeddings_factory = embeddings
+        self._openai_factory = openai_client
+        self._clients = {}
+        self._http = {}
+        self._lock = threading.Lock()
+
+    def _get(self, key, build):
+        key = (os.getpid(),) + key
+        client = self._clients.get(key)
+        if client is not None:
+            return client
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                client = self._clients[key] = build(self._http_client())
+            return client
+
+    def _http_client(self):
+        # called with self._lock held
+        pid = os.getpid()
+        if pid not in self._http:
+            stats = HTTPStats()
+            self._http = {pid: (self._http_client_factory(stats), stats)}
+            self._clients = {key: client for key, client in self._clients.items() if key[0] == pid}
+        return self._http[pid][0]
+
+    def chat(self, model, temperature=0.0, api_key=None, streaming=False):
+        """streaming clients send the tokens to the callbacks of the call as they arrive (src/api/stream.py)."""
+        api_key = _api_key(api_key)
+        return self._get(
+            ("chat", model, float(temperature), api_key, streaming),
+            lambda http_client: self._chat_factory(
+                model, float(temperature), api_key, http_client,
+                cache=(self._llm_cache() if float(temperature) == 0 else None),
+                streaming=streaming,
+            ),
+        )
+
+    def embeddings(self, model, api_key=None):
+        api_key = _api_key(api_key)
+        return self._get(
+            ("embeddings", model, api_key),
+            lambda http_client: self._embeddings_factory(model, api_key, http_client),
+        )
+
+    def openai(self, api_key=None):
+        api_key = _api_key(api_key)
+        return self._get(("openai", api_key), lambda http_client: self._openai_factory(api_key, http_client))
+
+    def stats(self):
+        with self._lock:
+            http = self._http.get(os.getpid())
+            clients = sum(1 for key in self._clients if key[0] == os.getpid())
+        return dict(http[1].stats() if http else HTTPStats().stats(), clients=clients)
+
+
+llm_clients = LLMClientRegistry()
+
+
+def get_chat_model(model, temperature=0.0, api_key=None, streaming=False):
+    return llm_clients.chat(model, temperature=temperature, api_key=api_key, streaming=streaming)
+
+
+def get_embeddings(model, api_key=None):
+    return llm_clients.embeddings(model, api_key=api_key)
+
+
+def get_openai_client(api_key=None):
+    return llm_clients.openai(api_key=api_key)
+
+
+def get_llm_client_stats():
+    return llm_clients.stats()
@@ -0,0 +1,32 @@
+from typing import Any
+
+from langchain_core.agents import AgentAction, AgentFinish
+from langchain_core.callbacks import BaseCallbackHandler
+
+from src.utils.event_stream import EventStream
+
+# tool outputs (query results) are cut, the client gets the full answer in the result event
+MAX_OBSERVATION_LENGTH = 2000
+
+
+class QueueCallbackHandler(BaseCallbackHandler):
+    """Puts the LLM tokens (thoughts, actions and the final answer as the model writes them), the tool calls and
+    their outputs on an EventStream for src/api/stream.py."""
+
+    # StreamClosed from EventStream.put has to stop the agent, not only be logged by the callback manager
+    raise_error = True
+
+    def __init__(self, stream: EventStream):
+        self.stream = stream
+
+    def on_llm_new_token(self, token: str, **kwargs: Any) -> None:
+        self.stream.put({"type": "token", "token": token})
+
+    def on_agent_action(self, action: AgentAction, **kwargs: Any) -> None:
+        self.stream.put({"type": "action", "tool": action.tool, "tool_input": str(action.tool_input)})
+
+    def on_tool_end(self, output: Any, **kwargs: Any) -> None:
+        self.stream.put({"type": "observation", "output": str(output)[:MAX_OBSERVATION_LENGTH]})
+
+    def on_agent_finish(self, finish: AgentFinish, **kwargs: Any) -> None:
+        self.stream.put({"type": "final", "output": finish.return_values.get("output", "")})
@@ -0,0 +1,149 @@
+import asyncio
+import json
+import queue
+import threading
+import time
+import traceback
+
+from config.settings.base import AGENT_STREAM_QUEUE_SIZE, AGENT_STREAM_PUT_TIMEOUT, AGENT_STREAM_KEEPALIVE
+from src.db.utils import CustomJSONEncoder
+
+SSE_CONTENT_TYPE = "text/event-stream"
+
+_DONE = object()
+# how often aevents looks at the queue, tokens that arrive in between are sent together
+POLL_INTERVAL = 0.05
+
+
+class StreamClosed(Exception):
+    """The client went away (or stopped reading for put_timeout seconds), the producer should stop."""
+
+
+class EventStream:
+    """Bounded queue of events from the thread running the agent to the response streaming them.
+
+    put blocks while the queue is full, so a slow client slows the producer down instead of buffering without
+    limit, and raises StreamClosed once the consumer closed the stream or did not read for put_timeout seconds.
+    """
+
+    def __init__(self, maxsize=AGENT_STREAM_QUEUE_SIZE, put_timeout=AGENT_STREAM_PUT_TIMEOUT):
+        self.put_timeout = put_timeout
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._closed = threading.Event()
+
+    @property
+    def closed(self):
+        return self._closed.is_set()
+
+    def _put(self, item, timeout):
+        deadline = time.monotonic() + timeout
+        while not self._closed.is_set():
+            try:
+                self._queue.put(item, timeout=min(0.5, max(deadline - time.monotonic(), 0.001)))
+                return True
+            except queue.Full:
+                if time.monotonic() >= deadline:
+                    return False
+        return False
+
+    def put(self, event):
+        if not self._put(event, self.put_timeout):
+            self.close()
+            raise StreamClosed()
+
+    def finish(self):
+        """End of the events, a closed stream has no reader left to tell."""
+        self._put(_DONE, self.put_timeout)
+
+    def close(self):
+        self._closed.set()
+
+    def events(self, keepalive=AGENT_STREAM_KEEPALIVE):
+        """Events as they arrive until finish(), None every keepalive seconds without one."""
+        while not self._closed.is_set():
+            try:
+                event = self._queue.get(timeout=keepalive)
+            except queue.Empty:
+                yield None
+                continue
+            if event is _DONE:
+                return
+            yield event
+
+    async def aevents(self, keepalive=AGENT_STREAM_KEEPALIVE, poll_interval=POLL_INTERVAL):
+        """events() for the event loop: polls the queue instead of blocking a thread for every open stream."""
+        idle_since = time.monotonic()
+        while not self._closed.is_set():
+            try:
+                event = self._queue.get_nowait()
+            except queue.Empty:
+                if time.monotonic() - idle_since >= keepalive:
+                    idle_since = time.monotonic()
+                    yield None
+                else:
+                    await asyncio.sleep(poll_interval)
+                continue
+            if event is _DONE:
+                return
+            idle_since = time.monotonic()
+            yield event
+
+
+def produce(stream, target, on_result=None):
+    """Runs target() in a thread feeding stream, on_result(result) is put as the last event."""
+
+    def run():
+        try:
+            result = target()
+            if on_result is not None:
+                stream.put(on_result(result))
+        except StreamClosed:
+            print(f"produce, stream closed by the client")
+        except Exception as e:
+            traceback.print_exc()
+            try:
+                stream.put({"type": "error", "message": str(e)})
+            except StreamClosed:
+                pass
+        finally:
+            stream.finish()
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread
+
+
+def sse_message(event):
+    if event is None:
+        return b": keep-alive\n\n"
+    data = json.dumps(event, cls=CustomJSONEncoder)
+    return f"event: {event.get('type', 'message')}\ndata: {data}\n\n".encode("utf-8")
+
+
+def sse_blocks(stream, keepalive=AGENT_STREAM_KEEPALIVE):
+    """Server-sent events of the stream. The server closes the generator when the client disconnects, which
+    closes the stream so the producer stops at its next event."""
+    try:
+        for event in stream.events(keepalive=keepalive):
+            yield sse_message(event)
+    finally:
+        stream.close()
+
+
+async def sse_async_blocks(stream, keepalive=AGENT_STREAM_KEEPALIVE):
+    """sse_blocks for ASGI. StreamingHttpResponse reads a sync iterator to the end with sync_to_async(list) before
+    sending anything, an async one is sent as it is produced."""
+    try:
+        async for event in stream.aevents(keepalive=keepalive):
+            yield sse_message(event)
+    finally:
+        stream.close()
+
+
+def sse_response(stream, keepalive=AGENT_STREAM_KEEPALIVE):
+    from django.http import StreamingHttpResponse
+
+    response = StreamingHttpResponse(sse_async_blocks(stream, keepalive), content_type=SSE_CONTENT_TYPE)
+    # proxies (nginx) would otherwise buffer the events
+    response["X-Accel-Buffering"] = "no"
+    return response
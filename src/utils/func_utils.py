@@ -4,3 +4,30 @@ import time
 
 def timestamp_to_date(timestamp):
     return time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(timestamp))
+
+
+_END = object()
+
+
+async def iterate_in_thread(iterator):
+    """Async iterator over a blocking one, every next() runs in a worker thread so the event loop keeps serving other
+    requests. Under ASGI a StreamingHttpResponse reads a sync iterator to the end with sync_to_async(list) before
+    sending anything, an async one is sent as it is produced."""
+    from asgiref.sync import sync_to_async
+
+    iterator = iter(iterator)
+    next_item = sync_to_async(next, thread_sensitive=False)
+    try:
+        while True:
+            item = await next_item(iterator, _END)
+            if item is _END:
+                return
+            yield item
+    finally:
+        close = getattr(iterator, "close", None)
+        if close is not None:
+            try:
+                close()
+            except ValueError:
+                # cancelled while next() still runs in its thread, the generator is closed when it is collected
+                print(f"iterate_in_thread, iterator still running, not closed")
@@ -0,0 +1,143 @@
+import json
+
+from config.settings.base import RESULTS_PARQUET_ROW_GROUP_SIZE
+from src.db.utils import CustomJSONEncoder
+
+RESULTS_EXTENSIONS = {"json": ".json", "parquet": ".parquet"}
+
+
+def results_format_of(key):
+    return "parquet" if key.endswith(RESULTS_EXTENSIONS["parquet"]) else "json"
+
+
+def json_array_blocks(chunks):
+    """The chunks of rows as one JSON array, encoded one chunk at a time."""
+    yield b"["
+    first = True
+    for rows in chunks:
+        if len(rows) == 0:
+            continue
+        body = ",".join(json.dumps(row, cls=CustomJSONEncoder) for row in rows)
+        yield (body if first else "," + body).encode("utf-8")
+        first = False
+    yield b"]"
+
+
+def page_rows(rows, columns=None, offset=0, limit=None):
+    rows = rows[offset:] if limit is None else rows[offset:offset + limit]
+    if columns is None:
+        return rows
+    return [{column: row.get(column) for column in columns} for row in rows]
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError as e:
+        raise ImportError("RESULTS_FORMAT=parquet needs pyarrow, pip install pyarrow") from e
+    return pyarrow, pyarrow.parquet
+
+
+def _writer_field(pa, field):
+    # a decimal's precision and scale are inferred per row group and differ between them, the JSON results hold
+    # floats for Decimals too; a column with no value in the first row group can only be written as strings
+    if pa.types.is_decimal(field.type):
+        return pa.field(field.name, pa.float64())
+    if pa.types.is_null(field.type):
+        return pa.field(field.name, pa.string())
+    return field
+
+
+def _row_group_table(pa, rows, schema):
+    """rows as a table of schema: missing columns are NULL, other inferred types are cast to the schema's, values of
+    string columns that do not cast are written with str()."""
+    inferred = pa.Table.from_pylist(rows)
+    columns = []
+    for field in schema:
+        if field.name not in inferred.column_names:
+            columns.append(pa.nulls(len(rows), field.type))
+            continue
+        column = inferred.column(field.name)
+        if column.type != field.type:
+            try:
+                column = column.cast(field.type)
+            except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+                if not pa.types.is_string(field.type):
+                    raise
+                column = pa.array([None if value is None else str(value) for value in column.to_pylist()], pa.string())
+        columns.append(column)
+    return pa.Table.from_arrays(columns, schema=schema)
+
+
+def write_parquet(chunks, sink, row_group_size=RESULTS_PARQUET_ROW_GROUP_SIZE):
+    """Writes the chunks of rows to sink as zstd Parquet with min/max statistics per row group of row_group_size
+    rows, so readers can fetch a page or some columns without the whole file. Returns the number of rows written.
+
+    The schema is inferred from the first row group and every later row group is cast to it (see _writer_field).
+    """
+    pa, pq = _pyarrow()
+    writer = None
+    schema = None
+    pending = []
+    written = 0
+
+    def write(rows):
+        nonlocal writer, schema
+        if writer is None:
+            schema = pa.schema([_writer_field(pa, field) for field in pa.Table.from_pylist(rows).schema])
+            writer = pq.ParquetWriter(sink, schema, compression="zstd", write_statistics=True)
+        writer.write_table(_row_group_table(pa, rows, schema), row_group_size=row_group_size)
+
+    try:
+        for rows in chunks:
+            if len(rows) == 0:
+                continue
+            # buffered up to one row group, small chunks would otherwise become small row groups
+            pending.extend(rows)
+            if len(pending) >= row_group_size:
+                write(pending)
+                written += len(pending)
+                pending = []
+        if len(pending) > 0:
+            write(pending)
+            written += len(pending)
+    finally:
+        if writer is not None:
+            writer.close()
+    return written
+
+
+def read_parquet_metadata(source):
+    """Row count, columns and per row group sizes of a Parquet results file, read from its footer only."""
+    _, pq = _pyarrow()
+    metadata = pq.ParquetFile(source).metadata
+    return {
+        "num_rows": metadata.num_rows,
+        "columns": [metadata.schema.column(i).name for i in range(metadata.num_columns)],
+        "row_groups": [metadata.row_group(i).num_rows for i in range(metadata.num_row_groups)],
+    }
+
+
+def read_parquet(source, columns=None, offset=0, limit=None):
+    """Rows offset..offset + limit of a Parquet results file, reading only the row groups and columns needed."""
+    _, pq = _pyarrow()
+    parquet_file = pq.ParquetFile(source)
+    metadata = parquet_file.metadata
+    end = None if limit is None else offset + limit
+
+    groups = []
+    first_row = None
+    start = 0
+    for i in range(metadata.num_row_groups):
+        num_rows = metadata.row_group(i).num_rows
+        if start + num_rows > offset and (end is None or start < end):
+            groups.append(i)
+            if first_row is None:
+                first_row = start
+        start += num_rows
+    if len(groups) == 0:
+        return []
+
+    table = parquet_file.read_row_groups(groups, columns=columns)
+    return table.slice(offset - first_row, limit).to_pylist()
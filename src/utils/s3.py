@@ -1,9 +1,16 @@
+import io
+import json
+import tempfile
+
 import boto3
 import botocore
 import traceback
 
 from config.settings.base import AWS_ACCESS_KEY_ID, AWS_SECRET_ACCESS_KEY, AWS_S3_ENDPOINT_URL, AWS_S3_REGION_NAME, \
-    AWS_STORAGE_BUCKET_NAME
+    AWS_STORAGE_BUCKET_NAME, RESULTS_FORMAT
+from src.db.query_stream import IterableReader
+from src.utils.results_format import RESULTS_EXTENSIONS, json_array_blocks, write_parquet, read_parquet, \
+    read_parquet_metadata, results_format_of, page_rows
 
 s3_client = boto3.client(
     's3',
@@ -37,3 +44,117 @@ def save_s3(
         traceback.print_exc()
         print(f"save_s3, Encountered an error Exception, with boto3: {e}")
         return ""
+
+
+def save_s3_stream(
+        key: str,
+        company_id: str,
+        blocks,
+):
+    """Uploads an iterator of bytes blocks (e.g. ndjson_chunks(stream_query(...))) as a multipart upload, so the
+    result is never held in memory as a whole."""
+    try:
+        path = f"{AWS_STORAGE_BUCKET_NAME}_{company_id}"
+        response = s3_client.upload_fileobj(IterableReader(blocks), path, key)
+        print(f"save_s3_stream, response={response}")
+        s3_url = f"{path}/{key}"
+
+        return s3_url
+    except botocore.exceptions.ClientError as e:
+        traceback.print_exc()
+        print(f"save_s3_stream, Encountered an error ClientError, with boto3: {e}")
+        return ""
+    except Exception as e:
+        traceback.print_exc()
+        print(f"save_s3_stream, Encountered an error Exception, with boto3: {e}")
+        return ""
+
+
+class S3ObjectReader(io.RawIOBase):
+    """Seekable read-only file object over an S3 object, every read is a ranged GET. Lets pyarrow read a Parquet
+    footer and the row groups it needs without downloading the object."""
+
+    def __init__(self, bucket, key):
+        self.bucket = bucket
+        self.key = key
+        self.size = s3_client.head_object(Bucket=bucket, Key=key)["ContentLength"]
+        self.position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self.position
+        elif whence == io.SEEK_END:
+            offset += self.size
+        self.position = max(0, offset)
+        return self.position
+
+    def readinto(self, target):
+        if self.position >= self.size or len(target) == 0:
+            return 0
+        end = min(self.size, self.position + len(target)) - 1
+        response = s3_client.get_object(Bucket=self.bucket, Key=self.key, Range=f"bytes={self.position}-{end}")
+        data = response["Body"].read()
+        target[:len(data)] = data
+        self.position += len(data)
+        return len(data)
+
+
+def save_results_s3(
+        key: str,
+        company_id: str,
+        chunks,
+        results_format: str = RESULTS_FORMAT,
+):
+    """Saves chunks of result rows (e.g. execute_query_stream) as a JSON array or as Parquet, the format's extension
+    is appended to key. Returns the s3 url like save_s3, "" on failure."""
+    extension = RESULTS_EXTENSIONS[results_format]
+    if not key.endswith(extension):
+        key = key + extension
+    if results_format == "json":
+        return save_s3_stream(key=key, company_id=company_id, blocks=json_array_blocks(chunks))
+
+    # parquet needs a seekable sink, it is spooled to disk instead of memory
+    with tempfile.TemporaryFile() as spool:
+        try:
+            rows = write_parquet(chunks, spool)
+        except Exception as e:
+            traceback.print_exc()
+            print(f"save_results_s3, failed to write parquet, key={key}, e={e}")
+            return ""
+        print(f"save_results_s3, key={key}, rows={rows}, bytes={spool.tell()}")
+        return save_s3(key=key, company_id=company_id, value=spool)
+
+
+def load_results_s3(
+        key: str,
+        company_id: str,
+        columns=None,
+        offset: int = 0,
+        limit: int = None,
+):
+    """A page of the rows saved by save_results_s3, optionally only some columns. Parquet results are read with
+    ranged GETs of the needed row groups and columns, JSON results are downloaded whole."""
+    path = f"{AWS_STORAGE_BUCKET_NAME}_{company_id}"
+    if results_format_of(key) == "parquet":
+        return read_parquet(S3ObjectReader(path, key), columns=columns, offset=offset, limit=limit)
+    body = s3_client.get_object(Bucket=path, Key=key)["Body"].read()
+    return page_rows(json.loads(body), columns=columns, offset=offset, limit=limit)
+
+
+def load_results_metadata_s3(
+        key: str,
+        company_id: str,
+):
+    """Row count and columns of Parquet results, None for JSON results."""
+    if results_format_of(key) != "parquet":
+        return None
+    return read_parquet_metadata(S3ObjectReader(f"{AWS_STORAGE_BUCKET_NAME}_{company_id}", key))
@@ -0,0 +1,98 @@
+import threading
+import time
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire ttl seconds after being set.
+
+    With a weigher, weigher(value) is the cost of an entry (e.g. its size in bytes) and least recently used entries
+    are also evicted while the total weight exceeds max_weight.
+    """
+
+    def __init__(self, maxsize=1024, ttl=60.0, max_weight=None, weigher=None):
+        if maxsize < 1:
+            raise ValueError(f"invalid cache size, maxsize={maxsize}")
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.max_weight = max_weight
+        self._weigher = weigher
+        self._weight = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def get(self, key, default=None):
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key, _MISSING)
+            if item is _MISSING:
+                self._misses += 1
+                return default
+            expires_at, value, weight = item
+            if expires_at <= now:
+                del self._data[key]
+                self._weight -= weight
+                self._misses += 1
+                return default
+            self._data.move_to_end(key)
+            self._hits += 1
+            return value
+
+    def set(self, key, value, ttl=None, weight=None):
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        if weight is None:
+            weight = self._weigher(value) if self._weigher is not None else 0
+        if self.max_weight is not None and weight > self.max_weight:
+            # would evict everything else and still not fit
+            self.pop(key)
+            return False
+        with self._lock:
+            previous = self._data.pop(key, _MISSING)
+            if previous is not _MISSING:
+                self._weight -= previous[2]
+            self._data[key] = (expires_at, value, weight)
+            self._weight += weight
+            while len(self._data) > self.maxsize or (self.max_weight is not None and self._weight > self.max_weight):
+                self._weight -= self._data.popitem(last=False)[1][2]
+                self._evictions += 1
+        return True
+
+    def pop(self, key, default=None):
+        with self._lock:
+            item = self._data.pop(key, _MISSING)
+            if item is not _MISSING:
+                self._weight -= item[2]
+        return default if item is _MISSING else item[1]
+
+    def invalidate_where(self, predicate):
+        with self._lock:
+            keys = [key for key, (_, value, _) in self._data.items() if predicate(key, value)]
+            for key in keys:
+                self._weight -= self._data.pop(key)[2]
+        return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._weight = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "weight": self._weight,
+                "max_weight": self.max_weight,
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+            }
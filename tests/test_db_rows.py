@@ -0,0 +1,37 @@
+import unittest
+from unittest.mock import MagicMock
+
+from src.db.rows import fetch_dict, fetch_dicts, fetch_records, select_columns
+
+
+def make_cursor(names, rows):
+    cur = MagicMock()
+    cur.description = [(name, None, None, None, None, None, None) for name in names]
+    cur.fetchall.return_value = rows
+    cur.fetchone.return_value = rows[0] if rows else None
+    return cur
+
+
+class RowMappingTests(unittest.TestCase):
+    def test_fetch_dicts_uses_cursor_description(self):
+        cur = make_cursor(("id", "question"), [(1, "a"), (2, "b")])
+
+        self.assertEqual(fetch_dicts(cur), [{"id": 1, "question": "a"}, {"id": 2, "question": "b"}])
+
+    def test_fetch_dict_returns_none_without_row(self):
+        self.assertIsNone(fetch_dict(make_cursor(("id",), [])))
+        self.assertEqual(fetch_dict(make_cursor(("id",), [(5,)])), {"id": 5})
+
+    def test_fetch_records_share_one_type(self):
+        records = fetch_records(make_cursor(("id", "question"), [(1, "a"), (2, "b")]))
+
+        self.assertEqual(records[1].question, "b")
+        self.assertIs(type(records[0]), type(fetch_records(make_cursor(("id", "question"), [(3, "c")]))[0]))
+
+    def test_select_columns_rejects_unknown_column(self):
+        with self.assertRaises(ValueError):
+            select_columns(("id", "password"), allowed=("id", "question"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,94 @@
+import os
+import tempfile
+import threading
+import unittest
+from unittest.mock import MagicMock
+
+from src.context_store.base import ContextStoreBackend
+from src.context_store.local_store import LocalContextStore
+
+VECTORS = {
+    "revenue by month": [1.0, 0.0, 0.0],
+    "top customers": [0.0, 1.0, 0.0],
+    "monthly revenue": [0.9, 0.1, 0.0],
+}
+
+
+class LocalContextStoreTests(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.embedding = MagicMock()
+        self.embedding.embed_documents.side_effect = lambda documents: [VECTORS[d] for d in documents]
+        self.embedding.embed_query.side_effect = lambda text: VECTORS[text]
+        self.store = LocalContextStore(self.directory.name, embedding=self.embedding, embed_batch_size=2)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def add(self, ids, documents, db_schema="public"):
+        metadata = [{"resourcename": "warehouse", "db_schema": db_schema} for _ in documents]
+        return self.store.add_records(
+            company_id="7", documents=documents, index_name="golden-records", metadata=metadata, ids=ids)
+
+    def query(self, text, num_results=3, db_schema="public"):
+        return self.store.query(text, "7", "golden-records", num_results, "warehouse", db_schema)
+
+    def test_query_ranks_matches_and_filters_metadata(self):
+        self.add([1, 2], ["revenue by month", "top customers"])
+        self.add([3], ["monthly revenue"], db_schema="sales")
+
+        matches = self.query("revenue by month")
+
+        self.assertEqual([match["id"] for match in matches], ["1", "2"])
+        self.assertAlmostEqual(matches[0]["score"], 1.0, places=5)
+        self.assertEqual(self.embedding.embed_documents.call_count, 2)
+        self.assertEqual([match["id"] for match in self.query("revenue by month", db_schema="sales")], ["3"])
+
+    def test_records_persist_and_upsert_by_id(self):
+        self.add([1, 2], ["revenue by month", "top customers"])
+        self.add([2], ["monthly revenue"])
+
+        reopened = LocalContextStore(self.directory.name, embedding=self.embedding)
+        matches = reopened.query("top customers", "7", "golden-records", 3, "warehouse", "public")
+
+        # id 2 now holds "monthly revenue", so nothing matches "top customers" exactly
+        self.assertEqual([match["id"] for match in matches], ["2", "1"])
+        self.assertLess(matches[0]["score"], 0.2)
+        self.assertTrue(os.path.exists(os.path.join(self.directory.name, "golden-records", "7", "vectors.f32")))
+
+    def test_delete_records(self):
+        self.add([1, 2], ["revenue by month", "top customers"])
+
+        self.assertEqual(self.store.delete_records("golden-records", "7", [1]), 1)
+
+        self.assertEqual([match["id"] for match in self.query("revenue by month")], ["2"])
+        self.assertEqual(self.query("revenue by month", db_schema="missing"), [])
+
+    def test_writers_of_separate_stores_keep_each_others_records(self):
+        # two stores on one directory stand in for two worker processes, only the flock orders their writes
+        stores = [LocalContextStore(self.directory.name, embedding=self.embedding) for _ in range(2)]
+        documents = ["revenue by month", "top customers", "monthly revenue"]
+
+        def add(store, offset):
+            for i in range(10):
+                metadata = [{"resourcename": "warehouse", "db_schema": "public"}]
+                store.add_records(company_id="7", documents=[documents[i % 3]], index_name="golden-records",
+                                  metadata=metadata, ids=[offset + i])
+
+        threads = [threading.Thread(target=add, args=(store, offset)) for store, offset in zip(stores, (0, 100))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(self.query("revenue by month", num_results=50)), 20)
+        namespace = os.path.join(self.directory.name, "golden-records", "7")
+        self.assertEqual([name for name in os.listdir(namespace) if name.endswith(".tmp")], [])
+
+    def test_backend_methods_are_abstract(self):
+        with self.assertRaises(TypeError):
+            ContextStoreBackend()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+import json
+import unittest
+from unittest.mock import MagicMock, patch
+
+from src.db import table_info_helpers
+from src.db.table_info_helpers import upsert_genie_users_db_connection_details_bulk, \
+    upsert_genie_users_db_connection_details_column_distinct_bulk, delete_genie_users_db_connection_details_tables
+
+
+class BulkUpsertTests(unittest.TestCase):
+    def test_tables_are_upserted_in_one_statement(self):
+        conn = MagicMock()
+        records = [
+            {"table_name": "orders", "table_columns": [{"name": "id"}], "fingerprint": "a"},
+            {"table_name": "users", "status": "COMPLETED"},
+            {"table_name": "orders", "table_columns": [{"name": "id"}, {"name": "total"}], "fingerprint": "b"},
+        ]
+
+        with patch.object(table_info_helpers, "execute_values", return_value=[(1,), (2,)]) as execute_values:
+            changed = upsert_genie_users_db_connection_details_bulk(
+                conn, records, company_id=7, genie_users_id=3, db_schema=None, resourcename="warehouse")
+
+        self.assertEqual(changed, 2)
+        execute_values.assert_called_once()
+        values = execute_values.call_args[0][2]
+        # the last record of a table wins, a statement can not upsert the same row twice
+        self.assertEqual([value[0] for value in values], ["orders", "users"])
+        self.assertEqual(json.loads(values[0][1]), [{"name": "id"}, {"name": "total"}])
+        self.assertEqual(values[0][7], "")
+        self.assertEqual(values[0][12], "b")
+        conn.commit.assert_called_once()
+        conn.close.assert_called_once()
+
+    def test_column_distincts_are_upserted_in_one_statement(self):
+        conn = MagicMock()
+        records = [
+            {"table_name": "orders", "column_name": "status", "column_distinct": ["paid", "open"]},
+            {"table_name": "orders", "column_name": "country"},
+        ]
+
+        with patch.object(table_info_helpers, "execute_values", return_value=[(1,)]) as execute_values:
+            changed = upsert_genie_users_db_connection_details_column_distinct_bulk(
+                conn, records, company_id=7, db_schema="public", resourcename="warehouse")
+
+        self.assertEqual(changed, 1)
+        values = execute_values.call_args[0][2]
+        self.assertEqual(values[0], ("orders", "public", "", "warehouse", 7, "status", '["paid", "open"]'))
+        self.assertEqual(values[1][6], "[]")
+
+    def test_nothing_is_written_without_records(self):
+        conn = MagicMock()
+
+        with patch.object(table_info_helpers, "execute_values") as execute_values:
+            self.assertEqual(upsert_genie_users_db_connection_details_column_distinct_bulk(conn, [], company_id=7), 0)
+
+        execute_values.assert_not_called()
+
+    def test_failed_upsert_is_rolled_back(self):
+        conn = MagicMock()
+
+        with patch.object(table_info_helpers, "execute_values", side_effect=Exception("boom")):
+            changed = upsert_genie_users_db_connection_details_bulk(
+                conn, [{"table_name": "orders"}], company_id=7, genie_users_id=3)
+
+        self.assertFalse(changed)
+        conn.rollback.assert_called_once()
+
+
+class DeleteTablesTests(unittest.TestCase):
+    def test_column_descriptions_and_value_indexes_are_deleted_with_the_table(self):
+        conn = MagicMock()
+        cur = conn.cursor.return_value
+        cur.rowcount = 2
+
+        deleted = delete_genie_users_db_connection_details_tables(
+            conn, ["orders", "users"], company_id="7", db_schema=None, resourcename="warehouse")
+
+        self.assertEqual(deleted, 2)
+        tables = [call[0][0].seq[1].strings[0] for call in cur.execute.call_args_list]
+        self.assertEqual(tables, [
+            "genie_users_db_connection_details_column_description",
+            "genie_users_db_connection_details_value_index",
+            "genie_users_db_connection_details",
+        ])
+        for call in cur.execute.call_args_list:
+            self.assertEqual(call[0][1], (7, "warehouse", "", "", ["orders", "users"]))
+        conn.commit.assert_called_once()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,51 @@
+import unittest
+from unittest.mock import patch
+
+from src.utils import ttl_cache
+from src.utils.ttl_cache import TTLCache
+
+
+class TTLCacheTests(unittest.TestCase):
+    def test_entries_expire_after_ttl(self):
+        with patch.object(ttl_cache.time, "monotonic", return_value=100.0):
+            cache = TTLCache(ttl=10)
+            cache.set("a", 1)
+            cache.set("b", 2, ttl=30)
+        with patch.object(ttl_cache.time, "monotonic", return_value=110.0):
+            self.assertIsNone(cache.get("a"))
+            self.assertEqual(cache.get("b"), 2)
+        self.assertEqual(len(cache), 1)
+
+    def test_least_recently_used_is_evicted(self):
+        cache = TTLCache(maxsize=2, ttl=60)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+
+        self.assertEqual(cache.get("a"), 1)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+    def test_weight_bound(self):
+        cache = TTLCache(maxsize=10, ttl=60, max_weight=10, weigher=len)
+        cache.set("a", "x" * 6)
+        cache.set("b", "y" * 6)
+
+        self.assertIsNone(cache.get("a"))
+        self.assertFalse(cache.set("c", "z" * 11))
+        self.assertEqual(cache.stats()["weight"], 6)
+
+    def test_invalidate_where(self):
+        cache = TTLCache(ttl=60)
+        cache.set((1, "a"), "one")
+        cache.set((2, "a"), "two")
+        cache.set((1, "b"), "three")
+
+        self.assertEqual(cache.invalidate_where(lambda key, value: key[0] == 1), 2)
+        self.assertEqual(len(cache), 1)
+        self.assertEqual(cache.get((2, "a")), "two")
+
+
+if __name__ == "__main__":
+    unittest.main()